@@ -0,0 +1,42 @@
+# Run from the repository root: python -m benchmarks.compression
+import json
+import timeit
+
+from voicereader.extensions.compression import Compression, ENCODING_GZIP, ENCODING_BROTLI, brotli
+from voicereader.extensions.json_encoder import JSONEncoder
+
+from .json_encoding import PAYLOADS
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def measure(compression, encoding, data, number):
+    compressed = compression.compress(data, encoding)
+    seconds = timeit.timeit(lambda: compression.compress(data, encoding), number=number)
+
+    return len(compressed), seconds / number * 1e6
+
+
+def main(number=50):
+    compression = Compression()
+    candidates = [('gzip {}'.format(level), ENCODING_GZIP, 'gzip_level', level) for level in GZIP_LEVELS]
+
+    if brotli is not None:
+        candidates += [('br {}'.format(quality), ENCODING_BROTLI, 'brotli_quality', quality)
+                       for quality in BROTLI_QUALITIES]
+
+    for name, payload in PAYLOADS.items():
+        data = json.dumps(payload, cls=JSONEncoder).encode('utf-8')
+        print('{} ({} bytes)'.format(name, len(data)))
+
+        for label, encoding, option, value in candidates:
+            setattr(compression, option, value)
+            size, micros = measure(compression, encoding, data, number)
+
+            print('  {:<8} {:>8} bytes  saved {:>5.1f}%  {:>9.1f} us'.format(
+                label, size, (1 - size / len(data)) * 100, micros))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Run from the repository root: python -m benchmarks.json_encoding
+import json
+import time
+import timeit
+
+from bson import ObjectId
+
+from voicereader.extensions.json_encoder import get_json_encoder, BACKEND_STDLIB, BACKEND_ORJSON
+
+
+def make_user():
+    return {
+        '_id': ObjectId(),
+        'display_name': 'Lion',
+        'email': 'lion@example.com',
+        'fcm_uid': 'x' * 28,
+        'picture': 'https://example.com/photo/lion.png',
+        'location': 'Seoul',
+        'created_date': time.time(),
+    }
+
+
+def make_question():
+    writer = make_user()
+
+    return {
+        '_id': ObjectId(),
+        'title': '영어 발음 질문',
+        'contents': 'contents ' * 40,
+        'subtitles': 'subtitle line\n' * 60,
+        'sound_url': 'https://example.com/api/v1/questions/sound/{}.mp3'.format(ObjectId()),
+        'writer_id': writer['_id'],
+        'writer': writer,
+        'created_date': time.time(),
+        'num_of_view': 42,
+        'num_of_answers': 7,
+        'media_status': 'ready',
+    }
+
+
+def make_answer(question_id):
+    writer = make_user()
+
+    return {
+        '_id': ObjectId(),
+        'question_id': question_id,
+        'writer_id': writer['_id'],
+        'writer': writer,
+        'contents': 'answer contents ' * 10,
+        'created_date': time.time(),
+    }
+
+
+PAYLOADS = {
+    'question list (20)': [make_question() for _ in range(20)],
+    'answer list (200)': [make_answer(ObjectId()) for _ in range(200)],
+}
+
+ENCODERS = (
+    ('stdlib sorted', BACKEND_STDLIB, True),
+    ('stdlib', BACKEND_STDLIB, False),
+    ('orjson', BACKEND_ORJSON, False),
+)
+
+
+def main(number=200):
+    for name, payload in PAYLOADS.items():
+        results = []
+
+        for label, backend, sort_keys in ENCODERS:
+            encoder = get_json_encoder(backend)
+            seconds = timeit.timeit(lambda: json.dumps(payload, cls=encoder, sort_keys=sort_keys), number=number)
+            results.append('{} {:.1f} us'.format(label, seconds / number * 1e6))
+
+        print('{:<20} {}'.format(name, '  '.join(results)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+# Run from the repository root: python -m benchmarks.marshalling
+import timeit
+
+from flask_restplus import Namespace, marshal
+
+from voicereader.api_v1.answer.schema import answer_with_writer_schema
+from voicereader.api_v1.question.schema import question_with_writer_schema
+from voicereader.extensions.marshalling import compile_model
+
+from .json_encoding import make_answer, make_question
+
+api = Namespace('benchmark')
+
+PAYLOADS = {
+    'question list (20)': (question_with_writer_schema(api), [make_question() for _ in range(20)]),
+    'answer list (200)': (answer_with_writer_schema(api), [make_answer(None) for _ in range(200)]),
+}
+
+
+def main(number=200):
+    for name, (model, payload) in PAYLOADS.items():
+        serialize = compile_model(model)
+
+        baseline = timeit.timeit(lambda: marshal(payload, model), number=number)
+        compiled = timeit.timeit(lambda: serialize(payload), number=number)
+
+        print('{:<20} restplus {:>9.1f} us  compiled {:>8.1f} us  x{:.1f}'.format(
+            name, baseline / number * 1e6, compiled / number * 1e6, baseline / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Run from the repository root: python -m benchmarks.payload_validation
+import json
+import timeit
+
+from ast import literal_eval
+
+from flask_restplus import Namespace
+
+from voicereader.api_v1.answer.schema import post_answer_schema
+from voicereader.api_v1.user.schema import user_schema
+from voicereader.extensions.payload import PayloadValidator
+
+api = Namespace('benchmark')
+
+PAYLOADS = {
+    'user (small)': (user_schema(api), {
+        'display_name': 'Lion',
+        'picture': 'https://example.com/photo/lion.png',
+        'location': 'Seoul',
+    }),
+    'answer (64 KiB)': (post_answer_schema(api), {
+        'contents': 'a' * 64 * 1024,
+    }),
+}
+
+
+def literal_eval_path(payload):
+    return literal_eval(json.dumps(payload))
+
+
+def main(number=2000):
+    for name, (model, payload) in PAYLOADS.items():
+        validator = PayloadValidator(model)
+
+        baseline = timeit.timeit(lambda: literal_eval_path(payload), number=number)
+        compiled = timeit.timeit(lambda: validator.validate(payload), number=number)
+
+        print('{:<16} literal_eval {:>9.2f} us  compiled {:>7.2f} us  x{:.0f}'.format(
+            name, baseline / number * 1e6, compiled / number * 1e6, baseline / compiled))
+
+
+if __name__ == '__main__':
+    main()
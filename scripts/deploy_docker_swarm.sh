@@ -12,6 +12,9 @@ fi
 TARGET_VERSION=$1
 DEPLOY_STACK_NAME=voicereader-rest
 CONTAINER_API_NAME=api
+STACK_NETWORK_NAME=apinet
+MONGO_URI=mongodb://mongodb:27017/VoiceReader
+SYNC_INDEXES_ATTEMPTS=5
 
 # Pull docker image from docker registry
 docker pull ${DOCKER_USERNAME}/${DOCKER_IMAGE_NAME}:${TARGET_VERSION}
@@ -32,5 +35,22 @@ if [[ $? != 0 ]]; then
     exit 2
 fi
 
+# Reconcile MongoDB indexes once per deploy instead of on every worker boot.
+# Sign up relies on the unique users.fcm_uid index and search on the text index, so a failure stops the deploy.
+# A one-off container of the new image joins the stack network; MongoDB may still be starting on a first deploy.
+for attempt in $(seq 1 ${SYNC_INDEXES_ATTEMPTS}); do
+    docker run --rm --network ${DEPLOY_STACK_NAME}_${STACK_NETWORK_NAME} \
+        -e MONGO_URI=${MONGO_URI} \
+        -e FLASK_APP="voicereader.application:create()" \
+        ${DOCKER_USERNAME}/${DOCKER_IMAGE_NAME}:${TARGET_VERSION} flask sync-indexes && break
+
+    if [[ ${attempt} == ${SYNC_INDEXES_ATTEMPTS} ]]; then
+        echo "Failed to synchronize indexes..."
+        exit 3
+    fi
+
+    sleep 10
+done
+
 # Remove all unused resources.
 docker system prune -f
\ No newline at end of file
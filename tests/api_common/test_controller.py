@@ -59,3 +59,26 @@ def test_get_env(flask_app, flask_client):
 
     assert res.status_code == 200
     assert res.get_data() == b'testing'
+
+
+def test_get_metrics(flask_app, flask_client):
+    class MockMetrics:
+        def render(self):
+            return b'voicereader_requests_total 1.0\n', 'text/plain; version=0.0.4; charset=utf-8'
+
+    flask_app.extensions['metrics'] = MockMetrics()
+    flask_app.register_blueprint(blueprint)
+
+    res = flask_client.get('/api/metrics')
+
+    assert res.status_code == 200
+    assert res.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    assert res.get_data() == b'voicereader_requests_total 1.0\n'
+
+
+def test_get_metrics_not_registered(flask_app, flask_client):
+    flask_app.register_blueprint(blueprint)
+
+    res = flask_client.get('/api/metrics')
+
+    assert res.status_code == 404
@@ -6,8 +6,10 @@ from flask_restplus import Api
 from flask_jwt_extended import JWTManager, create_access_token
 
 from pymongo.errors import InvalidId
+from bson import ObjectId
 
 from voicereader.api_v1.answer import controller
+from voicereader.extensions.cursor import encode_cursor, decode_cursor, after_cursor_query, after_cursor_expression
 
 
 @pytest.fixture(scope='function')
@@ -41,22 +43,28 @@ def mock_access_token(monkeypatch, flask_client, flask_app):
 
 
 def test_get_answers_success(monkeypatch, flask_client, mock_access_token):
+    class MockCursor(list):
+        def sort(self, keys):
+            return self
+
     class MockDb:
         class MockQuestions:
-            def find_one(self):
-                return {
-                    '_id': 'VALID_QUESTION_ID',
-                    'answers': [
-                        {'_id': 'VALID_ANSWER_ID_1', 'writer_id': 'VALID_USER_ID_1'},
-                        {'_id': 'VALID_ANSWER_ID_2', 'writer_id': 'VALID_USER_ID_2'},
-                    ]
-                }
+            def aggregate(self):
+                return [{'_id': 'VALID_QUESTION_ID', 'num_of_answers': 2, 'legacy_answers': 0}]
+
+        class MockAnswers:
+            def find(self):
+                return MockCursor([
+                    {'_id': 'VALID_ANSWER_ID_1', 'writer_id': 'VALID_USER_ID_1'},
+                    {'_id': 'VALID_ANSWER_ID_2', 'writer_id': 'VALID_USER_ID_2'},
+                ])
 
         questions = MockQuestions
+        answers = MockAnswers
 
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
     monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
-    monkeypatch.setattr(controller, 'get_user', lambda user_id: None)
+    monkeypatch.setattr(controller, 'load_writers', lambda records: records)
 
     headers = {
         'Authorization': 'Bearer {}'.format(mock_access_token)
@@ -65,6 +73,9 @@ def test_get_answers_success(monkeypatch, flask_client, mock_access_token):
     res = flask_client.get('questions/{}/answers'.format('VALID_QUESTION_ID'), headers=headers)
 
     assert 200 == res.status_code
+    assert 2 == len(res.get_json())
+    assert '2' == res.headers['X-Total-Count']
+    assert 'X-Next-Cursor' not in res.headers
 
 
 def test_get_answers_not_include_accesstoken(flask_client):
@@ -99,8 +110,8 @@ def test_get_answers_invalid_questionid(flask_client, mock_access_token):
 def test_get_answers_not_found_question(monkeypatch, flask_client, mock_access_token):
     class MockDb:
         class MockQuestions:
-            def find_one(self):
-                return None
+            def aggregate(self):
+                return iter([])
 
         questions = MockQuestions
 
@@ -117,7 +128,220 @@ def test_get_answers_not_found_question(monkeypatch, flask_client, mock_access_t
     assert res.get_json()['message']
 
 
+def test_get_answers_with_limit(monkeypatch, flask_client, mock_access_token):
+    question_id = ObjectId()
+    answers = [
+        {'_id': ObjectId(), 'writer_id': 'VALID_USER_ID_1', 'created_date': 100.0},
+        {'_id': ObjectId(), 'writer_id': 'VALID_USER_ID_2', 'created_date': 200.0},
+    ]
+    calls = []
+
+    def mock_get_answers(obj_question_id, limit, after):
+        calls.append((obj_question_id, limit, after))
+
+        return {'_id': obj_question_id, 'num_of_answers': 5, 'answers': answers}
+
+    monkeypatch.setattr(controller, 'get_answers', mock_get_answers)
+    monkeypatch.setattr(controller, 'load_writers', lambda records: records)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    cursor = encode_cursor(50.0, answers[0]['_id'])
+    res = flask_client.get('questions/{}/answers?limit=2&after={}'.format(question_id, cursor), headers=headers)
+
+    assert 200 == res.status_code
+    assert [(question_id, 2, (50.0, answers[0]['_id']))] == calls
+    assert '5' == res.headers['X-Total-Count']
+    assert (200.0, answers[1]['_id']) == decode_cursor(res.headers['X-Next-Cursor'])
+
+
+def test_get_answers_last_page(monkeypatch, flask_client, mock_access_token):
+    answers = [{'_id': ObjectId(), 'writer_id': 'VALID_USER_ID_1', 'created_date': 100.0}]
+
+    monkeypatch.setattr(controller, 'get_answers',
+                        lambda obj_question_id, limit, after: {'num_of_answers': 3, 'answers': answers})
+    monkeypatch.setattr(controller, 'load_writers', lambda records: records)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/{}/answers?limit=2'.format(ObjectId()), headers=headers)
+
+    assert 200 == res.status_code
+    assert 'X-Next-Cursor' not in res.headers
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-1', 'limit=NOT_NUMBER', 'after=INVALID_CURSOR'])
+def test_get_answers_invalid_query(flask_client, mock_access_token, query):
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/{}/answers?{}'.format(ObjectId(), query), headers=headers)
+
+    assert 400 == res.status_code
+
+
+def test_get_answers_from_collection(monkeypatch):
+    question_id = ObjectId()
+    after = (100.0, ObjectId())
+    queries = []
+
+    class MockCursor(list):
+        def sort(self, keys):
+            queries.append(keys)
+            return self
+
+        def limit(self, limit):
+            queries.append(limit)
+            return self
+
+    class MockDb:
+        class MockAnswers:
+            def find(self, query):
+                queries.append(query)
+
+                return MockCursor([{'_id': ObjectId(), 'created_date': 200.0}])
+
+        answers = MockAnswers()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'get_answers_summary',
+                        lambda obj_question_id: {'_id': obj_question_id, 'num_of_answers': 1, 'legacy_answers': 0})
+    monkeypatch.setattr(controller, 'get_legacy_answers', None)
+
+    record = controller.get_answers(question_id, 10, after)
+
+    query, sort, limit = queries
+
+    assert question_id == query.pop('question_id')
+    assert after_cursor_query(after, ascending=True) == query
+    assert [('created_date', 1), ('_id', 1)] == sort
+    assert 10 == limit
+    assert 1 == len(record['answers'])
+    assert 1 == record['num_of_answers']
+
+
+def test_get_answers_merges_legacy_answers(monkeypatch):
+    question_id = ObjectId()
+    legacy_answer = {'_id': ObjectId(), 'created_date': 100.0}
+    answer = {'_id': ObjectId(), 'created_date': 200.0}
+
+    class MockCursor(list):
+        def sort(self, keys):
+            return self
+
+        def limit(self, limit):
+            return self
+
+    class MockDb:
+        class MockAnswers:
+            def find(self):
+                return MockCursor([answer])
+
+        answers = MockAnswers
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'get_answers_summary',
+                        lambda obj_question_id: {'_id': obj_question_id, 'num_of_answers': 2, 'legacy_answers': 1})
+    monkeypatch.setattr(controller, 'get_legacy_answers', lambda obj_question_id, limit, after: [legacy_answer])
+
+    record = controller.get_answers(question_id, 1)
+
+    assert [legacy_answer] == record['answers']
+
+
+def test_get_answers_counts_without_counter(monkeypatch):
+    question_id = ObjectId()
+    counted = []
+
+    class MockCursor(list):
+        def sort(self, keys):
+            return self
+
+        def limit(self, limit):
+            return self[:limit]
+
+    class MockDb:
+        class MockAnswers:
+            def find(self, query):
+                return MockCursor([{'_id': ObjectId(), 'created_date': 200.0}] * 3)
+
+            def count_documents(self, query):
+                counted.append(query)
+
+                return 3
+
+        answers = MockAnswers()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'get_answers_summary',
+                        lambda obj_question_id: {'_id': obj_question_id, 'legacy_answers': 1})
+    monkeypatch.setattr(controller, 'get_legacy_answers', lambda obj_question_id, limit, after: [])
+
+    record = controller.get_answers(question_id, 1)
+
+    assert 1 == len(record['answers'])
+    assert 4 == record['num_of_answers']
+    assert [{"question_id": question_id}] == counted
+
+
+def test_get_answers_not_found_question(monkeypatch):
+    monkeypatch.setattr(controller, 'get_answers_summary', lambda obj_question_id: None)
+
+    assert controller.get_answers(ObjectId()) is None
+
+
+def test_get_legacy_answers_pipeline(monkeypatch):
+    question_id = ObjectId()
+    after = (100.0, ObjectId())
+    pipelines = []
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self, pipeline):
+                pipelines.append(pipeline)
+
+                return iter([{'_id': question_id, 'answers': [{'_id': ObjectId()}]}])
+
+        questions = MockQuestions()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    assert 1 == len(controller.get_legacy_answers(question_id, 10, after))
+
+    match, project = pipelines[0]
+    answers = project['$project']['answers']
+
+    assert {"_id": question_id} == match['$match']
+    assert 10 == answers['$slice'][1]
+    assert after_cursor_expression(after, 'answer') == answers['$slice'][0]['$filter']['cond']
+
+
+def test_get_legacy_answers_without_window(monkeypatch):
+    pipelines = []
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self, pipeline):
+                pipelines.append(pipeline)
+
+                return iter([])
+
+        questions = MockQuestions()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    assert [] == controller.get_legacy_answers(ObjectId())
+    assert {"$ifNull": ["$answers", []]} == pipelines[0][1]['$project']['answers']
+
+
 def test_create_answer_success(monkeypatch, flask_client, mock_access_token):
+    inserted = []
+
     class MockDb:
         class MockQuestions:
             def update_one(self, query):
@@ -126,10 +350,15 @@ def test_create_answer_success(monkeypatch, flask_client, mock_access_token):
 
                 return MockResult()
 
+        class MockAnswers:
+            def insert_one(self, document):
+                inserted.append(document)
+
         questions = MockQuestions
+        answers = MockAnswers()
 
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
-    monkeypatch.setattr(controller, 'get_user', lambda user_id: {})
+    monkeypatch.setattr(controller, 'load_writers', lambda records: records)
     monkeypatch.setattr(controller, 'ObjectId', lambda value=None: value)
 
     headers = {
@@ -142,6 +371,7 @@ def test_create_answer_success(monkeypatch, flask_client, mock_access_token):
     }))
 
     assert 201 == res.status_code
+    assert 'VALID_QUESTION_ID' == inserted[0]['question_id']
 
 
 def test_create_answer_not_include_accesstoken(flask_client):
@@ -239,7 +469,7 @@ def test_create_answer_not_found_question(monkeypatch, flask_client, mock_access
 
 def test_get_answer_success(monkeypatch, flask_client, mock_access_token):
     monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
-    monkeypatch.setattr(controller, 'get_user', lambda user_id: {})
+    monkeypatch.setattr(controller, 'load_writers', lambda records: records)
     monkeypatch.setattr(controller, 'get_answer_by_id', lambda que_id, ans_id: {
         '_id': ans_id,
         'question_id': que_id,
@@ -318,15 +548,27 @@ def test_get_answer_not_found_answer(monkeypatch, flask_client, mock_access_toke
 
 
 def test_remove_answer_success(monkeypatch, flask_client, mock_access_token):
+    updates = []
+
     class MockDb:
         class MockQuestions:
-            def update_one(self, query):
+            def update_one(self, query, update):
+                updates.append(update)
+
                 class MockResult:
                     modified_count = 1
 
                 return MockResult()
 
-        questions = MockQuestions
+        class MockAnswers:
+            def delete_one(self, query):
+                class MockResult:
+                    deleted_count = 1
+
+                return MockResult()
+
+        questions = MockQuestions()
+        answers = MockAnswers()
 
     user_id = 'VALID_USER_ID'
 
@@ -347,6 +589,7 @@ def test_remove_answer_success(monkeypatch, flask_client, mock_access_token):
                               .format('VALID_QUESTION_ID', 'VALID_ANSWER_ID'), headers=headers)
 
     assert 204 == res.status_code
+    assert [{"num_of_answers": -1, "version": 1}] == [update["$inc"] for update in updates if "$inc" in update]
 
 
 def test_remove_answer_not_include_accesstoken(flask_client):
@@ -439,7 +682,13 @@ def test_get_answer_by_id_not_found(monkeypatch):
         class MockQuestions:
             def find_one(self, query):
                 return expected
+
+        class MockAnswers:
+            def find_one(self):
+                return None
+
         questions = MockQuestions
+        answers = MockAnswers
 
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
 
@@ -459,10 +708,48 @@ def test_get_answer_by_id_success(monkeypatch):
                         }
                     ]
                 }
+
+        class MockAnswers:
+            def find_one(self):
+                return None
+
         questions = MockQuestions
+        answers = MockAnswers
 
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
 
     res = controller.get_answer_by_id('VALID_QUESTION_ID', 'NOT_FOUND_ANSWER_ID')
 
     assert res
+
+
+def test_get_answer_by_id_from_collection(monkeypatch):
+    queries = []
+
+    class MockDb:
+        class MockAnswers:
+            def find_one(self, query):
+                queries.append(query)
+
+                return {'_id': query['_id'], 'question_id': query['question_id']}
+
+        answers = MockAnswers()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    res = controller.get_answer_by_id('VALID_QUESTION_ID', 'VALID_ANSWER_ID')
+
+    assert 'VALID_ANSWER_ID' == res['_id']
+    assert [{'_id': 'VALID_ANSWER_ID', 'question_id': 'VALID_QUESTION_ID'}] == queries
+
+
+def test_merge_answers():
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+    legacy_answers = [{'_id': first, 'created_date': 100.0}, {'_id': second, 'created_date': 200.0}]
+    answers = [{'_id': second, 'created_date': 200.0, 'migrated': True}, {'_id': third, 'created_date': 150.0}]
+
+    merged = controller.merge_answers(legacy_answers, answers)
+
+    assert [first, third, second] == [answer['_id'] for answer in merged]
+    assert merged[2]['migrated']
+    assert [first, third] == [answer['_id'] for answer in controller.merge_answers(legacy_answers, answers, 2)]
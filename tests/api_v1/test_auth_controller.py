@@ -64,7 +64,7 @@ def test_get_success(monkeypatch, flask_client):
     expected_refresh_token = 'refresh_token'
     expected_expire_in = 3600
 
-    monkeypatch.setattr(controller.auth, 'verify_id_token', lambda token, app: {'sub': 'user_id'})
+    monkeypatch.setattr(controller.id_tokens, 'verify', lambda token: {'sub': 'user_id'})
     monkeypatch.setattr(controller, 'get_user_id', lambda uid: 'exists user_id')
     monkeypatch.setattr(controller, 'create_access_token', lambda user_id, expires_delta: expected_access_token)
     monkeypatch.setattr(controller, 'create_refresh_token', lambda user_id, expires_delta: expected_refresh_token)
@@ -105,7 +105,7 @@ def test_get_not_registered_user(monkeypatch, flask_client):
         "Authorization": "VALID_ID_TOKEN"
     }
 
-    monkeypatch.setattr(controller.auth, 'verify_id_token', lambda token, app: {'sub': 'user_id'})
+    monkeypatch.setattr(controller.id_tokens, 'verify', lambda token: {'sub': 'user_id'})
     monkeypatch.setattr(controller, 'get_user_id', lambda uid: None)
 
     res = flask_client.get('/oauth2/token', headers=headers)
@@ -10,5 +10,11 @@ def test_init_app(monkeypatch, flask_app):
     monkeypatch.setattr(middlewares, 'jwt', Mock())
     monkeypatch.setattr(middlewares, 'storage', Mock())
     monkeypatch.setattr(middlewares, 'db', Mock())
+    monkeypatch.setattr(middlewares, 'views', Mock())
+    monkeypatch.setattr(middlewares, 'uploads', Mock())
+    monkeypatch.setattr(middlewares, 'user_cache', Mock())
+    monkeypatch.setattr(middlewares, 'id_tokens', Mock())
+    monkeypatch.setattr(middlewares, 'change_markers', Mock())
+    monkeypatch.setattr(middlewares, 'subtitle_cache', Mock())
 
     middlewares.init_app(flask_app)
@@ -1,11 +1,18 @@
 import pytest
 import io
+import datetime
+
+from bson import ObjectId
 
 from flask import jsonify
 from flask_restplus import Api
 from flask_jwt_extended import JWTManager, create_access_token
 
 from voicereader.api_v1.question import controller
+from voicereader.extensions.cursor import encode_cursor
+from voicereader.extensions.subtitles import Cues, hash_subtitles
+from voicereader.services.subtitle_cache import SubtitleCache
+from voicereader.services.stored_file import StoredFile, RangeNotSatisfiable, NotModified
 
 
 @pytest.fixture(scope='function')
@@ -39,15 +46,216 @@ def mock_access_token(monkeypatch, flask_client, flask_app):
 
 
 def test_get_questions_success(monkeypatch, flask_client, mock_access_token):
-    monkeypatch.setattr(controller, 'get_questions', lambda offset, size: {})
+    monkeypatch.setattr(controller, 'get_questions', lambda offset, size, after: [])
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions', headers=headers)
+
+    assert 200 == res.status_code
+    assert 'X-Next-Cursor' not in res.headers
+
+
+def test_get_questions_next_cursor(monkeypatch, flask_client, mock_access_token):
+    last_id = ObjectId()
+    fetched = []
+
+    def mock_get_questions(offset, size, after):
+        fetched.append(after)
+
+        return [{'_id': ObjectId(), 'created_date': 200}, {'_id': last_id, 'created_date': 100}]
+
+    monkeypatch.setattr(controller, 'get_questions', mock_get_questions)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions?size=2', headers=headers)
+    cursor = res.headers['X-Next-Cursor']
+
+    assert 200 == res.status_code
+    assert encode_cursor(100, last_id) == cursor
+
+    res = flask_client.get('questions?size=2&after={}'.format(cursor), headers=headers)
+
+    assert 200 == res.status_code
+    assert (100, last_id) == fetched[-1]
+
+
+class MockChangeMarkers:
+    def __init__(self, versions):
+        self._versions = versions
+
+    def versions(self, *names):
+        return tuple(self._versions.get(name, 0) for name in names)
+
+
+def test_get_questions_etag_reads_fresh_writers(monkeypatch, flask_client, mock_access_token):
+    use_caches = []
+
+    def mock_load_writers(records, use_cache=True):
+        use_caches.append(use_cache)
+
+        return records
+
+    monkeypatch.setattr(controller, 'get_questions', lambda offset, size, after: [])
+    monkeypatch.setattr(controller, 'load_writers', mock_load_writers)
 
     headers = {
         'Authorization': 'Bearer {}'.format(mock_access_token)
     }
 
+    monkeypatch.setattr(controller, 'change_markers', MockChangeMarkers({}))
+    flask_client.get('questions', headers=headers)
+
+    monkeypatch.setattr(controller.change_markers, 'versions', lambda *names: None)
+    flask_client.get('questions', headers=headers)
+
+    assert [False, True] == use_caches
+
+
+def test_get_questions_etag(monkeypatch, flask_client, mock_access_token):
+    fetched = []
+    markers = {'questions': 1, 'users': 1}
+
+    def mock_get_questions(offset, size, after):
+        fetched.append(offset)
+
+        return []
+
+    monkeypatch.setattr(controller, 'get_questions', mock_get_questions)
+    monkeypatch.setattr(controller, 'change_markers', MockChangeMarkers(markers))
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions', headers=headers)
+    etag = res.headers['ETag']
+
+    assert 200 == res.status_code
+    assert etag.startswith('W/')
+
+    headers['If-None-Match'] = etag
+    res = flask_client.get('questions', headers=headers)
+
+    assert 304 == res.status_code
+    assert etag == res.headers['ETag']
+    assert 1 == len(fetched)
+
+    res = flask_client.get('questions?offset=3', headers=headers)
+
+    assert 200 == res.status_code
+
+    markers['users'] = 2
     res = flask_client.get('questions', headers=headers)
 
     assert 200 == res.status_code
+    assert etag != res.headers['ETag']
+
+
+def test_get_questions_by_ids(monkeypatch, flask_client, mock_access_token):
+    first, second, missing = ObjectId(), ObjectId(), ObjectId()
+    requested = []
+
+    def mock_get_questions_by_ids(ids):
+        requested.append(ids)
+
+        return [{'_id': first, 'title': 'first'}, {'_id': second, 'title': 'second'}]
+
+    monkeypatch.setattr(controller, 'get_questions_by_ids', mock_get_questions_by_ids)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+    monkeypatch.setattr(controller.views, 'record', lambda que_id, user_id: pytest.fail('view recorded'))
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions?ids={},{},{}'.format(second, missing, first), headers=headers)
+
+    assert 200 == res.status_code
+    assert ['second', 'first'] == [record['title'] for record in res.get_json()]
+    assert str(missing) == res.headers['X-Missing-Ids']
+    assert [[second, missing, first]] == requested
+
+
+@pytest.mark.parametrize('ids', ['', 'INVALID_ID', ','.join(str(ObjectId()) for _ in range(3))])
+def test_get_questions_by_ids_bad_request(flask_app, flask_client, mock_access_token, ids):
+    flask_app.config['QUESTION_BULK_MAX_IDS'] = 2
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions?ids={}'.format(ids), headers=headers)
+
+    assert 400 == res.status_code
+    assert res.get_json()['message']
+
+
+def test_get_questions_invalid_cursor(flask_client, mock_access_token):
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions?after=INVALID_CURSOR', headers=headers)
+
+    assert 400 == res.status_code
+    assert res.get_json()['message']
+
+
+def test_search_questions_success(monkeypatch, flask_client, mock_access_token):
+    last_id = ObjectId()
+    searched = []
+
+    def mock_search_questions(text, offset, size, after, with_subtitles):
+        searched.append((text, offset, size, after, with_subtitles))
+
+        return [{'_id': ObjectId(), 'score': 2.0, 'title': 'title'}, {'_id': last_id, 'score': 1.5}]
+
+    monkeypatch.setattr(controller, 'search_questions', mock_search_questions)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/search?q=%20hello%20&size=2', headers=headers)
+
+    assert 200 == res.status_code
+    assert [2.0, 1.5] == [record['score'] for record in res.get_json()]
+    assert encode_cursor(1.5, last_id) == res.headers['X-Next-Cursor']
+    assert ('hello', 0, 2, None, False) == searched[-1]
+
+    res = flask_client.get('questions/search?q=hello&subtitles=true&after={}'.format(res.headers['X-Next-Cursor']),
+                           headers=headers)
+
+    assert 200 == res.status_code
+    assert 'X-Next-Cursor' not in res.headers
+    assert ('hello', 0, 10, (1.5, last_id), True) == searched[-1]
+
+
+@pytest.mark.parametrize('query', ['', '?q=', '?q=%20', '?q=' + 'a' * 257, '?q=hello&size=0', '?q=hello&offset=-1',
+                                   '?q=hello&after=INVALID_CURSOR'])
+def test_search_questions_bad_request(flask_client, mock_access_token, query):
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/search' + query, headers=headers)
+
+    assert 400 == res.status_code
+    assert res.get_json()['message']
+
+
+def test_search_questions_not_include_accesstoken(flask_client):
+    res = flask_client.get('questions/search?q=hello')
+
+    assert 401 == res.status_code
 
 
 def test_get_questions_not_include_accesstoken(flask_client):
@@ -77,7 +285,7 @@ def test_create_question_success(monkeypatch, flask_client, mock_access_token):
         questions = MockQuestions
 
     monkeypatch.setattr(controller, 'ObjectId', lambda value=None: value)
-    monkeypatch.setattr(controller, 'get_user', lambda user_id: {})
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
     monkeypatch.setattr(controller.storage, 'upload_file', lambda resource, file: None)
 
@@ -97,6 +305,78 @@ def test_create_question_success(monkeypatch, flask_client, mock_access_token):
     assert 201 == res.status_code
 
 
+def test_create_question_indexes_subtitle_cues(monkeypatch, flask_client, mock_access_token):
+    inserted = []
+
+    class MockDb:
+        class MockQuestions:
+            def insert(self, document):
+                inserted.append(document)
+
+        questions = MockQuestions()
+
+    monkeypatch.setattr(controller, 'ObjectId', lambda value=None: value)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller.storage, 'upload_file', lambda resource, file: None)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    form = {
+        'title': 'example title',
+        'contents': 'example contents',
+        'subtitles': '1\n00:00:01,000 --> 00:00:02,000\nHello\n',
+        'sound': (io.BytesIO(b"abc"), '00.mp3')
+    }
+
+    res = flask_client.post('questions', headers=headers, data=form)
+
+    assert 201 == res.status_code
+    assert {'starts': [1000], 'ends': [2000], 'texts': ['Hello']} == inserted[0]['subtitle_cues']
+    assert hash_subtitles(form['subtitles']) == inserted[0]['subtitles_hash']
+    assert 'subtitle_cues' not in res.get_json()
+
+
+def test_create_question_async_upload(monkeypatch, flask_client, mock_access_token):
+    inserted = []
+    submitted = []
+
+    class MockDb:
+        class MockQuestions:
+            def insert(self):
+                inserted.append(self)
+
+        questions = MockQuestions
+
+    monkeypatch.setattr(controller, 'ObjectId', lambda value=None: value)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller.uploads, 'mode', 'async')
+    monkeypatch.setattr(controller.uploads, 'spool', lambda resource, file: 'spool/sound/None.mp3')
+    monkeypatch.setattr(controller.uploads, 'submit', lambda *args: submitted.append(args))
+    monkeypatch.setattr(controller.storage, 'upload_file', lambda resource, file: pytest.fail())
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    form = {
+        'title': 'example title',
+        'contents': 'example contents',
+        'subtitles': 'example subtitles',
+        'sound': (io.BytesIO(b"abc"), '00.mp3')
+    }
+
+    res = flask_client.post('questions', headers=headers, data=form)
+
+    assert 201 == res.status_code
+    assert 'pending' == res.get_json()['media_status']
+    assert 'pending' == inserted[0]['media_status']
+    assert 'spool/sound/None.mp3' == submitted[0][2]
+
+
 def test_create_question_not_include_accesstoken(flask_client):
     res = flask_client.post('questions')
 
@@ -136,12 +416,11 @@ def test_create_question_unsupport_media_type(monkeypatch, flask_client, mock_ac
 
 
 def test_get_question_success(monkeypatch, flask_client, mock_access_token):
-    async def mock_add_read_to_question(a, b):
-        pass
+    recorded = []
 
     monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
-    monkeypatch.setattr(controller, 'get_user', lambda user_id: {})
-    monkeypatch.setattr(controller, 'add_read_to_question', mock_add_read_to_question)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+    monkeypatch.setattr(controller.views, 'record', lambda que_id, user_id: recorded.append((que_id, user_id)))
     monkeypatch.setattr(controller, 'get_question_by_id', lambda que_id: {
         'writer_id': 'VALID_USER_ID'
     })
@@ -153,6 +432,62 @@ def test_get_question_success(monkeypatch, flask_client, mock_access_token):
     res = flask_client.get('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
 
     assert 200 == res.status_code
+    assert [('VALID_QUESTION_ID', 'VALID_USER_ID')] == recorded
+
+
+def test_get_question_etag(monkeypatch, flask_client, mock_access_token):
+    recorded = []
+    fetched = []
+
+    def mock_get_question_by_id(que_id):
+        fetched.append(que_id)
+
+        return {'writer_id': 'VALID_USER_ID', 'version': 3}
+
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'load_writers', lambda records, use_cache=True: records)
+    monkeypatch.setattr(controller, 'change_markers', MockChangeMarkers({'users': 1}))
+    monkeypatch.setattr(controller.views, 'record', lambda que_id, user_id: recorded.append((que_id, user_id)))
+    monkeypatch.setattr(controller, 'get_question_by_id', mock_get_question_by_id)
+    monkeypatch.setattr(controller, 'get_question_version', lambda que_id: 3)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
+    etag = res.headers['ETag']
+
+    assert etag.startswith('W/')
+
+    headers['If-None-Match'] = etag
+    res = flask_client.get('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
+
+    assert 304 == res.status_code
+    assert etag == res.headers['ETag']
+    assert 1 == len(fetched)
+    assert 2 == len(recorded)
+
+    monkeypatch.setattr(controller, 'get_question_version', lambda que_id: 4)
+    res = flask_client.get('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
+
+    assert 200 == res.status_code
+    assert 2 == len(fetched)
+
+
+def test_get_question_etag_not_found_question(monkeypatch, flask_client, mock_access_token):
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'change_markers', MockChangeMarkers({}))
+    monkeypatch.setattr(controller, 'get_question_version', lambda que_id: None)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token),
+        'If-None-Match': '"ETAG"',
+    }
+
+    res = flask_client.get('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
+
+    assert 404 == res.status_code
 
 
 def test_get_question_not_include_accesstoken(flask_client):
@@ -204,7 +539,14 @@ def test_remove_question_success(monkeypatch, flask_client, mock_access_token):
             def delete_one(self):
                 return {}
 
+        class MockAnswers:
+            def delete_many(self, query):
+                deleted.append(query)
+
         questions = MockQuestions
+        answers = MockAnswers()
+
+    deleted = []
 
     user_id = 'VALID_USER_ID'
 
@@ -222,6 +564,7 @@ def test_remove_question_success(monkeypatch, flask_client, mock_access_token):
     res = flask_client.delete('questions/{}'.format('VALID_QUESTION_ID'), headers=headers)
 
     assert 204 == res.status_code
+    assert [{"question_id": 'VALID_QUESTION_ID'}] == deleted
 
 
 def test_remove_question_not_include_accesstoken(flask_client):
@@ -283,21 +626,179 @@ def test_remove_question_not_equal_userid(monkeypatch, flask_client, mock_access
     assert res.get_json()['message']
 
 
+def test_get_subtitles_window(monkeypatch, flask_client, mock_access_token):
+    cues = Cues([0, 1000, 2500], [1000, 2500, 4000], ['first', 'second', 'third'])
+
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'get_subtitle_cues', lambda que_id: (cues, 1))
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/VALID_QUESTION_ID/subtitles?from=1.2&to=2.5', headers=headers)
+
+    assert 200 == res.status_code
+    assert [{'start': 1.0, 'end': 2.5, 'text': 'second'}, {'start': 2.5, 'end': 4.0, 'text': 'third'}] == \
+        res.get_json()
+
+    res = flask_client.get('questions/VALID_QUESTION_ID/subtitles', headers=headers)
+
+    assert ['first', 'second', 'third'] == [cue['text'] for cue in res.get_json()]
+
+
+@pytest.mark.parametrize('window', ['from=-1', 'from=3&to=2', 'from=NOT_NUMBER'])
+def test_get_subtitles_invalid_window(monkeypatch, flask_client, mock_access_token, window):
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/VALID_QUESTION_ID/subtitles?' + window, headers=headers)
+
+    assert 400 == res.status_code
+
+
+def test_get_subtitles_not_found(monkeypatch, flask_client, mock_access_token):
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'get_subtitle_cues', lambda que_id: (None, None))
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    assert 404 == flask_client.get('questions/VALID_QUESTION_ID/subtitles', headers=headers).status_code
+    assert 404 == flask_client.get('questions/VALID_QUESTION_ID/subtitles.vtt', headers=headers).status_code
+
+
+def test_get_subtitles_vtt(monkeypatch, flask_client, mock_access_token):
+    cues = Cues([0], [1000], ['first'])
+
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'get_subtitle_cues', lambda que_id: (cues, 1))
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('questions/VALID_QUESTION_ID/subtitles.vtt', headers=headers)
+
+    assert 200 == res.status_code
+    assert 'text/vtt' == res.mimetype
+    assert b'WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nfirst\n' == res.get_data()
+
+    headers['If-None-Match'] = res.headers['ETag']
+    res = flask_client.get('questions/VALID_QUESTION_ID/subtitles.vtt', headers=headers)
+
+    assert 304 == res.status_code
+
+
 def test_get_sound_success(monkeypatch, flask_client):
     expected_audio_io = b'abc'
-    expected_content_type = 'audio'
+    expected_content_type = 'audio/mpeg'
 
-    monkeypatch.setattr(controller.storage, 'fetch_file', lambda resource, name: (expected_audio_io, name))
+    monkeypatch.setattr(controller.storage, 'open_file', lambda resource, name, byte_range, conditions:
+                        StoredFile(iter([expected_audio_io]), 3, 3, None))
 
     res = flask_client.get('questions/sound/EXIST_FILE.mp3')
 
     assert 200 == res.status_code
     assert expected_content_type == res.headers['Content-Type']
+    assert 'bytes' == res.headers['Accept-Ranges']
+    assert '3' == res.headers['Content-Length']
     assert expected_audio_io == res.data
 
 
+def test_get_sound_partial_content(monkeypatch, flask_client):
+    requested = []
+
+    def mock_open_file(resource, name, byte_range, conditions):
+        requested.append(byte_range)
+
+        return StoredFile(iter([b'bc']), 2, 3, (1, 3))
+
+    monkeypatch.setattr(controller.storage, 'open_file', mock_open_file)
+
+    res = flask_client.get('questions/sound/EXIST_FILE.m4a', headers={'Range': 'bytes=1-'})
+
+    assert 206 == res.status_code
+    assert [(1, None)] == requested
+    assert 'audio/mp4' == res.headers['Content-Type']
+    assert 'bytes 1-2/3' == res.headers['Content-Range']
+    assert b'bc' == res.data
+
+
+def test_get_sound_validators(monkeypatch, flask_client):
+    last_modified = datetime.datetime(2019, 1, 14, 3, 0, 0)
+
+    monkeypatch.setattr(controller.storage, 'open_file', lambda resource, name, byte_range, conditions:
+                        StoredFile(iter([b'abc']), 3, 3, None, last_modified, 'VALID_ETAG'))
+
+    res = flask_client.get('questions/sound/EXIST_FILE.mp3')
+
+    assert 200 == res.status_code
+    assert '"VALID_ETAG"' == res.headers['ETag']
+    assert 'Mon, 14 Jan 2019 03:00:00 GMT' == res.headers['Last-Modified']
+
+
+def test_get_sound_not_modified(monkeypatch, flask_client):
+    requested = []
+
+    def mock_open_file(resource, name, byte_range, conditions):
+        requested.append(conditions)
+
+        raise NotModified('VALID_ETAG')
+
+    monkeypatch.setattr(controller.storage, 'open_file', mock_open_file)
+
+    res = flask_client.get('questions/sound/EXIST_FILE.mp3', headers={'If-None-Match': '"VALID_ETAG"'})
+
+    assert 304 == res.status_code
+    assert '"VALID_ETAG"' == res.headers['ETag']
+    assert b'' == res.data
+    assert requested[0].if_none_match.contains('VALID_ETAG')
+
+
+def test_get_sound_range_not_satisfiable(monkeypatch, flask_client):
+    def mock_open_file(resource, name, byte_range, conditions):
+        raise RangeNotSatisfiable(3)
+
+    monkeypatch.setattr(controller.storage, 'open_file', mock_open_file)
+
+    res = flask_client.get('questions/sound/EXIST_FILE.mp3', headers={'Range': 'bytes=10-'})
+
+    assert 416 == res.status_code
+    assert 'bytes */3' == res.headers['Content-Range']
+
+
+def test_get_sound_redirect(monkeypatch, flask_client):
+    expected_url = 'https://s3.example.com/sound/EXIST_FILE.mp3?signature'
+
+    monkeypatch.setattr(controller.storage, 'delivery_mode', 'redirect')
+    monkeypatch.setattr(controller.storage, 'presigned_url', lambda resource, name: expected_url)
+
+    res = flask_client.get('questions/sound/EXIST_FILE.mp3')
+
+    assert 302 == res.status_code
+    assert expected_url == res.headers['Location']
+
+
+def test_get_sound_accel_redirect(monkeypatch, flask_client):
+    monkeypatch.setattr(controller.storage, 'delivery_mode', 'x-accel-redirect')
+    monkeypatch.setattr(controller.storage, 'accel_redirect_path', lambda resource, name:
+                        '/protected-media/sound/' + name, raising=False)
+
+    res = flask_client.get('questions/sound/EXIST_FILE.mp3')
+
+    assert 200 == res.status_code
+    assert '/protected-media/sound/EXIST_FILE.mp3' == res.headers['X-Accel-Redirect']
+    assert 'audio/mpeg' == res.headers['Content-Type']
+    assert b'' == res.data
+
+
 def test_get_sound_not_found(monkeypatch, flask_client):
-    monkeypatch.setattr(controller.storage, 'fetch_file', lambda resource, name: None)
+    monkeypatch.setattr(controller.storage, 'open_file', lambda resource, name, byte_range, conditions: None)
 
     res = flask_client.get('questions/sound/NOT_EXIST_FILE.mp3')
 
@@ -321,15 +822,177 @@ def test_get_questions(monkeypatch):
     assert result
 
 
-def test_get_question_by_id(monkeypatch):
+def test_get_questions_after_cursor(monkeypatch):
+    pipelines = []
+
     class MockDb:
         class MockQuestions:
             def aggregate(self):
-                return [
-                    {
-                        '_id': 'VALID_QUESTION_ID'
-                    }
-                ]
+                pipelines.append(self)
+
+                return []
+
+        questions = MockQuestions
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    controller.get_questions(0, 3, (100, ObjectId()))
+
+    assert '$or' in pipelines[0][0]['$match']
+    assert {"created_date": -1, "_id": -1} == pipelines[0][1]['$sort']
+    assert not any('$addFields' in stage for stage in pipelines[0])
+
+
+def test_get_questions_by_ids_pipeline(monkeypatch):
+    pipelines = []
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self):
+                pipelines.append(self)
+
+                return []
+
+        questions = MockQuestions
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    ids = [ObjectId(), ObjectId()]
+    controller.get_questions_by_ids(ids)
+
+    assert {"_id": {"$in": ids}} == pipelines[0][0]['$match']
+    assert 0 == pipelines[0][1]['$project']['read']
+
+
+def test_search_questions(monkeypatch):
+    pipelines = []
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self):
+                pipelines.append(self)
+
+                return []
+
+        questions = MockQuestions
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    controller.search_questions('hello', 0, 10)
+    controller.search_questions('hello', 0, 10, (1.5, ObjectId()), with_subtitles=True)
+
+    assert {"$text": {"$search": "hello"}} == pipelines[0][0]['$match']
+    assert {"score": -1, "_id": -1} == pipelines[0][2]['$sort']
+    assert 0 == pipelines[0][-1]['$project']['subtitles']
+
+    assert '$or' in pipelines[1][2]['$match']
+    assert 'subtitles' not in pipelines[1][-1]['$project']
+
+
+def test_get_subtitle_cues(monkeypatch, flask_app):
+    found = []
+
+    class MockDb:
+        class MockQuestions:
+            def find_one(self, query, projection):
+                found.append(projection)
+
+                if 'subtitles_hash' in projection:
+                    return {'_id': query['_id'], 'subtitles_hash': 'HASH'}
+
+                return {'_id': query['_id'], 'subtitles': '00:00:01,000 --> 00:00:02,000\nlegacy'}
+
+        questions = MockQuestions()
+
+    cache = SubtitleCache()
+    cache.init_app(flask_app)
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'subtitle_cache', cache)
+
+    cues, subtitles_hash = controller.get_subtitle_cues('VALID_QUESTION_ID')
+    cached, _ = controller.get_subtitle_cues('VALID_QUESTION_ID')
+
+    assert 'HASH' == subtitles_hash
+    assert ['legacy'] == cues.texts
+    assert cues is cached
+    assert 3 == len(found)
+
+
+def test_get_subtitle_cues_stores_missing_hash(monkeypatch, flask_app):
+    subtitles = '00:00:01,000 --> 00:00:02,000\nlegacy'
+    updated = []
+
+    class MockDb:
+        class MockQuestions:
+            def find_one(self, query, projection):
+                if 'subtitles_hash' in projection:
+                    return {'_id': query['_id']}
+
+                return {'_id': query['_id'], 'subtitles': subtitles}
+
+            def update_one(self, query, update):
+                updated.append((query, update))
+
+        questions = MockQuestions()
+
+    cache = SubtitleCache()
+    cache.init_app(flask_app)
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'subtitle_cache', cache)
+
+    cues, subtitles_hash = controller.get_subtitle_cues('VALID_QUESTION_ID')
+
+    assert hash_subtitles(subtitles) == subtitles_hash
+    assert {"$exists": False} == updated[0][0]['subtitles_hash']
+    assert subtitles_hash == updated[0][1]['$set']['subtitles_hash']
+    assert cues is cache.get('VALID_QUESTION_ID', subtitles_hash)
+
+
+def test_get_subtitle_cues_not_found(monkeypatch):
+    class MockDb:
+        class MockQuestions:
+            def find_one(self, query, projection):
+                return None
+
+        questions = MockQuestions()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    assert (None, None) == controller.get_subtitle_cues('VALID_QUESTION_ID')
+
+
+def test_set_media_status(monkeypatch):
+    updated = []
+
+    class MockDb:
+        class MockQuestions:
+            def update_one(self, query):
+                updated.append(query)
+
+        questions = MockQuestions
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    controller.set_media_status('VALID_QUESTION_ID', True)
+    controller.set_media_status('VALID_QUESTION_ID', False)
+
+    assert ['ready', 'failed'] == [update['$set']['media_status'] for update in updated]
+    assert all({"version": 1} == update['$inc'] for update in updated)
+
+
+def test_get_question_by_id(monkeypatch):
+    class MockDb:
+        class MockQuestions:
+            def find_one(self, projection):
+                assert {"answers": 0, "read": 0, "subtitle_cues": 0, "subtitles_hash": 0} == projection
+
+                return {
+                    '_id': 'VALID_QUESTION_ID',
+                    'num_of_view': 1,
+                    'num_of_answers': 2
+                }
 
         questions = MockQuestions
 
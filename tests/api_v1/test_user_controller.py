@@ -7,8 +7,12 @@ from flask_restplus import Api
 from flask_jwt_extended import JWTManager, create_access_token
 
 from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 
 from voicereader.api_v1.user import controller
+from voicereader.services.stored_file import StoredFile
+from voicereader.services.firebase_auth import IdTokenVerifier
+from voicereader.services.user_cache import UserCache
 
 
 @pytest.fixture(scope='function')
@@ -57,7 +61,7 @@ def test_user_create_success(monkeypatch, flask_client):
                 pass
         users = MockUsers()
 
-    monkeypatch.setattr(controller.auth, 'verify_id_token', lambda id_token: mock_decoded_token)
+    monkeypatch.setattr(controller.id_tokens, 'verify', lambda id_token: mock_decoded_token)
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
 
     headers = {
@@ -95,7 +99,7 @@ def test_user_create_invalid_idtoken(monkeypatch, flask_client):
     def mock_verify_id_token(id_token):
         raise ValueError()
 
-    monkeypatch.setattr(controller.auth, 'verify_id_token', mock_verify_id_token)
+    monkeypatch.setattr(controller.id_tokens, 'verify', mock_verify_id_token)
 
     headers = {
         'Authorization': 'INVALID_ID_TOKEN',
@@ -145,7 +149,7 @@ def test_user_create_already_exists_user(monkeypatch, flask_client):
         'email': 'example@example.exa'
     }
 
-    monkeypatch.setattr(controller.auth, 'verify_id_token', lambda id_token: mock_decoded_token)
+    monkeypatch.setattr(controller.id_tokens, 'verify', lambda id_token: mock_decoded_token)
     monkeypatch.setattr(controller.mongo, 'db', MockDb())
 
     headers = {
@@ -161,6 +165,45 @@ def test_user_create_already_exists_user(monkeypatch, flask_client):
     assert res.get_json()['message']
 
 
+def test_users_get_by_ids(monkeypatch, mock_access_token, flask_client):
+    first, second, missing = ObjectId(), ObjectId(), ObjectId()
+
+    monkeypatch.setattr(controller, 'get_public_users', lambda ids: [
+        {'_id': first, 'display_name': 'first', 'email': 'first@example.com', 'fcm_uid': 'first'},
+        {'_id': second, 'display_name': 'second'},
+    ])
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('users?ids={},{},{}'.format(second, missing, first), headers=headers)
+
+    assert 200 == res.status_code
+    assert ['second', 'first'] == [user['display_name'] for user in res.get_json()]
+    assert all('email' not in user and 'fcm_uid' not in user for user in res.get_json())
+    assert str(missing) == res.headers['X-Missing-Ids']
+
+
+@pytest.mark.parametrize('query', ['', '?ids=', '?ids=INVALID_ID', '?ids=' + ','.join(str(ObjectId()) for _ in range(3))])
+def test_users_get_by_ids_bad_request(flask_app, flask_client, mock_access_token, query):
+    flask_app.config['USER_BULK_MAX_IDS'] = 2
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.get('users' + query, headers=headers)
+
+    assert 400 == res.status_code
+
+
+def test_users_get_by_ids_not_include_accesstoken(flask_client):
+    res = flask_client.get('users?ids={}'.format(ObjectId()))
+
+    assert 401 == res.status_code
+
+
 def test_user_get_success(monkeypatch, mock_access_token, flask_client):
     expected_user_id = '5c41b34c18283823a809ef4b'
 
@@ -268,6 +311,54 @@ def test_user_update_success(monkeypatch, flask_client, mock_access_token):
     assert 200 == res.status_code
 
 
+def test_user_update_whitelists_fields(monkeypatch, flask_client, mock_access_token):
+    updates = []
+
+    class MockDb:
+        class MockUsers:
+            def update_one(self, query, body):
+                updates.append(body)
+
+                class MockResult:
+                    matched_count = 1
+
+                return MockResult()
+
+        users = MockUsers()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token),
+        'Content-Type': 'application/json'
+    }
+
+    res = flask_client.put('/users/{}'.format('VALID_USER_ID'), headers=headers, data=json.dumps({
+        '_id': 'OTHER_USER_ID',
+        'fcm_uid': 'OTHER_FIREBASE_UID',
+        'display_name': 'example name',
+        'unknown': 'value'
+    }))
+
+    assert 200 == res.status_code
+    assert [{"$set": {'display_name': 'example name'}}] == updates
+    assert {'display_name': 'example name'} == res.get_json()
+
+
+@pytest.mark.parametrize('payload', [{'display_name': 1}, {'fcm_uid': 'OTHER_FIREBASE_UID'}, []])
+def test_user_update_invalid_payload(flask_client, mock_access_token, payload):
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token),
+        'Content-Type': 'application/json'
+    }
+
+    res = flask_client.put('/users/{}'.format('VALID_USER_ID'), headers=headers, data=json.dumps(payload))
+
+    assert 400 == res.status_code
+    assert res.get_json()['message']
+
+
 def test_user_update_not_include_accesstoken(flask_client):
     headers = {
         'Content-Type': 'application/json'
@@ -543,9 +634,10 @@ def test_photo_upload_not_found_user(monkeypatch, mock_access_token, flask_clien
 
 def test_get_photo_success(monkeypatch, flask_client):
     expected_image_io = b'abc'
-    expected_content_type = 'image'
+    expected_content_type = 'image/png'
 
-    monkeypatch.setattr(controller.storage, 'fetch_file', lambda resource, name: (expected_image_io, name))
+    monkeypatch.setattr(controller.storage, 'open_file', lambda resource, name, byte_range, conditions:
+                        StoredFile(iter([expected_image_io]), 3, 3, None))
 
     res = flask_client.get('/users/00/photo/default_user_profile.png')
 
@@ -555,7 +647,7 @@ def test_get_photo_success(monkeypatch, flask_client):
 
 
 def test_get_photo_not_found(monkeypatch, flask_client):
-    monkeypatch.setattr(controller.storage, 'fetch_file', lambda resource, name: None)
+    monkeypatch.setattr(controller.storage, 'open_file', lambda resource, name, byte_range, conditions: None)
 
     res = flask_client.get('/users/00/photo/NOT_EXISTS_PROFILE.png')
 
@@ -611,7 +703,7 @@ def test_get_user(monkeypatch):
 def test_get_user_id(monkeypatch):
     class MockDb:
         class MockUsers:
-            def find_one(self, query):
+            def find_one(self, query, projection):
                 return {
                     '_id': expected_user_id,
                     'fcm_uid': expected_fcm_uid
@@ -627,3 +719,239 @@ def test_get_user_id(monkeypatch):
     user_id = controller.get_user_id(expected_fcm_uid)
 
     assert expected_user_id == user_id
+
+
+def test_get_user_id_cached(monkeypatch, flask_app):
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find_one(self, query, projection):
+                queries.append(query)
+
+                return {'_id': expected_user_id}
+
+        users = MockUsers()
+
+    expected_user_id = ObjectId()
+
+    flask_app.config['FIREBASE_CERTS_REFRESH_SEC'] = 0
+
+    id_tokens = IdTokenVerifier()
+    id_tokens.init_app(flask_app)
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'id_tokens', id_tokens)
+
+    controller.get_user_id('VALID_FIREBASE_UID')
+    user_id = controller.get_user_id('VALID_FIREBASE_UID')
+
+    assert str(expected_user_id) == user_id
+    assert 1 == len(queries)
+
+    id_tokens.forget_user_id(user_id)
+
+    assert id_tokens.get_user_id('VALID_FIREBASE_UID') is None
+
+
+def test_get_users(monkeypatch, flask_app):
+    expected_user_ids = [ObjectId(), ObjectId()]
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find(self, query):
+                queries.append(query)
+
+                return [{'_id': user_id} for user_id in query['_id']['$in']]
+
+        users = MockUsers()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    with flask_app.app_context():
+        users = controller.get_users(expected_user_ids + [str(expected_user_ids[0])])
+        controller.get_users(expected_user_ids)
+
+    assert 1 == len(queries)
+    assert set(expected_user_ids) == set(queries[0]['_id']['$in'])
+    assert set(expected_user_ids) == set(users.keys())
+
+
+def test_get_users_not_found_user(monkeypatch, flask_app):
+    class MockDb:
+        class MockUsers:
+            def find(self, query):
+                return []
+
+        users = MockUsers()
+
+    user_id = ObjectId()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+
+    with flask_app.app_context():
+        users = controller.get_users([user_id])
+
+    assert users[user_id] is None
+
+
+def test_load_writers(monkeypatch):
+    writer_id = ObjectId()
+    records = [{'writer_id': writer_id}, {'writer_id': str(writer_id)}]
+
+    monkeypatch.setattr(controller, 'get_users', lambda user_ids, use_cache=True: {writer_id: {'_id': writer_id}})
+
+    result = controller.load_writers(records)
+
+    assert all(record['writer']['_id'] == writer_id for record in result)
+
+
+def test_user_remove_invalidates_cache(monkeypatch, flask_client, mock_access_token):
+    class MockDb:
+        class MockUsers:
+            def delete_one(self, query):
+                class MockResult:
+                    deleted_count = 1
+
+                return MockResult()
+
+        users = MockUsers()
+
+    class MockUserCache:
+        def invalidate(self, user_id):
+            invalidated.append(user_id)
+
+    invalidated = []
+    expected_user_id = 'VALID_USER_ID'
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'ObjectId', lambda value: value)
+    monkeypatch.setattr(controller, 'user_cache', MockUserCache())
+
+    headers = {
+        'Authorization': 'Bearer {}'.format(mock_access_token)
+    }
+
+    res = flask_client.delete('/users/{}'.format(expected_user_id), headers=headers)
+
+    assert 204 == res.status_code
+    assert [expected_user_id] == invalidated
+
+
+def test_get_user_cached(monkeypatch, flask_app):
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find_one(self, query):
+                queries.append(query)
+
+                return {'_id': query['_id']}
+
+        users = MockUsers()
+
+    flask_app.config['USER_CACHE_SIZE'] = 8
+
+    user_cache = UserCache()
+    user_cache.init_app(flask_app)
+    user_id = ObjectId()
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'user_cache', user_cache)
+
+    controller.get_user(user_id)
+    user = controller.get_user(str(user_id))
+
+    assert 1 == len(queries)
+    assert user_id == user['_id']
+
+
+def test_get_users_uses_cache(monkeypatch, flask_app):
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find(self, query):
+                queries.append(query)
+
+                return [{'_id': user_id} for user_id in query['_id']['$in']]
+
+        users = MockUsers()
+
+    flask_app.config['USER_CACHE_SIZE'] = 8
+
+    user_cache = UserCache()
+    user_cache.init_app(flask_app)
+    cached_id, missing_id = ObjectId(), ObjectId()
+    user_cache.set(cached_id, {'_id': cached_id})
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'user_cache', user_cache)
+
+    with flask_app.app_context():
+        users = controller.get_users([cached_id, missing_id])
+
+    assert [missing_id] == queries[0]['_id']['$in']
+    assert {cached_id, missing_id} == set(users.keys())
+    assert user_cache.get(missing_id) is not None
+
+
+def test_get_users_without_cache(monkeypatch, flask_app):
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find(self, query):
+                queries.append(query)
+
+                return [{'_id': user_id, 'display_name': 'fresh'} for user_id in query['_id']['$in']]
+
+        users = MockUsers()
+
+    flask_app.config['USER_CACHE_SIZE'] = 8
+
+    user_cache = UserCache()
+    user_cache.init_app(flask_app)
+    cached_id = ObjectId()
+    user_cache.set(cached_id, {'_id': cached_id, 'display_name': 'stale'})
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'user_cache', user_cache)
+
+    with flask_app.app_context():
+        users = controller.get_users([cached_id], use_cache=False)
+
+    assert [cached_id] == queries[0]['_id']['$in']
+    assert 'fresh' == users[cached_id]['display_name']
+    assert 'fresh' == user_cache.get(cached_id)['display_name']
+
+
+def test_get_public_users(monkeypatch, flask_app):
+    queries = []
+
+    class MockDb:
+        class MockUsers:
+            def find(self, query, projection):
+                queries.append((query, projection))
+
+                return [{'_id': user_id} for user_id in query['_id']['$in']]
+
+        users = MockUsers()
+
+    flask_app.config['USER_CACHE_SIZE'] = 8
+
+    user_cache = UserCache()
+    user_cache.init_app(flask_app)
+    cached_id, missing_id = ObjectId(), ObjectId()
+    user_cache.set(cached_id, {'_id': cached_id})
+
+    monkeypatch.setattr(controller.mongo, 'db', MockDb())
+    monkeypatch.setattr(controller, 'user_cache', user_cache)
+
+    users = controller.get_public_users([cached_id, missing_id])
+
+    assert {cached_id, missing_id} == set(user['_id'] for user in users)
+    assert [missing_id] == queries[0][0]['_id']['$in']
+    assert {"email": 0, "fcm_uid": 0} == queries[0][1]
+    assert user_cache.get(missing_id) is None
@@ -0,0 +1,31 @@
+import pytest
+
+from bson import ObjectId
+
+from voicereader.extensions.bulk import TooManyIds, parse_object_ids, order_by_ids
+
+
+def test_parse_object_ids():
+    first, second = ObjectId(), ObjectId()
+
+    assert [first, second] == parse_object_ids(' {0}, {1},{0},'.format(first, second), 2)
+
+
+@pytest.mark.parametrize('value', ['', ' , ', 'INVALID_ID', '{},INVALID_ID'.format(ObjectId())])
+def test_parse_object_ids_invalid(value):
+    with pytest.raises(ValueError):
+        parse_object_ids(value, 10)
+
+
+def test_parse_object_ids_too_many():
+    with pytest.raises(TooManyIds):
+        parse_object_ids(','.join(str(ObjectId()) for _ in range(3)), 2)
+
+
+def test_order_by_ids():
+    first, second, missing = ObjectId(), ObjectId(), ObjectId()
+
+    ordered, missing_ids = order_by_ids([second, missing, first], [{'_id': first}, {'_id': second}])
+
+    assert [second, first] == [record['_id'] for record in ordered]
+    assert [str(missing)] == missing_ids
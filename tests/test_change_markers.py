@@ -0,0 +1,92 @@
+import pytest
+
+from voicereader.services import change_markers
+from voicereader.services.change_markers import ChangeMarkers, stamp, stamp_document, touch_markers
+
+
+class MockChangeMarkers:
+    def __init__(self, markers=None):
+        self.markers = markers or []
+        self.updates = []
+
+    def update_one(self, query, update, upsert):
+        assert upsert
+
+        self.updates.append((query['_id'], update))
+
+    def find(self, query, projection):
+        return [marker for marker in self.markers if marker['_id'] in query['_id']['$in']]
+
+
+@pytest.fixture(scope='function')
+def markers(monkeypatch):
+    class MockDb:
+        pass
+
+    mock_db = MockDb()
+    mock_db.change_markers = MockChangeMarkers([{'_id': 'questions', 'version': 3}])
+
+    monkeypatch.setattr(change_markers.mongo, 'db', mock_db, raising=False)
+
+    return mock_db.change_markers
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        ChangeMarkers().init_app(None)
+
+
+def test_init_app(flask_app):
+    markers = ChangeMarkers()
+    markers.init_app(flask_app)
+
+    assert markers.enabled
+    assert flask_app.extensions['change_markers'] is markers
+
+
+def test_stamp():
+    update = stamp({"$inc": {"num_of_answers": 1}, "$set": {"media_status": "ready"}})
+
+    assert {"num_of_answers": 1, "version": 1} == update['$inc']
+    assert "ready" == update['$set']['media_status']
+    assert 'updated_at' in update['$set']
+
+
+def test_stamp_document():
+    document = stamp_document({'title': 'title'})
+
+    assert 1 == document['version']
+    assert 'updated_at' in document
+
+
+def test_touch_markers(markers):
+    touch_markers(change_markers.mongo.db, 'questions', 'users')
+
+    assert ['questions', 'users'] == [name for name, update in markers.updates]
+    assert all({"version": 1} == update['$inc'] for name, update in markers.updates)
+
+
+def test_versions(markers, flask_app):
+    service = ChangeMarkers()
+    service.init_app(flask_app)
+
+    assert (3, 0) == service.versions('questions', 'users')
+
+
+def test_disabled(markers, flask_app):
+    flask_app.config['ETAG_ENABLED'] = False
+
+    service = ChangeMarkers()
+    service.init_app(flask_app)
+    service.touch('questions')
+
+    assert service.versions('questions') is None
+    assert [] == markers.updates
+
+
+def test_uninitialized(markers):
+    service = ChangeMarkers()
+    service.touch('questions')
+
+    assert service.versions('questions') is None
+    assert [] == markers.updates
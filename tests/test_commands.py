@@ -0,0 +1,264 @@
+from bson import ObjectId
+
+from voicereader import commands
+from voicereader.services import upload_worker
+from voicereader.services.upload_worker import UploadWorker
+from voicereader.services.indexes import Index, IndexReport
+
+
+class MockBulkWriteResult:
+    def __init__(self, requests):
+        self.matched_count = len(requests)
+
+
+def test_backfill_question_counters(monkeypatch, flask_app):
+    question_id = ObjectId()
+    written = []
+    touched = []
+    counted = []
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self, pipelines):
+                return iter([{'_id': question_id, 'num_of_view': 0, 'num_of_answers': 2, 'stored_num_of_answers': 4}])
+
+            def bulk_write(self, requests, ordered):
+                written.extend(requests)
+
+                return MockBulkWriteResult(requests)
+
+        class MockAnswers:
+            def aggregate(self, pipelines):
+                counted.append(pipelines[0]['$match']['question_id']['$in'])
+
+                return [{'_id': question_id, 'count': 3}]
+
+        class MockChangeMarkers:
+            def update_one(self, query, update, upsert):
+                touched.append(query['_id'])
+
+        questions = MockQuestions()
+        answers = MockAnswers()
+        change_markers = MockChangeMarkers()
+
+    monkeypatch.setattr(commands.mongo, 'db', MockDb())
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['backfill-question-counters'])
+
+    assert 0 == result.exit_code
+    assert 'Backfilled 2 question counters' in result.output
+    assert 'Skipped' not in result.output
+
+    view_update, answers_update = [request._doc for request in written]
+    view_filter, answers_filter = [request._filter for request in written]
+
+    assert [[question_id]] == counted
+    assert {"$set": {"num_of_view": 0}} == view_update
+    assert 5 == answers_update['$set']['num_of_answers']
+    assert {"version": 1} == answers_update['$inc']
+    assert ['questions'] == touched
+    assert question_id == view_filter['_id']
+    assert {"$size": 2} == answers_filter['answers']
+    assert 4 == answers_filter['num_of_answers']
+
+
+def test_backfill_question_counters_skips_changed(monkeypatch, flask_app):
+    class MockPartialBulkWriteResult:
+        matched_count = 1
+
+    class MockDb:
+        class MockQuestions:
+            def aggregate(self, pipelines):
+                return iter([{'_id': ObjectId(), 'num_of_view': 0, 'num_of_answers': 0}])
+
+            def bulk_write(self, requests, ordered):
+                return MockPartialBulkWriteResult()
+
+        class MockAnswers:
+            def aggregate(self, pipelines):
+                return []
+
+        class MockChangeMarkers:
+            def update_one(self, query, update, upsert):
+                pass
+
+        questions = MockQuestions()
+        answers = MockAnswers()
+        change_markers = MockChangeMarkers()
+
+    monkeypatch.setattr(commands.mongo, 'db', MockDb())
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['backfill-question-counters'])
+
+    assert 0 == result.exit_code
+    assert 'Backfilled 1 question counters' in result.output
+    assert 'Skipped 1 question counters' in result.output
+
+
+def test_sweep_uploads(monkeypatch, flask_app, tmpdir):
+    spooled_id, lost_id, orphan_id = ObjectId(), ObjectId(), ObjectId()
+    statuses = []
+    uploaded = []
+
+    class MockStorage:
+        def upload_file(self, resource, file):
+            uploaded.append((resource, file.filename, file.content_type))
+
+    class MockDb:
+        class MockQuestions:
+            def find(self, query, projection):
+                if 'created_date' in query:
+                    return [
+                        {'_id': spooled_id, 'sound_url': 'http://host/questions/sound/{}.mp3'.format(spooled_id)},
+                        {'_id': lost_id, 'sound_url': 'http://host/questions/sound/{}.mp3'.format(lost_id)},
+                    ]
+
+                return []
+
+        questions = MockQuestions()
+
+    flask_app.config['UPLOAD_SPOOL_PATH'] = str(tmpdir)
+    monkeypatch.setattr(upload_worker.atexit, 'register', lambda func: None)
+
+    uploads = UploadWorker()
+    uploads.init_app(flask_app)
+
+    tmpdir.mkdir('sound')
+    tmpdir.join('sound', '{}.mp3'.format(spooled_id)).write_binary(b'abc')
+    orphan = tmpdir.join('sound', '{}.mp3'.format(orphan_id))
+    orphan.write_binary(b'abc')
+    orphan.setmtime(0)
+
+    monkeypatch.setattr(commands.mongo, 'db', MockDb())
+    monkeypatch.setattr(commands, 'uploads', uploads)
+    monkeypatch.setattr(commands, 'storage', MockStorage())
+    monkeypatch.setattr(commands, 'set_media_status', lambda obj_id, ok: statuses.append((obj_id, ok)))
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['sweep-uploads'])
+
+    assert 0 == result.exit_code
+    assert 'Uploaded 1 and failed 1 stale uploads, removed 1 orphaned spool files' in result.output
+    assert [('sound/', '{}.mp3'.format(spooled_id), 'audio/mpeg')] == uploaded
+    assert [(spooled_id, True), (lost_id, False)] == statuses
+    assert [] == tmpdir.join('sound').listdir()
+
+
+def test_sync_indexes(monkeypatch, flask_app):
+    report = IndexReport('users', [Index([('fcm_uid', 1)], unique=True)], ['nickname_1'], [])
+    calls = []
+
+    def mock_sync_indexes(db, drop_extra, dry_run):
+        calls.append((drop_extra, dry_run))
+
+        return [report]
+
+    monkeypatch.setattr(commands, 'sync_indexes', mock_sync_indexes)
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['sync-indexes', '--dry-run'])
+
+    assert 0 == result.exit_code
+    assert [(False, True)] == calls
+    assert 'users: missing fcm_uid_1' in result.output
+    assert 'users: extra nickname_1' in result.output
+    assert 'Index differences were reported' in result.output
+
+
+def test_sync_indexes_up_to_date(monkeypatch, flask_app):
+    monkeypatch.setattr(commands, 'sync_indexes', lambda db, drop_extra, dry_run: [IndexReport('users', [], [], [])])
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['sync-indexes'])
+
+    assert 0 == result.exit_code
+    assert 'Indexes are up to date' in result.output
+
+
+class MockAnswersCollection:
+    def __init__(self):
+        self.upserts = []
+        self.deleted = []
+
+    def bulk_write(self, requests, ordered):
+        self.upserts.extend(requests)
+
+    def delete_many(self, query):
+        self.deleted.append(query)
+
+
+def test_migrate_answers(monkeypatch, flask_app):
+    question_id = ObjectId()
+    answer_ids = [ObjectId(), ObjectId()]
+    answers = MockAnswersCollection()
+    updates = []
+
+    class MockDb:
+        class MockQuestions:
+            def find(self, query, projection, batch_size):
+                assert {"answers.0": {"$exists": True}} == query
+
+                return [{'_id': question_id, 'answers': [
+                    {'_id': answer_ids[0], 'contents': 'first'},
+                    {'_id': answer_ids[1], 'contents': 'second', 'question_id': question_id},
+                ]}]
+
+            def find_one_and_update(self, query, update, projection, return_document):
+                assert {"$in": answer_ids} == update['$pull']['answers']['_id']
+
+                # the second answer was deleted through the API after it had been copied
+                return {'_id': question_id, 'answers': [{'_id': answer_ids[0]}]}
+
+            def update_one(self, query, update):
+                updates.append((query, update))
+
+        questions = MockQuestions()
+
+    MockDb.answers = answers
+
+    monkeypatch.setattr(commands.mongo, 'db', MockDb())
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['migrate-answers'])
+
+    assert 0 == result.exit_code
+    assert 'Moved 1 answers' in result.output
+
+    upsert = answers.upserts[0]
+
+    assert {"_id": answer_ids[0]} == upsert._filter
+    assert {"$setOnInsert": {'contents': 'first', 'question_id': question_id}} == upsert._doc
+    assert upsert._upsert
+    assert [{"_id": {"$in": [answer_ids[1]]}}] == answers.deleted
+    assert [({"_id": question_id, "answers": {"$size": 0}}, {"$unset": {"answers": ""}})] == updates
+
+
+def test_migrate_answers_deleted_question(monkeypatch, flask_app):
+    question_id = ObjectId()
+    answer_id = ObjectId()
+    answers = MockAnswersCollection()
+
+    class MockDb:
+        class MockQuestions:
+            def find(self, query, projection, batch_size):
+                return [{'_id': question_id, 'answers': [{'_id': answer_id}]}]
+
+            def find_one_and_update(self, query, update, projection, return_document):
+                return None
+
+            def update_one(self, query, update):
+                pass
+
+        questions = MockQuestions()
+
+    MockDb.answers = answers
+
+    monkeypatch.setattr(commands.mongo, 'db', MockDb())
+
+    commands.init_app(flask_app)
+    result = flask_app.test_cli_runner().invoke(args=['migrate-answers'])
+
+    assert 'Moved 0 answers' in result.output
+    assert [{"_id": {"$in": [answer_id]}}] == answers.deleted
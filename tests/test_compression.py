@@ -0,0 +1,140 @@
+import gzip
+import json
+
+import pytest
+
+from flask import Response, jsonify
+from prometheus_client import REGISTRY
+
+from voicereader.extensions import compression as compression_module
+from voicereader.extensions.compression import Compression
+
+LARGE_BODY = {'subtitles': 'subtitle line\n' * 200}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(scope='function')
+def compression(flask_app):
+    flask_app.config['COMPRESSION_MIN_SIZE'] = 512
+
+    compression = Compression()
+    compression.init_app(flask_app)
+
+    @flask_app.route('/large')
+    def large():
+        return jsonify(LARGE_BODY)
+
+    @flask_app.route('/small')
+    def small():
+        return jsonify({'ping': 'pong'})
+
+    @flask_app.route('/etag')
+    def etag():
+        response = jsonify(LARGE_BODY)
+        response.set_etag('VERSION')
+
+        return response
+
+    @flask_app.route('/sound')
+    def sound():
+        return Response(b'\0' * 4096, mimetype='audio/mpeg')
+
+    @flask_app.route('/stream')
+    def stream():
+        return Response(iter([b'{}'] * 1024), mimetype='application/json', direct_passthrough=True)
+
+    return compression
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        Compression().init_app(None)
+
+
+def test_init_app(flask_app, compression):
+    assert flask_app.extensions['compression'] is compression
+    assert 512 == compression.min_size
+
+
+def test_compress_gzip(flask_client, compression):
+    compressed = sample('voicereader_compression_latency_seconds_count', encoding='gzip')
+    bytes_in = sample('voicereader_compression_input_bytes_total', encoding='gzip')
+    bytes_out = sample('voicereader_compression_output_bytes_total', encoding='gzip')
+
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'gzip' == res.headers['Content-Encoding']
+    assert 'Accept-Encoding' in res.headers['Vary']
+    assert int(res.headers['Content-Length']) == len(res.get_data())
+    assert LARGE_BODY == json.loads(gzip.decompress(res.get_data()).decode('utf-8'))
+
+    assert compressed + 1 == sample('voicereader_compression_latency_seconds_count', encoding='gzip')
+    assert bytes_out + len(res.get_data()) == sample('voicereader_compression_output_bytes_total', encoding='gzip')
+    assert bytes_in + len(res.get_data()) < sample('voicereader_compression_input_bytes_total', encoding='gzip')
+
+
+@pytest.mark.skipif(compression_module.brotli is None, reason='brotli is not installed')
+def test_compress_brotli(flask_client, compression):
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+    assert 'br' == res.headers['Content-Encoding']
+    assert LARGE_BODY == json.loads(compression_module.brotli.decompress(res.get_data()).decode('utf-8'))
+
+
+def test_compress_prefers_quality(flask_client, compression):
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+
+    assert 'gzip' == res.headers['Content-Encoding']
+
+
+def test_compress_brotli_not_installed(monkeypatch, flask_client, compression):
+    monkeypatch.setattr(compression_module, 'brotli', None)
+
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'br'})
+
+    assert 'Content-Encoding' not in res.headers
+    assert 'Accept-Encoding' in res.headers['Vary']
+
+
+def test_compress_not_accepted(flask_client, compression):
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'identity'})
+
+    assert 'Content-Encoding' not in res.headers
+    assert 'Accept-Encoding' in res.headers['Vary']
+    assert LARGE_BODY == res.get_json()
+
+
+def test_compress_below_threshold(flask_client, compression):
+    res = flask_client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in res.headers
+    assert 'Vary' not in res.headers
+
+
+def test_compress_weakens_etag(flask_client, compression):
+    res = flask_client.get('/etag', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'W/"VERSION"' == res.headers['ETag']
+
+
+@pytest.mark.parametrize('path', ['/sound', '/stream'])
+def test_compress_skips_media_and_streams(flask_client, compression, path):
+    res = flask_client.get(path, headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in res.headers
+
+
+def test_compress_disabled(flask_app, flask_client):
+    flask_app.config['COMPRESSION_ENABLED'] = False
+    Compression().init_app(flask_app)
+
+    @flask_app.route('/large')
+    def large():
+        return jsonify(LARGE_BODY)
+
+    res = flask_client.get('/large', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in res.headers
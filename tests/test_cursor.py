@@ -0,0 +1,56 @@
+import pytest
+
+from bson import ObjectId
+from voicereader.extensions.cursor import encode_cursor, decode_cursor, after_cursor_query, after_cursor_expression
+
+
+def test_encode_decode_cursor():
+    expected_created_date = 1547405521.0
+    expected_id = ObjectId()
+
+    cursor = encode_cursor(expected_created_date, expected_id)
+
+    assert (expected_created_date, expected_id) == decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('cursor', [None, '', 'INVALID_CURSOR', encode_cursor('NOT_NUMBER', ObjectId())])
+def test_decode_cursor_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_after_cursor_query():
+    obj_id = ObjectId()
+
+    query = after_cursor_query((100, obj_id))
+
+    assert {"created_date": {"$lt": 100}} in query['$or']
+    assert {"created_date": 100, "_id": {"$lt": obj_id}} in query['$or']
+
+
+def test_after_cursor_query_ascending():
+    obj_id = ObjectId()
+
+    query = after_cursor_query((100, obj_id), ascending=True)
+
+    assert {"created_date": {"$gt": 100}} in query['$or']
+    assert {"created_date": 100, "_id": {"$gt": obj_id}} in query['$or']
+
+
+def test_after_cursor_query_field():
+    obj_id = ObjectId()
+
+    query = after_cursor_query((1.5, obj_id), field='score')
+
+    assert {"score": {"$lt": 1.5}} in query['$or']
+    assert {"score": 1.5, "_id": {"$lt": obj_id}} in query['$or']
+
+
+def test_after_cursor_expression():
+    obj_id = ObjectId()
+
+    expression = after_cursor_expression((100, obj_id), 'answer')
+
+    assert {"$gt": ["$$answer.created_date", 100]} in expression['$or']
+    assert {"$and": [{"$eq": ["$$answer.created_date", 100]},
+                     {"$gt": ["$$answer._id", obj_id]}]} in expression['$or']
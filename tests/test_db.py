@@ -2,26 +2,24 @@ import pytest
 
 
 class MockMongo:
-    class MockDb:
-        class MockUsers:
-            def create_index(self, x, unique):
-                pass
+    event_listeners = None
 
-        users = MockUsers()
-
-    db = MockDb()
-
-    def init_app(self, app):
-        pass
+    def init_app(self, app, **kwargs):
+        self.event_listeners = kwargs.get('event_listeners')
 
 
 def test_init_app(monkeypatch, flask_app):
     from voicereader.services import db
 
-    monkeypatch.setattr(db, 'mongo', MockMongo())
+    from voicereader.services.metrics import MongoCommandListener
+
+    mongo = MockMongo()
+    monkeypatch.setattr(db, 'mongo', mongo)
 
     db.init_app(flask_app)
 
+    assert isinstance(mongo.event_listeners[0], MongoCommandListener)
+
 
 def test_init_app_none_app():
     from voicereader.services import db
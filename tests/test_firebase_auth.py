@@ -0,0 +1,231 @@
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, exceptions, jwt
+from prometheus_client import REGISTRY
+
+from voicereader.services.firebase_auth import IdTokenVerifier, ID_TOKEN_ISSUER_PREFIX
+
+PROJECT_ID = 'voicereader-test'
+KEY_ID = 'test-key'
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(scope='module')
+def signer():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM,
+                                            serialization.PrivateFormat.TraditionalOpenSSL,
+                                            serialization.NoEncryption())
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo)
+
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    signer.public_pem = public_pem.decode('utf-8')
+
+    return signer
+
+
+@pytest.fixture(scope='function')
+def key_server(signer):
+    class KeyServerHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.requests += 1
+
+            if server.status != 200:
+                self.send_response(server.status)
+                self.end_headers()
+                return
+
+            body = json.dumps({KEY_ID: signer.public_pem}).encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'public, max-age=600')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), KeyServerHandler)
+    server.requests = 0
+    server.status = 200
+    server.url = 'http://127.0.0.1:{}/certs'.format(server.server_port)
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='function')
+def verifier(flask_app, key_server):
+    flask_app.config['FIREBASE_CERTS_URL'] = key_server.url
+    flask_app.config['FIREBASE_CERTS_REFRESH_SEC'] = 0
+    flask_app.config['FIREBASE_PROJECT_ID'] = PROJECT_ID
+
+    verifier = IdTokenVerifier()
+    verifier.init_app(flask_app)
+
+    return verifier
+
+
+def make_token(signer, **claims):
+    now = int(time.time())
+
+    payload = {
+        'iss': ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        'aud': PROJECT_ID,
+        'sub': 'firebase_uid',
+        'iat': now,
+        'exp': now + 3600,
+    }
+    payload.update(claims)
+
+    return jwt.encode(signer, payload).decode('utf-8')
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        IdTokenVerifier().init_app(None)
+
+
+def test_init_app_registers_extension(flask_app, verifier):
+    assert flask_app.extensions['id_tokens'] is verifier
+
+
+def test_verify(signer, key_server, verifier):
+    claims = verifier.verify(make_token(signer))
+
+    assert 'firebase_uid' == claims['sub']
+    assert 'firebase_uid' == claims['uid']
+    assert 1 == key_server.requests
+
+
+def test_verify_cached_token(signer, key_server, verifier):
+    token = make_token(signer)
+    hits = sample('voicereader_cache_lookups_total', cache='id_token', result='hit')
+    misses = sample('voicereader_cache_lookups_total', cache='id_token', result='miss')
+
+    verifier.verify(token)
+    verifier.verify(token)
+
+    assert hits + 1 == sample('voicereader_cache_lookups_total', cache='id_token', result='hit')
+    assert misses + 1 == sample('voicereader_cache_lookups_total', cache='id_token', result='miss')
+
+
+def test_verify_cached_token_returns_copy(signer, verifier):
+    token = make_token(signer)
+
+    verifier.verify(token)['sub'] = 'changed'
+
+    assert 'firebase_uid' == verifier.verify(token)['sub']
+
+
+def test_verify_expired_cached_token(signer, verifier):
+    token = make_token(signer)
+    hits = sample('voicereader_cache_lookups_total', cache='id_token', result='hit')
+    misses = sample('voicereader_cache_lookups_total', cache='id_token', result='miss')
+
+    verifier.verify(token)
+    for claims in verifier._tokens.values():
+        claims['exp'] = time.time() - 1
+
+    verifier.verify(token)
+
+    assert hits == sample('voicereader_cache_lookups_total', cache='id_token', result='hit')
+    assert misses + 2 == sample('voicereader_cache_lookups_total', cache='id_token', result='miss')
+
+
+def test_verify_reuses_certs(signer, key_server, verifier):
+    verifier.verify(make_token(signer, sub='first'))
+    verifier.verify(make_token(signer, sub='second'))
+
+    assert 1 == key_server.requests
+
+
+def test_verify_invalid_token(verifier):
+    with pytest.raises(ValueError):
+        verifier.verify('INVALID_ID_TOKEN')
+
+
+def test_verify_empty_token(verifier):
+    with pytest.raises(ValueError):
+        verifier.verify('')
+
+
+def test_verify_wrong_audience(signer, verifier):
+    with pytest.raises(ValueError):
+        verifier.verify(make_token(signer, aud='other-project'))
+
+
+def test_verify_wrong_issuer(signer, verifier):
+    with pytest.raises(ValueError):
+        verifier.verify(make_token(signer, iss='https://example.com/'))
+
+
+def test_verify_expired_token(signer, verifier):
+    with pytest.raises(ValueError):
+        verifier.verify(make_token(signer, iat=int(time.time()) - 7200, exp=int(time.time()) - 3600))
+
+
+def test_refresh_certs(key_server, verifier):
+    started = time.time()
+
+    assert 600 == verifier.refresh_certs()
+    assert started <= sample('voicereader_firebase_certs_fetched_timestamp_seconds')
+
+
+def test_refresh_certs_failed(key_server, verifier):
+    key_server.status = 500
+    labels = {'service': 'firebase', 'operation': 'refresh_certs', 'outcome': 'error'}
+    failed = sample('voicereader_external_call_latency_seconds_count', **labels)
+
+    with pytest.raises(exceptions.TransportError):
+        verifier.refresh_certs()
+
+    assert failed + 1 == sample('voicereader_external_call_latency_seconds_count', **labels)
+
+
+def test_background_refresher_prefetches_certs(signer, flask_app, key_server):
+    flask_app.config['FIREBASE_CERTS_URL'] = key_server.url
+    flask_app.config['FIREBASE_CERTS_REFRESH_SEC'] = 60
+    flask_app.config['FIREBASE_PROJECT_ID'] = PROJECT_ID
+
+    verifier = IdTokenVerifier()
+    verifier.init_app(flask_app)
+
+    deadline = time.time() + 5
+    while verifier._certs is None and time.time() < deadline:
+        time.sleep(0.01)
+
+    verifier.verify(make_token(signer))
+
+    assert 1 == key_server.requests
+
+
+def test_user_id_cache(verifier):
+    verifier.set_user_id('firebase_uid', 'user_id')
+
+    assert 'user_id' == verifier.get_user_id('firebase_uid')
+
+    verifier.forget_user_id('user_id')
+
+    assert verifier.get_user_id('firebase_uid') is None
@@ -0,0 +1,118 @@
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+from voicereader.services.indexes import Index, compare_indexes, index_name, sync_indexes
+
+
+class MockCollection:
+    def __init__(self, name, information):
+        self.name = name
+        self.information = dict(information)
+        self.created = []
+        self.dropped = []
+
+    def index_information(self):
+        return self.information
+
+    def create_index(self, keys, **options):
+        self.created.append((keys, options))
+
+    def drop_index(self, name):
+        self.dropped.append(name)
+
+
+def id_index():
+    return {'_id_': {'key': [('_id', 1)], 'v': 2}}
+
+
+def test_index_name():
+    assert 'created_date_-1__id_-1' == index_name(Index([('created_date', DESCENDING), ('_id', DESCENDING)]))
+
+
+def test_compare_indexes_up_to_date():
+    information = id_index()
+    information['fcm_uid_1'] = {'key': [('fcm_uid', 1.0)], 'unique': True}
+
+    report = compare_indexes(MockCollection('users', information), [Index([('fcm_uid', ASCENDING)], unique=True)])
+
+    assert ([], [], []) == (report.missing, report.extra, report.wrong)
+
+
+def test_compare_indexes_missing_and_extra():
+    information = id_index()
+    information['nickname_1'] = {'key': [('nickname', 1)]}
+    index = Index([('writer_id', ASCENDING)])
+
+    report = compare_indexes(MockCollection('questions', information), [index])
+
+    assert [index] == report.missing
+    assert ['nickname_1'] == report.extra
+    assert [] == report.wrong
+
+
+def test_compare_indexes_wrong_type():
+    information = id_index()
+    information['fcm_uid_text'] = {'key': [('_fts', 'text'), ('_ftsx', 1)], 'weights': {'fcm_uid': 1},
+                                   'unique': True}
+    index = Index([('fcm_uid', ASCENDING)], unique=True)
+
+    report = compare_indexes(MockCollection('users', information), [index])
+
+    assert [] == report.missing
+    assert [] == report.extra
+    assert [('fcm_uid_text', index)] == report.wrong
+
+
+def test_compare_indexes_wrong_unique():
+    information = id_index()
+    information['fcm_uid_1'] = {'key': [('fcm_uid', 1)]}
+    index = Index([('fcm_uid', ASCENDING)], unique=True)
+
+    report = compare_indexes(MockCollection('users', information), [index])
+
+    assert [('fcm_uid_1', index)] == report.wrong
+
+
+def test_compare_text_indexes_with_weights():
+    information = id_index()
+    information['title_text_content_text'] = {'key': [('_fts', 'text'), ('_ftsx', 1)],
+                                              'weights': {'title': 10, 'content': 1}}
+    index = Index([('title', TEXT), ('content', TEXT)], weights={'title': 10})
+
+    report = compare_indexes(MockCollection('questions', information), [index])
+
+    assert ([], [], []) == (report.missing, report.extra, report.wrong)
+
+
+def test_sync_indexes():
+    users = MockCollection('users', dict(id_index(), fcm_uid_text={'key': [('_fts', 'text'), ('_ftsx', 1)],
+                                                                    'weights': {'fcm_uid': 1}}))
+    questions = MockCollection('questions', dict(id_index(), nickname_1={'key': [('nickname', 1)]}))
+    registry = {
+        'users': [Index([('fcm_uid', ASCENDING)], unique=True)],
+        'questions': [Index([('writer_id', ASCENDING)])],
+    }
+
+    sync_indexes({'users': users, 'questions': questions}, registry)
+
+    assert ['fcm_uid_text'] == users.dropped
+    assert [([('fcm_uid', ASCENDING)], {'name': 'fcm_uid_1', 'unique': True})] == users.created
+    assert [([('writer_id', ASCENDING)], {'name': 'writer_id_1', 'unique': False})] == questions.created
+    assert [] == questions.dropped
+
+
+def test_sync_indexes_drop_extra():
+    questions = MockCollection('questions', dict(id_index(), nickname_1={'key': [('nickname', 1)]}))
+
+    sync_indexes({'questions': questions}, {'questions': []}, drop_extra=True)
+
+    assert ['nickname_1'] == questions.dropped
+
+
+def test_sync_indexes_dry_run():
+    users = MockCollection('users', id_index())
+
+    reports = sync_indexes({'users': users}, {'users': [Index([('fcm_uid', ASCENDING)], unique=True)]},
+                           dry_run=True)
+
+    assert [] == users.created
+    assert 1 == len(reports[0].missing)
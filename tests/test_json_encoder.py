@@ -1,6 +1,10 @@
-from unittest import TestCase
+import datetime
+import json
+
+from unittest import TestCase, skipIf
 from bson import ObjectId
-from voicereader.extensions.json_encoder import JSONEncoder
+from voicereader.extensions import json_encoder
+from voicereader.extensions.json_encoder import JSONEncoder, OrjsonEncoder, get_json_encoder
 
 
 class JSONEncoderTests(TestCase):
@@ -15,6 +19,13 @@ class JSONEncoderTests(TestCase):
 
         assert expected == actual
 
+    def test_datetime_encode(self):
+        expected = '2019-01-13T12:30:00'
+
+        actual = self.json_encoder.default(datetime.datetime(2019, 1, 13, 12, 30))
+
+        assert expected == actual
+
     def test_undefined_model_encode(self):
         class Undefined:
             pass
@@ -23,3 +34,60 @@ class JSONEncoderTests(TestCase):
 
         with self.assertRaises(TypeError):
             self.json_encoder.default(undefined)
+
+
+@skipIf(json_encoder.orjson is None, 'orjson is not installed')
+class OrjsonEncoderTests(TestCase):
+    def test_encode_same_as_stdlib(self):
+        document = {
+            '_id': ObjectId('5c38b8df18283838d53dfe37'),
+            'title': 'title',
+            'created_date': 1547188815.0,
+            'updated': datetime.datetime(2019, 1, 13, 12, 30),
+            'answers': [{'_id': ObjectId(), 'contents': 'contents'}],
+        }
+
+        expected = json.loads(json.dumps(document, cls=JSONEncoder))
+        actual = json.loads(json.dumps(document, cls=OrjsonEncoder))
+
+        assert expected == actual
+
+    def test_encode_sort_keys(self):
+        assert '{"a":1,"b":2}' == json.dumps({'b': 2, 'a': 1}, cls=OrjsonEncoder, sort_keys=True)
+
+    def test_encode_non_string_keys(self):
+        # swagger.json keys responses by status code
+        assert json.dumps({200: 'OK'}) == json.dumps({200: 'OK'}, cls=OrjsonEncoder).replace(':', ': ')
+
+    def test_encode_indent(self):
+        assert json.dumps({'a': 1}, indent=2) == json.dumps({'a': 1}, cls=OrjsonEncoder, indent=2)
+        assert json.dumps({'a': 1}, indent=4) == json.dumps({'a': 1}, cls=OrjsonEncoder, indent=4)
+
+    def test_undefined_model_encode(self):
+        class Undefined:
+            pass
+
+        with self.assertRaises(TypeError):
+            json.dumps({'undefined': Undefined()}, cls=OrjsonEncoder)
+
+
+class GetJSONEncoderTests(TestCase):
+    def test_stdlib(self):
+        assert JSONEncoder is get_json_encoder('stdlib')
+
+    @skipIf(json_encoder.orjson is None, 'orjson is not installed')
+    def test_orjson(self):
+        assert OrjsonEncoder is get_json_encoder('orjson')
+
+    def test_orjson_not_installed(self):
+        orjson = json_encoder.orjson
+        json_encoder.orjson = None
+
+        try:
+            assert JSONEncoder is get_json_encoder('orjson')
+        finally:
+            json_encoder.orjson = orjson
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_json_encoder('unknown')
@@ -3,8 +3,9 @@ import os
 from flask import Flask
 
 from unittest import TestCase
-from werkzeug.datastructures import FileStorage
+from werkzeug.datastructures import FileStorage, ETags
 from voicereader.services.local_storage import LocalStorage
+from voicereader.services.stored_file import RangeNotSatisfiable, NotModified, Conditions
 from shutil import rmtree, copy
 
 
@@ -29,6 +30,25 @@ class LocalStorageTests(TestCase):
 
         assert expected_upload_path == self.storage._upload_path
 
+    def test_init_app_accel_redirect_delivery_mode(self):
+        flask_app = Flask(__name__)
+        flask_app.config['RESOURCE_UPLOAD_PATH'] = 'upload/'
+        flask_app.config['MEDIA_DELIVERY_MODE'] = 'x-accel-redirect'
+        flask_app.config['MEDIA_ACCEL_REDIRECT_PREFIX'] = '/internal/'
+
+        self.storage.init_app(flask_app)
+
+        assert 'x-accel-redirect' == self.storage.delivery_mode
+        assert '/internal/sound/00.mp3' == self.storage.accel_redirect_path('sound', '00.mp3')
+
+    def test_init_app_unsupported_delivery_mode(self):
+        flask_app = Flask(__name__)
+        flask_app.config['RESOURCE_UPLOAD_PATH'] = 'upload/'
+        flask_app.config['MEDIA_DELIVERY_MODE'] = 'redirect'
+
+        with self.assertRaises(ValueError):
+            self.storage.init_app(flask_app)
+
     def test_upload_file_ensure_save(self):
         resource = 'test-resource'
         filename = 'input.txt'
@@ -71,50 +91,90 @@ class LocalStorageTests(TestCase):
         with self.assertRaises(ValueError):
             self.storage.upload_file(resource, None)
 
-    def test_fetch_file_exists_file(self):
-        resource = 'test-resource'
-        filename = 'input.txt'
-        upload_path = 'upload/'
+    def _copy_input_file(self, resource, filename):
+        self.storage._upload_path = 'upload/'
 
-        self.storage._upload_path = upload_path
+        os.makedirs(os.path.join('upload/', resource))
+        copy('tests/testdata/' + filename, os.path.join('upload/', resource))
 
-        os.makedirs(os.path.join(upload_path, resource))
-        copy('tests/testdata/' + filename, os.path.join(upload_path, resource))
+        with open('tests/testdata/' + filename, 'rb') as src:
+            return src.read()
 
-        binary_file = self.storage.fetch_file(resource, filename)
+    def test_open_file_exists_file(self):
+        expected = self._copy_input_file('test-resource', 'input.txt')
 
-        with open('tests/testdata/' + filename, 'rb') as src:
-            assert src.read() == binary_file
+        file = self.storage.open_file('test-resource', 'input.txt')
 
-    def test_fetch_file_not_exists_file(self):
-        resource = 'test-resource'
-        filename = 'NOT_EXISTS_FILE'
-        upload_path = 'upload/'
+        assert expected == b''.join(file.chunks)
+        assert len(expected) == file.length == file.size
+        assert file.content_range is None
 
-        self.storage._upload_path = upload_path
+    def test_open_file_range(self):
+        expected = self._copy_input_file('test-resource', 'input.txt')
 
-        with self.assertRaises(FileNotFoundError):
-            self.storage.fetch_file(resource, filename)
+        file = self.storage.open_file('test-resource', 'input.txt', (1, 3))
 
-    def test_fetch_file_not_initialized(self):
-        resource = 'test-resource'
-        filename = 'input.txt'
+        assert expected[1:3] == b''.join(file.chunks)
+        assert 2 == file.length
+        assert (1, 3) == file.content_range
 
-        with self.assertRaises(TypeError):
-            self.storage.fetch_file(resource, filename)
+    def test_open_file_suffix_range(self):
+        expected = self._copy_input_file('test-resource', 'input.txt')
 
-    def test_fetch_file_none_resource(self):
-        self.storage._upload_path = 'upload/'
+        file = self.storage.open_file('test-resource', 'input.txt', (-2, None))
 
-        with self.assertRaises(ValueError):
-            self.storage.fetch_file(None, 'EXISTS_FILE_NAME')
+        assert expected[-2:] == b''.join(file.chunks)
+        assert (len(expected) - 2, len(expected)) == file.content_range
 
-    def test_fetch_file_none_filename(self):
-        self.storage._upload_path = 'upload/'
+    def test_open_file_range_not_satisfiable(self):
+        expected = self._copy_input_file('test-resource', 'input.txt')
 
-        with self.assertRaises(ValueError):
-            self.storage.fetch_file('EXISTS_RESOURCE', None)
+        with self.assertRaises(RangeNotSatisfiable) as ctx:
+            self.storage.open_file('test-resource', 'input.txt', (len(expected), None))
+
+        assert len(expected) == ctx.exception.size
+
+    def test_open_file_validators(self):
+        self._copy_input_file('test-resource', 'input.txt')
+
+        file = self.storage.open_file('test-resource', 'input.txt')
+        b''.join(file.chunks)
+
+        assert file.etag
+        assert file.last_modified
+
+    def test_open_file_not_modified_etag(self):
+        self._copy_input_file('test-resource', 'input.txt')
 
+        file = self.storage.open_file('test-resource', 'input.txt')
+        b''.join(file.chunks)
 
+        with self.assertRaises(NotModified) as ctx:
+            self.storage.open_file('test-resource', 'input.txt', conditions=Conditions(ETags([file.etag]), None))
 
+        assert file.etag == ctx.exception.etag
 
+    def test_open_file_not_modified_since(self):
+        self._copy_input_file('test-resource', 'input.txt')
+
+        file = self.storage.open_file('test-resource', 'input.txt')
+        b''.join(file.chunks)
+
+        with self.assertRaises(NotModified):
+            self.storage.open_file('test-resource', 'input.txt', conditions=Conditions(ETags(), file.last_modified))
+
+    def test_open_file_modified_etag(self):
+        self._copy_input_file('test-resource', 'input.txt')
+
+        file = self.storage.open_file('test-resource', 'input.txt', conditions=Conditions(ETags(['OLD_ETAG']), None))
+
+        assert b''.join(file.chunks)
+
+    def test_open_file_not_exists_file(self):
+        self.storage._upload_path = 'upload/'
+
+        assert self.storage.open_file('test-resource', 'NOT_EXISTS_FILE') is None
+
+    def test_open_file_not_initialized(self):
+        with self.assertRaises(TypeError):
+            self.storage.open_file('test-resource', 'input.txt')
@@ -0,0 +1,166 @@
+import json
+
+import pytest
+
+from bson import ObjectId
+from flask_restplus import Api, Namespace, Resource, fields, marshal
+from flask_restplus.fields import MarshallingError
+
+from voicereader.api_v1.question.schema import question_with_writer_schema
+from voicereader.api_v1.answer.schema import answer_with_writer_schema
+from voicereader.api_v1.user.schema import user_schema
+from voicereader.extensions.json_encoder import JSONEncoder
+from voicereader.extensions.marshalling import compile_model, marshal_with, marshal_list_with
+
+api = Namespace('testing')
+
+WRITER = {
+    '_id': ObjectId('5c38b8df18283838d53dfe37'),
+    'display_name': 'Lion',
+    'email': 'lion@example.com',
+    'fcm_uid': 'firebase_uid',
+    'picture': '/photo.png',
+    'created_date': 1547188815.0,
+}
+
+QUESTIONS = [
+    {},
+    {'writer': None},
+    {
+        '_id': ObjectId('5c3c4fe4182838cf4ea9e6f1'),
+        'writer_id': ObjectId('5c38b8df18283838d53dfe37'),
+        'title': 'title',
+        'contents': 'contents',
+        'subtitles': 'subtitles',
+        'num_of_answers': '3',
+        'num_of_view': 7,
+        'created_date': 1547405521.0,
+        'sound_url': '/sound.mp3',
+        'media_status': 'pending',
+        'writer': WRITER,
+        'answers': [{'_id': ObjectId()}],
+    },
+    {'title': 1, 'num_of_view': 2.9, 'writer': {'display_name': None, 'location': 'Seoul'}},
+]
+
+ANSWERS = [
+    {},
+    {
+        '_id': ObjectId('5c3c53a4182838d29bf3e947'),
+        'question_id': ObjectId('5c3c5342182838d04963fb6a'),
+        'writer_id': ObjectId('5c38b8df18283838d53dfe37'),
+        'contents': 'contents',
+        'created_date': 1547425044.0,
+        'writer': WRITER,
+    },
+]
+
+
+def dumps(data):
+    return json.dumps(data, cls=JSONEncoder, sort_keys=True)
+
+
+@pytest.mark.parametrize('model, record', [
+    (question_with_writer_schema(api), record) for record in QUESTIONS
+] + [
+    (answer_with_writer_schema(api), record) for record in ANSWERS
+] + [
+    (user_schema(api), WRITER),
+    (user_schema(api), {}),
+])
+def test_compile_model_equivalent(model, record):
+    assert dumps(marshal(record, model)) == dumps(compile_model(model)(record))
+
+
+def test_compile_model_list_equivalent():
+    model = question_with_writer_schema(api)
+
+    assert dumps(marshal(QUESTIONS, model)) == dumps(compile_model(model)(QUESTIONS))
+
+
+def test_compile_model_nested_defaults_are_not_shared():
+    serialize = compile_model(question_with_writer_schema(api))
+
+    serialize({})['writer']['display_name'] = 'changed'
+
+    assert serialize({})['writer']['display_name'] is None
+
+
+def test_compile_model_generic_fields():
+    model = api.model('Testing Generic', {
+        'name': fields.String(attribute='nickname'),
+        'nested': fields.String(attribute='profile.name'),
+        'active': fields.Boolean(),
+        'items': fields.List(fields.Integer),
+        'writer': fields.Nested(user_schema(api), allow_null=True),
+    })
+    record = {'nickname': 'lion', 'profile': {'name': 'Lion'}, 'active': 'false', 'items': ['1', 2]}
+
+    assert dumps(marshal(record, model)) == dumps(compile_model(model)(record))
+
+
+def test_compile_model_invalid_value():
+    serialize = compile_model(user_schema(api))
+
+    with pytest.raises(MarshallingError):
+        serialize({'created_date': 'not a number'})
+
+
+def test_compile_model_does_not_hide_errors():
+    class BrokenRecord(dict):
+        def get(self, key, default=None):
+            raise RuntimeError(key)
+
+    serialize = compile_model(user_schema(api))
+
+    with pytest.raises(RuntimeError):
+        serialize(BrokenRecord())
+
+
+def test_marshal_with(flask_app, flask_client):
+    model = question_with_writer_schema(api)
+
+    class Question(Resource):
+        @marshal_with(model, code=201)
+        def get(self):
+            return QUESTIONS[2], 201, {'X-Test': 'test'}
+
+    class QuestionList(Resource):
+        @marshal_list_with(model)
+        def get(self):
+            return QUESTIONS
+
+    flask_app.json_encoder = JSONEncoder
+    flask_app.config['RESTPLUS_JSON'] = {'cls': JSONEncoder}
+
+    rest_api = Api(flask_app)
+    rest_api.add_resource(Question, '/question')
+    rest_api.add_resource(QuestionList, '/questions')
+
+    res = flask_client.get('/question')
+
+    assert 201 == res.status_code
+    assert 'test' == res.headers['X-Test']
+    assert json.loads(dumps(marshal(QUESTIONS[2], model))) == res.json
+
+    res = flask_client.get('/questions')
+
+    assert json.loads(dumps(marshal(QUESTIONS, model))) == res.json
+
+    res = flask_client.get('/question', headers={'X-Fields': 'title,writer{display_name}'})
+
+    assert {'title': 'title', 'writer': {'display_name': 'Lion'}} == res.json
+
+
+def test_marshal_with_apidoc():
+    model = answer_with_writer_schema(api)
+
+    @marshal_list_with(model, description='answers')
+    def get():
+        pass
+
+    description, models = get.__apidoc__['responses'][200]
+
+    assert 'answers' == description
+    assert [model.name] == [item.name for item in models]
+    assert get.__apidoc__['__mask__']
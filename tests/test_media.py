@@ -1,4 +1,4 @@
-from voicereader.extensions.media import allowed_file
+from voicereader.extensions.media import allowed_file, guess_media_type
 
 
 def test_allowed_file():
@@ -19,3 +19,11 @@ def test_not_allowed_file():
     actual = allowed_file(not_allowed_filename, allowed_extensions)
 
     assert expected == actual
+
+
+def test_guess_media_type():
+    assert 'audio/mpeg' == guess_media_type('00.mp3')
+    assert 'audio/mp4' == guess_media_type('00.M4A')
+    assert 'image/jpeg' == guess_media_type('00.jpg')
+    assert 'text/plain' == guess_media_type('00.txt')
+    assert 'application/octet-stream' == guess_media_type('NO_EXTENSION')
@@ -0,0 +1,135 @@
+import pytest
+
+from prometheus_client import REGISTRY
+
+from voicereader.services import metrics as metrics_module
+from voicereader.services.metrics import Metrics, MongoCommandListener, timed
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(scope='function')
+def metrics(flask_app):
+    metrics = Metrics()
+    metrics.init_app(flask_app)
+
+    @flask_app.route('/items/<item_id>')
+    def item(item_id):
+        return item_id
+
+    @flask_app.route('/broken')
+    def broken():
+        raise RuntimeError('broken')
+
+    return metrics
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        Metrics().init_app(None)
+
+
+def test_init_app(flask_app, metrics):
+    assert flask_app.extensions['metrics'] is metrics
+
+
+def test_init_app_disabled(flask_app):
+    flask_app.config['METRICS_ENABLED'] = False
+
+    Metrics().init_app(flask_app)
+
+    assert 'metrics' not in flask_app.extensions
+
+
+def test_request_metrics(flask_client, metrics):
+    labels = {'method': 'GET', 'route': '/items/<item_id>'}
+    count = sample('voicereader_requests_total', status='200', **labels)
+    observed = sample('voicereader_request_latency_seconds_count', **labels)
+
+    res = flask_client.get('/items/1')
+    flask_client.get('/items/2')
+
+    assert res.status_code == 200
+    assert count + 2 == sample('voicereader_requests_total', status='200', **labels)
+    assert observed + 2 == sample('voicereader_request_latency_seconds_count', **labels)
+    assert 0 == sample('voicereader_requests_in_flight', **labels)
+
+
+def test_request_metrics_unmatched(flask_client, metrics):
+    labels = {'method': 'GET', 'route': metrics_module.UNMATCHED_ROUTE, 'status': '404'}
+    count = sample('voicereader_requests_total', **labels)
+
+    flask_client.get('/not-found/1')
+    flask_client.get('/not-found/2')
+
+    assert count + 2 == sample('voicereader_requests_total', **labels)
+
+
+def test_request_metrics_unhandled_error(flask_app, flask_client, metrics):
+    flask_app.testing = False
+    labels = {'method': 'GET', 'route': '/broken'}
+    count = sample('voicereader_requests_total', status='500', **labels)
+
+    res = flask_client.get('/broken')
+
+    assert res.status_code == 500
+    assert count + 1 == sample('voicereader_requests_total', status='500', **labels)
+    assert 0 == sample('voicereader_requests_in_flight', **labels)
+
+
+def test_render(metrics):
+    payload, content_type = metrics.render()
+
+    assert content_type.startswith('text/plain')
+    assert b'voicereader_requests_total' in payload
+
+
+def test_render_multiprocess(monkeypatch, tmpdir, metrics):
+    monkeypatch.setenv('prometheus_multiproc_dir', str(tmpdir))
+
+    payload, _ = metrics.render()
+
+    # Only the files in the directory are collected, and this process wrote none.
+    assert b'voicereader_requests_total' not in payload
+
+
+def test_timed():
+    labels = {'service': 'test', 'operation': 'call'}
+
+    @timed('test', 'call')
+    def call(fail):
+        if fail:
+            raise ValueError()
+
+        return 'result'
+
+    succeeded = sample('voicereader_external_call_latency_seconds_count', outcome='success', **labels)
+    failed = sample('voicereader_external_call_latency_seconds_count', outcome='error', **labels)
+
+    assert 'result' == call(False)
+
+    with pytest.raises(ValueError):
+        call(True)
+
+    assert succeeded + 1 == sample('voicereader_external_call_latency_seconds_count', outcome='success', **labels)
+    assert failed + 1 == sample('voicereader_external_call_latency_seconds_count', outcome='error', **labels)
+
+
+def test_mongo_command_listener():
+    class MockEvent:
+        command_name = 'find'
+        duration_micros = 1500
+
+    total = sample('voicereader_mongo_command_latency_seconds_sum', command='find', outcome='success')
+    failed = sample('voicereader_mongo_command_latency_seconds_count', command='find', outcome='error')
+
+    listener = MongoCommandListener()
+    listener.started(MockEvent())
+    listener.succeeded(MockEvent())
+    listener.failed(MockEvent())
+
+    assert total + 0.0015 == pytest.approx(sample('voicereader_mongo_command_latency_seconds_sum',
+                                                  command='find', outcome='success'))
+    assert failed + 1 == sample('voicereader_mongo_command_latency_seconds_count', command='find', outcome='error')
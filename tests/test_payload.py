@@ -0,0 +1,65 @@
+import pytest
+
+from flask_restplus import Namespace, fields
+
+from voicereader.extensions.payload import PayloadValidator
+
+api = Namespace('testing')
+
+model = api.model('Testing Payload', {
+    '_id': fields.String(readonly=True),
+    'name': fields.String(required=True),
+    'age': fields.Integer(),
+    'score': fields.Float(),
+    'active': fields.Boolean(),
+    'status': fields.String(enum=['pending', 'ready']),
+})
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return PayloadValidator(model)
+
+
+def test_validate(validator):
+    payload = {'name': 'lion', 'age': 3, 'score': 1, 'active': False, 'status': 'ready'}
+
+    assert payload == validator.validate(payload)
+
+
+def test_validate_drops_unknown_and_readonly_fields(validator):
+    assert {'name': 'lion'} == validator.validate({'_id': 'ID', 'name': 'lion', '$where': 'sleep(1000)'})
+
+
+@pytest.mark.parametrize('payload', [
+    None,
+    [],
+    'name',
+    {},
+    {'name': None},
+    {'name': 1},
+    {'name': 'lion', 'age': '3'},
+    {'name': 'lion', 'age': True},
+    {'name': 'lion', 'age': 1.5},
+    {'name': 'lion', 'score': '1.5'},
+    {'name': 'lion', 'active': 1},
+    {'name': 'lion', 'status': 'failed'},
+])
+def test_validate_invalid_payload(validator, payload):
+    with pytest.raises(ValueError):
+        validator.validate(payload)
+
+
+def test_validate_inherited_model():
+    inherited = api.inherit('Inherited Testing Payload', model, {
+        'nickname': fields.String(),
+    })
+
+    assert {'name': 'lion', 'nickname': 'king'} == PayloadValidator(inherited).validate({
+        'name': 'lion', 'nickname': 'king'
+    })
+
+
+def test_unsupported_field():
+    with pytest.raises(TypeError):
+        PayloadValidator(api.model('Unsupported Payload', {'nested': fields.Nested(model)}))
@@ -0,0 +1,110 @@
+import marshal
+import os
+import re
+import time
+
+import pytest
+
+from flask import Response, jsonify
+
+from voicereader.extensions.profiler import Profiler, PROFILE_HEADER, PROFILE_FORMAT_HEADER, PROFILE_FILE_HEADER
+
+TOKEN = 'profiler-token'
+
+
+def slow_function():
+    time.sleep(0.02)
+
+
+@pytest.fixture(scope='function')
+def profiler(flask_app):
+    flask_app.config['PROFILER_TOKEN'] = TOKEN
+
+    @flask_app.route('/slow')
+    def slow():
+        slow_function()
+
+        return jsonify({'ping': 'pong'})
+
+    profiler = Profiler()
+    profiler.init_app(flask_app)
+
+    return profiler
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        Profiler().init_app(None)
+
+
+def test_init_app_without_token(flask_app):
+    Profiler().init_app(flask_app)
+
+    assert not isinstance(flask_app.wsgi_app, Profiler)
+    assert 'profiler' not in flask_app.extensions
+
+
+def test_init_app(flask_app, profiler):
+    assert flask_app.wsgi_app is profiler
+    assert flask_app.extensions['profiler'] is profiler
+
+
+@pytest.mark.parametrize('headers', [{}, {PROFILE_HEADER: 'wrong-token'}, {PROFILE_HEADER: 'wrong-tökén'}])
+def test_profile_not_triggered(flask_client, profiler, headers):
+    res = flask_client.get('/slow', headers=headers)
+
+    assert res.status_code == 200
+    assert {'ping': 'pong'} == res.get_json()
+    assert 'Content-Disposition' not in res.headers
+
+
+def test_profile_pstats(flask_client, profiler):
+    res = flask_client.get('/slow', headers={PROFILE_HEADER: TOKEN})
+
+    assert res.status_code == 200
+    assert res.headers['Content-Disposition'].startswith('attachment; filename=')
+    assert re.search(r'-GET-slow-[0-9a-f]{8}\.prof$', res.headers['Content-Disposition'])
+
+    stats = marshal.loads(res.get_data())
+
+    assert any(name == 'slow_function' for _, _, name in stats)
+
+
+def test_profile_collapsed(flask_client, profiler):
+    res = flask_client.get('/slow', headers={PROFILE_HEADER: TOKEN, PROFILE_FORMAT_HEADER: 'collapsed'})
+
+    assert res.status_code == 200
+    assert res.mimetype == 'text/plain'
+
+    lines = res.get_data(as_text=True).splitlines()
+
+    assert lines
+    assert any(':slow_function' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_profile_unknown_format(flask_client, profiler):
+    res = flask_client.get('/slow', headers={PROFILE_HEADER: TOKEN, PROFILE_FORMAT_HEADER: 'svg'})
+
+    assert res.status_code == 400
+
+
+def test_profile_to_directory(flask_app, flask_client, tmpdir):
+    flask_app.config['PROFILER_TOKEN'] = TOKEN
+    flask_app.config['PROFILER_DIR'] = str(tmpdir.join('profiles'))
+
+    @flask_app.route('/stream')
+    def stream():
+        return Response(iter([b'a', b'b']), mimetype='text/plain')
+
+    Profiler().init_app(flask_app)
+
+    res = flask_client.get('/stream', headers={PROFILE_HEADER: TOKEN})
+
+    assert res.status_code == 200
+    assert b'ab' == res.get_data()
+
+    filename = res.headers[PROFILE_FILE_HEADER]
+
+    assert [filename] == os.listdir(str(tmpdir.join('profiles')))
+    assert isinstance(marshal.loads(tmpdir.join('profiles', filename).read_binary()), dict)
@@ -1,11 +1,14 @@
 import boto3
 import pytest
 import io
+import datetime
 
 from botocore.exceptions import ClientError
+from prometheus_client import REGISTRY
 
-from werkzeug.datastructures import FileStorage
+from werkzeug.datastructures import FileStorage, ETags
 from voicereader.services.s3_storage import S3Storage
+from voicereader.services.stored_file import RangeNotSatisfiable, NotModified, Conditions
 
 
 @pytest.fixture(scope='session')
@@ -47,51 +50,89 @@ def test_init_app(monkeypatch, storage, flask_app):
     assert storage._s3 is not None
 
 
-def test_fetch_file(storage, mock_boto_client):
-    binary = storage.fetch_file('EXISTS_RESOURCE', 'FILE_NAME')
+def test_init_app_transfer_config(monkeypatch, storage, flask_app):
+    clients = []
 
-    assert isinstance(binary, bytes)
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: clients.append(kwargs) or '')
 
+    flask_app.config['S3_BUCKET_NAME'] = 'TEST-BUCKET'
+    flask_app.config['S3_REGION'] = 'TEST_REGION'
+    flask_app.config['S3_KEY'] = 'TEST_KEY'
+    flask_app.config['S3_SECRET'] = 'TEST SECRET'
+    flask_app.config['S3_ENDPOINT_URL'] = 'http://localhost:9000'
+    flask_app.config['S3_MAX_POOL_CONNECTIONS'] = '4'
+    flask_app.config['S3_MAX_RETRY_ATTEMPTS'] = '5'
+    flask_app.config['S3_MULTIPART_THRESHOLD_MB'] = '16'
+    flask_app.config['S3_MULTIPART_CHUNKSIZE_MB'] = '5'
+    flask_app.config['S3_MAX_CONCURRENCY'] = '8'
 
-def test_fetch_file_none_s3(monkeypatch, storage):
-    monkeypatch.setattr(storage, '_s3', None)
+    storage.init_app(flask_app)
 
-    with pytest.raises(TypeError):
-        storage.fetch_file('VALID_FILE_RESOURCE', 'VALID_FILE_NAME')
+    client_config = clients[0]['config']
 
+    assert 'http://localhost:9000' == clients[0]['endpoint_url']
+    assert 8 == client_config.max_pool_connections
+    assert {'max_attempts': 5} == client_config.retries
+    assert 16 * 1024 * 1024 == storage._transfer_config.multipart_threshold
+    assert 5 * 1024 * 1024 == storage._transfer_config.multipart_chunksize
+    assert 8 == storage._transfer_config.max_concurrency
+    assert storage is flask_app.extensions['storage']
 
-def test_fetch_file_none_bucket_name(monkeypatch, storage):
-    monkeypatch.setattr(storage, '_bucket_name', None)
 
-    with pytest.raises(TypeError):
-        storage.fetch_file('VALID_FILE_RESOURCE', 'VALID_FILE_NAME')
+def test_init_app_redirect_delivery_mode(monkeypatch, storage, flask_app):
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: '')
 
+    flask_app.config['S3_BUCKET_NAME'] = 'TEST-BUCKET'
+    flask_app.config['S3_REGION'] = 'TEST_REGION'
+    flask_app.config['S3_KEY'] = 'TEST_KEY'
+    flask_app.config['S3_SECRET'] = 'TEST SECRET'
+    flask_app.config['MEDIA_DELIVERY_MODE'] = 'redirect'
+    flask_app.config['S3_PRESIGNED_URL_EXPIRES_SEC'] = '600'
 
-def test_fetch_file_none_resource(storage):
-    with pytest.raises(ValueError):
-        storage.fetch_file(None, 'VALID_FILE_NAME')
+    storage.init_app(flask_app)
+
+    assert 'redirect' == storage.delivery_mode
+    assert 600 == storage.presigned_url_expires_in
 
 
-def test_fetch_file_none_filename(storage):
+def test_init_app_unsupported_delivery_mode(monkeypatch, storage, flask_app):
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: '')
+
+    flask_app.config['S3_BUCKET_NAME'] = 'TEST-BUCKET'
+    flask_app.config['S3_REGION'] = 'TEST_REGION'
+    flask_app.config['S3_KEY'] = 'TEST_KEY'
+    flask_app.config['S3_SECRET'] = 'TEST SECRET'
+    flask_app.config['MEDIA_DELIVERY_MODE'] = 'x-accel-redirect'
+
     with pytest.raises(ValueError):
-        storage.fetch_file('VALID_FILE_RESOURCE', None)
+        storage.init_app(flask_app)
 
 
-def test_fetch_file_not_exists_file(monkeypatch, storage):
-    def mock_get_object(Bucket, Key):
-        raise ClientError({
-            'Error': {
-                'Code': 'NoSuchKey'
-            }
-        }, None)
+def test_presigned_url_cached(monkeypatch, storage):
+    from cachetools import TTLCache
 
-    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+    generated = []
 
-    expected = None
+    def mock_generate_presigned_url(operation, Params, ExpiresIn):
+        generated.append(Params['Key'])
 
-    actual = storage.fetch_file('VALID_FILE_RESOURCE', 'NOT_EXISTS_FILE')
+        return 'https://s3.example.com/{}?expires={}'.format(Params['Key'], ExpiresIn)
 
-    assert expected == actual
+    monkeypatch.setattr(storage, '_presigned_urls', TTLCache(maxsize=10, ttl=1800))
+    monkeypatch.setattr(storage._s3, 'generate_presigned_url', mock_generate_presigned_url, raising=False)
+
+    url = storage.presigned_url('sound/', 'FILE_NAME.mp3')
+
+    assert 'https://s3.example.com/sound/FILE_NAME.mp3?expires=3600' == url
+    assert url == storage.presigned_url('sound/', 'FILE_NAME.mp3')
+    assert ['sound/FILE_NAME.mp3'] == generated
+
+
+def test_presigned_url_none_s3(monkeypatch, storage):
+    monkeypatch.setattr(storage, '_s3', None)
+
+    with pytest.raises(TypeError):
+        storage.presigned_url('VALID_FILE_RESOURCE', 'VALID_FILE_NAME')
 
 
 def test_upload_file(storage):
@@ -99,6 +140,22 @@ def test_upload_file(storage):
         storage.upload_file('EXISTS_RESOURCE', FileStorage(fp))
 
 
+def test_upload_file_metrics(monkeypatch, storage):
+    def mock_upload_fileobj(file, bucket, Key, ExtraArgs, Config, Callback):
+        Callback(6)
+        Callback(5)
+
+    monkeypatch.setattr(storage._s3, 'upload_fileobj', mock_upload_fileobj)
+    uploaded = REGISTRY.get_sample_value('voicereader_s3_uploaded_bytes_total') or 0.0
+
+    with open('tests/testdata/input.txt') as fp:
+        metrics = storage.upload_file('EXISTS_RESOURCE', FileStorage(fp, filename='input.txt'))
+
+    assert 11 == metrics['bytes']
+    assert metrics['seconds'] >= 0
+    assert uploaded + 11 == REGISTRY.get_sample_value('voicereader_s3_uploaded_bytes_total')
+
+
 def test_upload_file_none_s3(monkeypatch, storage):
     monkeypatch.setattr(storage, '_s3', None)
 
@@ -124,3 +181,144 @@ def test_upload_file_none_resource(storage):
 def test_upload_file_none_file(storage):
     with pytest.raises(ValueError):
         storage.upload_file('EXISTS_RESOURCE', None)
+
+
+def test_open_file(monkeypatch, storage):
+    def mock_get_object(**kwargs):
+        assert 'Range' not in kwargs
+
+        return {'Body': io.BytesIO(b'Hello World'), 'ContentLength': 11}
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    file = storage.open_file('EXISTS_RESOURCE', 'FILE_NAME')
+
+    assert b'Hello World' == b''.join(file.chunks)
+    assert 11 == file.length == file.size
+    assert file.content_range is None
+
+
+def test_open_file_validators(monkeypatch, storage):
+    last_modified = datetime.datetime(2019, 1, 14, 3, 0, 0, tzinfo=datetime.timezone.utc)
+
+    monkeypatch.setattr(storage._s3, 'get_object', lambda **kwargs: {
+        'Body': io.BytesIO(b'Hello World'),
+        'ContentLength': 11,
+        'LastModified': last_modified,
+        'ETag': '"VALID_ETAG"'
+    })
+
+    file = storage.open_file('EXISTS_RESOURCE', 'FILE_NAME')
+
+    assert 'VALID_ETAG' == file.etag
+    assert datetime.datetime(2019, 1, 14, 3, 0, 0) == file.last_modified
+
+
+def test_open_file_not_modified(monkeypatch, storage):
+    def mock_get_object(**kwargs):
+        assert '"VALID_ETAG"' == kwargs['IfNoneMatch']
+        assert 'IfModifiedSince' not in kwargs
+
+        raise ClientError({
+            'Error': {
+                'Code': '304'
+            },
+            'ResponseMetadata': {
+                'HTTPHeaders': {'etag': '"VALID_ETAG"'}
+            }
+        }, None)
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    conditions = Conditions(ETags(['VALID_ETAG']), datetime.datetime(2019, 1, 14))
+
+    with pytest.raises(NotModified) as ex:
+        storage.open_file('EXISTS_RESOURCE', 'FILE_NAME', conditions=conditions)
+
+    assert 'VALID_ETAG' == ex.value.etag
+
+
+def test_open_file_if_modified_since(monkeypatch, storage):
+    since = datetime.datetime(2019, 1, 14)
+
+    def mock_get_object(**kwargs):
+        assert since == kwargs['IfModifiedSince']
+
+        return {'Body': io.BytesIO(b'Hello World'), 'ContentLength': 11}
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    assert storage.open_file('EXISTS_RESOURCE', 'FILE_NAME', conditions=Conditions(ETags(), since))
+
+
+def test_open_file_range(monkeypatch, storage):
+    def mock_get_object(**kwargs):
+        assert 'bytes=-5' == kwargs['Range']
+
+        return {'Body': io.BytesIO(b'World'), 'ContentLength': 5, 'ContentRange': 'bytes 6-10/11'}
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    file = storage.open_file('EXISTS_RESOURCE', 'FILE_NAME', (-5, None))
+
+    assert b'World' == b''.join(file.chunks)
+    assert 5 == file.length
+    assert 11 == file.size
+    assert (6, 11) == file.content_range
+
+
+def test_open_file_range_not_satisfiable(monkeypatch, storage):
+    def mock_get_object(**kwargs):
+        raise ClientError({
+            'Error': {
+                'Code': 'InvalidRange',
+                'ActualObjectSize': '11'
+            }
+        }, None)
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    with pytest.raises(RangeNotSatisfiable) as ex:
+        storage.open_file('EXISTS_RESOURCE', 'FILE_NAME', (20, None))
+
+    assert 11 == ex.value.size
+
+
+def test_open_file_not_exists_file(monkeypatch, storage):
+    def mock_get_object(**kwargs):
+        raise ClientError({
+            'Error': {
+                'Code': 'NoSuchKey'
+            }
+        }, None)
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    assert storage.open_file('EXISTS_RESOURCE', 'NOT_EXISTS_FILE') is None
+
+
+def test_open_file_none_s3(monkeypatch, storage):
+    monkeypatch.setattr(storage, '_s3', None)
+
+    with pytest.raises(TypeError):
+        storage.open_file('VALID_FILE_RESOURCE', 'VALID_FILE_NAME')
+
+
+def test_open_file_metrics(monkeypatch, storage):
+    def sample(outcome):
+        return REGISTRY.get_sample_value('voicereader_external_call_latency_seconds_count',
+                                         {'service': 's3', 'operation': 'open_file', 'outcome': outcome}) or 0.0
+
+    def mock_get_object(**kwargs):
+        raise ClientError({
+            'Error': {
+                'Code': 'NoSuchKey'
+            }
+        }, None)
+
+    monkeypatch.setattr(storage._s3, 'get_object', mock_get_object)
+
+    not_found = sample('not_found')
+    storage.open_file('EXISTS_RESOURCE', 'NOT_EXISTS_FILE')
+
+    assert not_found + 1 == sample('not_found')
@@ -26,6 +26,19 @@ def test_configure_app(flask_app):
     startup.configure_app(flask_app)
 
     assert isinstance(flask_app.json_encoder, type(JSONEncoder))
+    assert flask_app.json_encoder is flask_app.config['RESTPLUS_JSON']['cls']
+    assert 'compression' in flask_app.extensions
+    assert 'metrics' in flask_app.extensions
+
+
+def test_configure_app_json_encoder_backend(flask_app):
+    from voicereader.extensions.json_encoder import get_json_encoder
+
+    flask_app.config['JSON_ENCODER_BACKEND'] = 'orjson'
+
+    startup.configure_app(flask_app)
+
+    assert get_json_encoder('orjson') is flask_app.json_encoder
 
 
 def test_load_config(flask_app, test_envs):
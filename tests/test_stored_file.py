@@ -0,0 +1,70 @@
+import io
+import pytest
+
+from datetime import datetime, timezone
+from werkzeug.datastructures import ETags
+
+from voicereader.services.stored_file import RangeNotSatisfiable, Conditions, resolve_range, range_header, \
+    parse_content_range, iter_chunks, is_not_modified, to_utc_naive
+
+
+@pytest.mark.parametrize('byte_range, expected', [
+    (None, None),
+    ((0, 5), (0, 5)),
+    ((5, None), (5, 10)),
+    ((5, 100), (5, 10)),
+    ((-3, None), (7, 10)),
+    ((-100, None), (0, 10)),
+])
+def test_resolve_range(byte_range, expected):
+    assert expected == resolve_range(byte_range, 10)
+
+
+def test_resolve_range_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiable) as ex:
+        resolve_range((10, None), 10)
+
+    assert 10 == ex.value.size
+
+
+@pytest.mark.parametrize('byte_range, expected', [
+    ((0, 5), 'bytes=0-4'),
+    ((5, None), 'bytes=5-'),
+    ((-3, None), 'bytes=-3'),
+])
+def test_range_header(byte_range, expected):
+    assert expected == range_header(byte_range)
+
+
+def test_parse_content_range():
+    assert ((6, 11), 11) == parse_content_range('bytes 6-10/11')
+
+    with pytest.raises(ValueError):
+        parse_content_range('bytes */11')
+
+
+def test_iter_chunks():
+    fp = io.BytesIO(b'Hello World')
+
+    chunks = list(iter_chunks(fp, 5, chunk_size=2))
+
+    assert [b'He', b'll', b'o'] == chunks
+    assert fp.closed
+
+
+def test_is_not_modified():
+    last_modified = datetime(2019, 1, 14, 3, 0, 0, 500)
+
+    assert not is_not_modified(None, 'ETAG', last_modified)
+    assert is_not_modified(Conditions(ETags(['ETAG']), None), 'ETAG', last_modified)
+    assert is_not_modified(Conditions(ETags(weak_etags=['ETAG']), None), 'ETAG', last_modified)
+    assert is_not_modified(Conditions(ETags(star_tag=True), None), 'ETAG', last_modified)
+    assert not is_not_modified(Conditions(ETags(['OLD_ETAG']), last_modified), 'ETAG', last_modified)
+    assert is_not_modified(Conditions(ETags(), datetime(2019, 1, 14, 3, 0, 0)), 'ETAG', last_modified)
+    assert not is_not_modified(Conditions(ETags(), datetime(2019, 1, 14, 2, 0, 0)), 'ETAG', last_modified)
+
+
+def test_to_utc_naive():
+    assert to_utc_naive(None) is None
+    assert datetime(2019, 1, 14) == to_utc_naive(datetime(2019, 1, 14))
+    assert datetime(2019, 1, 14) == to_utc_naive(datetime(2019, 1, 14, tzinfo=timezone.utc))
@@ -0,0 +1,62 @@
+import pytest
+
+from prometheus_client import REGISTRY
+
+from voicereader.services.subtitle_cache import SubtitleCache
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, dict(labels, cache='subtitle')) or 0.0
+
+
+@pytest.fixture(scope='function')
+def cache(flask_app):
+    flask_app.config['SUBTITLE_CACHE_SIZE'] = 2
+
+    cache = SubtitleCache()
+    cache.init_app(flask_app)
+
+    return cache
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        SubtitleCache().init_app(None)
+
+
+def test_init_app_registers_extension(flask_app, cache):
+    assert flask_app.extensions['subtitle_cache'] is cache
+
+
+def test_get_set(cache):
+    hits = sample('voicereader_cache_lookups_total', result='hit')
+    misses = sample('voicereader_cache_lookups_total', result='miss')
+
+    cache.set('QUESTION_ID', 1, 'CUES')
+
+    assert 'CUES' == cache.get('QUESTION_ID', 1)
+    assert cache.get('QUESTION_ID', 2) is None
+    assert hits + 1 == sample('voicereader_cache_lookups_total', result='hit')
+    assert misses + 1 == sample('voicereader_cache_lookups_total', result='miss')
+    assert 1 == sample('voicereader_cache_entries')
+
+
+def test_evicts_least_recently_used(cache):
+    evictions = sample('voicereader_cache_evictions_total')
+
+    for version in range(3):
+        cache.set('QUESTION_ID', version, 'CUES')
+
+    assert cache.get('QUESTION_ID', 0) is None
+    assert evictions + 1 == sample('voicereader_cache_evictions_total')
+    assert 2 == sample('voicereader_cache_entries')
+
+
+def test_disabled(flask_app):
+    flask_app.config['SUBTITLE_CACHE_SIZE'] = 0
+
+    cache = SubtitleCache()
+    cache.init_app(flask_app)
+    cache.set('QUESTION_ID', 1, 'CUES')
+
+    assert cache.get('QUESTION_ID', 1) is None
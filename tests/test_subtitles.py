@@ -0,0 +1,78 @@
+import pytest
+
+from voicereader.extensions.subtitles import Cues, parse_subtitles
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+Hello
+
+2
+00:00:03,000 --> 00:00:05,000
+How are you?
+Fine.
+
+"""
+
+VTT = """WEBVTT - sample
+
+NOTE written by hand
+
+intro
+00:01.000 --> 00:02.500 align:start
+Hello
+
+01:00:03.000 --> 01:00:05.000
+Bye
+"""
+
+
+def test_parse_srt():
+    cues = parse_subtitles(SRT.replace('\n', '\r\n'))
+
+    assert [1000, 3000] == cues.starts
+    assert [2500, 5000] == cues.ends
+    assert ['Hello', 'How are you?\nFine.'] == cues.texts
+
+
+def test_parse_vtt():
+    cues = parse_subtitles(VTT)
+
+    assert [1000, 3603000] == cues.starts
+    assert [2500, 3605000] == cues.ends
+    assert ['Hello', 'Bye'] == cues.texts
+
+
+def test_parse_sorts_cues():
+    cues = parse_subtitles('00:00:05,000 --> 00:00:06,000\nsecond\n\n00:00:01,000 --> 00:00:02,000\nfirst')
+
+    assert ['first', 'second'] == cues.texts
+
+
+@pytest.mark.parametrize('text', [None, '', 'plain script of the question', '00:00:02,000 --> 00:00:01,000\nback'])
+def test_parse_without_cues(text):
+    assert parse_subtitles(text) is None
+
+
+def test_window():
+    cues = Cues([0, 1000, 2000, 6000], [10000, 1500, 3000, 7000], ['long', 'a', 'b', 'c'])
+
+    assert ['long', 'b'] == [text for _, _, text in cues.window(2500, 2500)]
+    assert ['long', 'a', 'b'] == [text for _, _, text in cues.window(1000, 2000)]
+    assert ['long', 'c'] == [text for _, _, text in cues.window(6500, 6500)]
+    assert ['long'] == [text for _, _, text in cues.window(7000, 8000)]
+    assert [] == cues.window(10000, 20000)
+
+
+def test_to_vtt_round_trip():
+    cues = parse_subtitles(SRT)
+    vtt = cues.to_vtt()
+
+    assert vtt.startswith('WEBVTT\n\n00:00:01.000 --> 00:00:02.500\nHello\n')
+    assert cues.to_document() == parse_subtitles(vtt).to_document()
+
+
+def test_from_document():
+    cues = parse_subtitles(VTT)
+
+    assert cues.to_document() == Cues.from_document(cues.to_document()).to_document()
+    assert 2 == len(cues)
@@ -0,0 +1,122 @@
+import os
+import pytest
+
+from shutil import rmtree
+from werkzeug.datastructures import FileStorage
+
+from voicereader.services import upload_worker
+from voicereader.services.upload_worker import UploadWorker
+
+SPOOL_PATH = 'spool-testing/'
+
+
+class MockStorage:
+    def __init__(self, error=None, failures=None):
+        self.uploaded = []
+        self.error = error
+        self.failures = failures
+        self.attempts = 0
+
+    def upload_file(self, resource, file):
+        self.attempts += 1
+
+        if self.error and (self.failures is None or self.attempts <= self.failures):
+            raise self.error
+
+        self.uploaded.append((resource, file.filename, file.content_type, file.read()))
+
+
+@pytest.fixture(scope='function')
+def worker(monkeypatch, flask_app):
+    monkeypatch.setattr(upload_worker.atexit, 'register', lambda func: None)
+
+    flask_app.config['QUESTION_UPLOAD_MODE'] = 'async'
+    flask_app.config['UPLOAD_SPOOL_PATH'] = SPOOL_PATH
+    flask_app.config['UPLOAD_RETRY_BACKOFF_SEC'] = 0
+
+    worker = UploadWorker()
+    worker.init_app(flask_app)
+
+    yield worker
+
+    worker.shutdown()
+
+    if os.path.exists(SPOOL_PATH):
+        rmtree(SPOOL_PATH)
+
+
+def _spool_input_file(worker):
+    with open('tests/testdata/input.txt', 'rb') as fp:
+        return worker.spool('sound/', FileStorage(fp, filename='00.mp3', content_type='audio/mpeg'))
+
+
+def test_init_app(worker):
+    assert worker.is_async
+
+
+def test_init_app_unsupported_mode(flask_app):
+    flask_app.config['QUESTION_UPLOAD_MODE'] = 'INVALID_MODE'
+
+    with pytest.raises(ValueError):
+        UploadWorker().init_app(flask_app)
+
+
+def test_init_app_none_app():
+    with pytest.raises(ValueError):
+        UploadWorker().init_app(None)
+
+
+def test_spool(worker):
+    path = _spool_input_file(worker)
+
+    assert os.path.join(SPOOL_PATH, 'sound/', '00.mp3') == path
+    assert os.path.exists(path)
+
+
+def test_submit_success(worker):
+    storage = MockStorage()
+    results = []
+
+    path = _spool_input_file(worker)
+    future = worker.submit(storage, 'sound/', path, '00.mp3', 'audio/mpeg', results.append)
+
+    assert future.result()
+    assert [True] == results
+    assert 'sound/' == storage.uploaded[0][0]
+    assert 'audio/mpeg' == storage.uploaded[0][2]
+    assert not os.path.exists(path)
+
+
+def test_submit_failed(worker):
+    storage = MockStorage(error=IOError())
+    results = []
+
+    path = _spool_input_file(worker)
+    future = worker.submit(storage, 'sound/', path, '00.mp3', 'audio/mpeg', results.append)
+
+    assert not future.result()
+    assert [False] == results
+    assert 3 == storage.attempts
+    assert not os.path.exists(path)
+
+
+def test_submit_retries(worker):
+    storage = MockStorage(error=IOError(), failures=2)
+    results = []
+
+    path = _spool_input_file(worker)
+    future = worker.submit(storage, 'sound/', path, '00.mp3', 'audio/mpeg', results.append)
+
+    assert future.result()
+    assert [True] == results
+    assert 3 == storage.attempts
+    assert 1 == len(storage.uploaded)
+    assert not os.path.exists(path)
+
+
+def test_spooled_files(worker):
+    assert [] == worker.spooled_files('sound/')
+
+    path = _spool_input_file(worker)
+
+    assert [path] == worker.spooled_files('sound/')
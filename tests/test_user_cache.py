@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from prometheus_client import REGISTRY
+
+from voicereader.services.user_cache import UserCache
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, dict(labels, cache='user')) or 0.0
+
+
+@pytest.fixture(scope='function')
+def cache(flask_app):
+    flask_app.config['USER_CACHE_SIZE'] = 2
+    flask_app.config['USER_CACHE_TTL_SEC'] = 60
+
+    cache = UserCache()
+    cache.init_app(flask_app)
+
+    return cache
+
+
+def test_init_app_with_none():
+    with pytest.raises(ValueError):
+        UserCache().init_app(None)
+
+
+def test_init_app_registers_extension(flask_app, cache):
+    assert flask_app.extensions['user_cache'] is cache
+
+
+def test_not_initialized_cache_is_disabled():
+    cache = UserCache()
+
+    cache.set('id', {'_id': 'id'})
+
+    assert cache.get('id') is None
+
+
+def test_zero_size_disables_cache(flask_app):
+    flask_app.config['USER_CACHE_SIZE'] = 0
+
+    cache = UserCache()
+    cache.init_app(flask_app)
+    cache.set('id', {'_id': 'id'})
+
+    assert cache.get('id') is None
+
+
+def test_get_counts_hits_and_misses(cache):
+    hits = sample('voicereader_cache_lookups_total', result='hit')
+    misses = sample('voicereader_cache_lookups_total', result='miss')
+
+    assert cache.get('id') is None
+
+    cache.set('id', {'_id': 'id'})
+
+    assert cache.get('id') == {'_id': 'id'}
+    assert hits + 1 == sample('voicereader_cache_lookups_total', result='hit')
+    assert misses + 1 == sample('voicereader_cache_lookups_total', result='miss')
+    assert 1 == sample('voicereader_cache_entries')
+
+
+def test_get_returns_copy(cache):
+    cache.set('id', {'_id': 'id'})
+
+    cache.get('id')['nickname'] = 'changed'
+
+    assert 'nickname' not in cache.get('id')
+
+
+def test_set_ignores_none(cache):
+    cache.set('id', None)
+
+    assert cache.get('id') is None
+
+
+def test_invalidate(cache):
+    cache.set('id', {'_id': 'id'})
+
+    cache.invalidate('id')
+    cache.invalidate('unknown')
+
+    assert cache.get('id') is None
+
+
+def test_evicts_least_recently_used(cache):
+    evictions = sample('voicereader_cache_evictions_total')
+
+    cache.set('first', {'_id': 'first'})
+    cache.set('second', {'_id': 'second'})
+    cache.get('first')
+    cache.set('third', {'_id': 'third'})
+
+    assert cache.get('second') is None
+    assert cache.get('first') is not None
+    assert evictions + 1 == sample('voicereader_cache_evictions_total')
+    assert 2 == sample('voicereader_cache_entries')
+
+
+def test_expires_entries(flask_app):
+    flask_app.config['USER_CACHE_TTL_SEC'] = 0.001
+
+    cache = UserCache()
+    cache.init_app(flask_app)
+    cache.set('id', {'_id': 'id'})
+    time.sleep(0.01)
+
+    assert cache.get('id') is None
@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+
+from prometheus_client import REGISTRY
+from pymongo.errors import PyMongoError
+
+from voicereader.services import view_recorder
+from voicereader.services.view_recorder import ViewRecorder
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MockBulkWriteResult:
+    def __init__(self, requests):
+        self.modified_count = len(requests)
+
+
+class MockQuestions:
+    def __init__(self, error=None):
+        self.requests = []
+        self.error = error
+        self.threads = []
+        self.written = threading.Event()
+
+    def bulk_write(self, requests, ordered):
+        assert not ordered
+
+        if self.error:
+            raise self.error
+
+        self.requests.append(requests)
+        self.threads.append(threading.current_thread())
+        self.written.set()
+
+        return MockBulkWriteResult(requests)
+
+
+class MockChangeMarkers:
+    def __init__(self):
+        self.touched = []
+
+    def update_one(self, query, update, upsert):
+        self.touched.append(query['_id'])
+
+
+@pytest.fixture(scope='function')
+def questions(monkeypatch):
+    questions = MockQuestions()
+
+    class MockDb:
+        pass
+
+    mock_db = MockDb()
+    mock_db.questions = questions
+    mock_db.change_markers = MockChangeMarkers()
+
+    monkeypatch.setattr(view_recorder.mongo, 'db', mock_db, raising=False)
+
+    return questions
+
+
+@pytest.fixture(scope='function')
+def recorder(monkeypatch, flask_app):
+    monkeypatch.setattr(view_recorder.atexit, 'register', lambda func: None)
+
+    flask_app.config['VIEW_BUFFER_SIZE'] = 3
+    flask_app.config['VIEW_FLUSH_INTERVAL_SEC'] = 60
+
+    recorder = ViewRecorder()
+    recorder.init_app(flask_app)
+
+    yield recorder
+
+    recorder.flush()
+
+
+def test_init_app(recorder, flask_app):
+    assert 3 == recorder._max_buffer_size
+    assert 60.0 == recorder._flush_interval
+    assert recorder is flask_app.extensions['view_recorder']
+
+
+def test_init_app_none_app():
+    with pytest.raises(ValueError):
+        ViewRecorder().init_app(None)
+
+
+def test_record_coalesce_views(recorder, questions):
+    recorder.record('QUESTION_ID', 'USER_ID')
+    recorder.record('QUESTION_ID', 'USER_ID')
+
+    assert 1 == sample('voicereader_view_buffer_depth')
+    assert [] == questions.requests
+
+
+def test_record_flush_when_full(recorder, questions):
+    for user_id in ['USER_ID_1', 'USER_ID_2', 'USER_ID_3']:
+        recorder.record('QUESTION_ID', user_id)
+
+    assert questions.written.wait(5)
+    assert 1 == len(questions.requests)
+    assert 3 == len(questions.requests[0])
+    assert threading.current_thread() not in questions.threads
+    assert 0 == sample('voicereader_view_buffer_depth')
+
+
+def test_flush_empty_buffer(recorder, questions):
+    assert 0 == recorder.flush()
+    assert [] == questions.requests
+
+
+def test_flush_failed(recorder, questions):
+    questions.error = PyMongoError()
+    failed = sample('voicereader_view_flush_latency_seconds_count', outcome='error')
+    flushed = sample('voicereader_views_flushed_total')
+
+    recorder.record('QUESTION_ID', 'USER_ID')
+
+    assert 0 == recorder.flush()
+    assert failed + 1 == sample('voicereader_view_flush_latency_seconds_count', outcome='error')
+    assert 1 == sample('voicereader_view_buffer_depth')
+
+    questions.error = None
+
+    assert 1 == recorder.flush()
+    assert 0 == sample('voicereader_view_buffer_depth')
+    assert flushed + 1 == sample('voicereader_views_flushed_total')
+
+
+def test_flush_failed_requeue_is_bounded(recorder, questions):
+    questions.error = PyMongoError()
+    recorder._max_buffer_size = 10
+    dropped = sample('voicereader_views_dropped_total')
+
+    for user_id in ['USER_ID_1', 'USER_ID_2', 'USER_ID_3']:
+        recorder.record('QUESTION_ID', user_id)
+
+    recorder._max_buffer_size = 2
+
+    assert 0 == recorder.flush()
+    assert 2 == sample('voicereader_view_buffer_depth')
+    assert dropped + 1 == sample('voicereader_views_dropped_total')
+
+
+def test_flush_keeps_question_versions(recorder, questions):
+    recorder.record('QUESTION_ID', 'USER_ID')
+    recorder.flush()
+
+    update = questions.requests[0][0]._doc
+
+    assert {"num_of_view": 1} == update['$inc']
+    assert '$set' not in update
+    assert [] == view_recorder.mongo.db.change_markers.touched
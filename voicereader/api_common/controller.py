@@ -1,6 +1,7 @@
 import os
 
-from flask import Blueprint, current_app, redirect
+from flask import Blueprint, Response, current_app, redirect
+from werkzeug.exceptions import NotFound
 
 blueprint = Blueprint('api_common', __name__)
 
@@ -32,3 +33,15 @@ def get_version():
 @blueprint.route('/api/info/env')
 def get_env():
     return current_app.config['ENV']
+
+
+@blueprint.route('/api/metrics/')
+@blueprint.route('/api/metrics')
+def get_metrics():
+    metrics = current_app.extensions.get('metrics')
+    if metrics is None:
+        raise NotFound()
+
+    payload, content_type = metrics.render()
+
+    return Response(payload, content_type=content_type)
@@ -1,4 +1,3 @@
-import json
 import time
 import datetime
 
@@ -7,56 +6,86 @@ from flask_restplus import Namespace, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import BadRequest, Forbidden, NotFound
 
+from itertools import chain
+
 from bson import ObjectId
 from bson.errors import InvalidId
-
-from ast import literal_eval
+from pymongo import ASCENDING
 
 from voicereader.services.db import mongo
+from voicereader.services.change_markers import QUESTIONS, stamp
 from voicereader.extensions import errors
+from voicereader.extensions.payload import PayloadValidator
+from voicereader.extensions.marshalling import marshal_with, marshal_list_with
+from voicereader.extensions.cursor import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, \
+    encode_cursor, decode_cursor, after_cursor_query, after_cursor_expression
 
 from .schema import answer_with_writer_schema, post_answer_schema
-from ..user.controller import get_user
+from ..middlewares import change_markers
+from ..user.controller import load_writers
 
 api = Namespace('Answer about Question API', description='Answers related operation')
 
+post_answer_payload = PayloadValidator(post_answer_schema(api))
+
 common_parser = api.parser()
 common_parser.add_argument('Authorization', location='headers', required=True, help='Bearer <access_token>')
 
+get_parser = api.parser()
+get_parser.add_argument('limit', type=int, help='size of answers, every answer is returned when omitted')
+get_parser.add_argument('after', help='cursor of the last fetched answer')
+
 
 @api.route('/<question_id>/answers')
 @api.expect(common_parser)
 class AnswerList(Resource):
     @jwt_required
     @api.doc(description='Fetch answers by question_id')
-    @api.marshal_list_with(answer_with_writer_schema(api))
-    @api.response(400, 'Invalid question_id')
+    @api.expect(get_parser)
+    @marshal_list_with(answer_with_writer_schema(api))
+    @api.header(NEXT_CURSOR_HEADER, 'cursor to fetch the next page with "after"')
+    @api.header(TOTAL_COUNT_HEADER, 'number of answers of the question')
+    @api.response(400, 'Invalid question_id, limit or cursor')
     @api.response(401, 'Invalid AccessToken')
     @api.response(404, 'Not exists question')
     def get(self, question_id):
+        args = get_parser.parse_args()
+
+        limit = args['limit']
+        after = args['after']
+
         try:
             question_id = ObjectId(question_id)
         except InvalidId:
             raise BadRequest(errors.INVALID_QUESTION_ID)
 
-        result = []
-        records_fetched = mongo.db.questions.find_one(
-            {"_id": question_id})
+        if limit is not None and limit <= 0:
+            raise BadRequest(errors.INVALID_LIMIT)
+
+        if after is not None:
+            try:
+                after = decode_cursor(after)
+            except ValueError:
+                raise BadRequest(errors.INVALID_CURSOR)
+
+        records_fetched = get_answers(question_id, limit, after)
 
         if records_fetched is None:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
-        if 'answers' in records_fetched:
-            for record in records_fetched['answers']:
-                record['writer'] = get_user(record['writer_id'])
-                result.append(record)
+        answers = records_fetched['answers']
 
-        return result
+        headers = {TOTAL_COUNT_HEADER: records_fetched['num_of_answers']}
+        if limit is not None and len(answers) == limit:
+            last = answers[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(last['created_date'], last['_id'])
+
+        return load_writers(answers), 200, headers
 
     @jwt_required
     @api.doc(description='Add new answer', )
     @api.expect(post_answer_schema(api), validate=True)
-    @api.marshal_with(answer_with_writer_schema(api), code=201)
+    @marshal_with(answer_with_writer_schema(api), code=201)
     @api.response(400, 'Invalid question_id or request payload')
     @api.response(401, 'Invalid AccessToken')
     @api.response(404, 'Not exists question')
@@ -67,7 +96,7 @@ class AnswerList(Resource):
             raise BadRequest(errors.INVALID_QUESTION_ID)
 
         try:
-            body = literal_eval(json.dumps(request.get_json()))
+            body = post_answer_payload.validate(request.get_json())
         except ValueError:
             raise BadRequest(errors.INVALID_PAYLOAD)
 
@@ -77,12 +106,15 @@ class AnswerList(Resource):
         body['created_date'] = time.mktime(datetime.datetime.utcnow().timetuple())
 
         records_updated = mongo.db.questions.update_one({"_id": question_id},
-                                                        {"$push": {"answers": body}})
+                                                        stamp({"$inc": {"num_of_answers": 1}}))
 
         if records_updated.modified_count <= 0:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
-        body['writer'] = get_user(ObjectId(get_jwt_identity()))
+        mongo.db.answers.insert_one(body)
+        change_markers.touch(QUESTIONS)
+
+        load_writers([body])
 
         return body, 201
 
@@ -92,7 +124,7 @@ class AnswerList(Resource):
 class Answer(Resource):
     @jwt_required
     @api.doc(description='Fetch answer by answer_id')
-    @api.marshal_with(answer_with_writer_schema(api))
+    @marshal_with(answer_with_writer_schema(api))
     @api.response(400, 'Invalid question_id or answer_id')
     @api.response(401, 'Invalid AccessToken')
     @api.response(404, 'Not exists answer')
@@ -111,7 +143,7 @@ class Answer(Resource):
         if record is None:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
-        record['writer'] = get_user(record['writer_id'])
+        load_writers([record])
 
         return record
 
@@ -139,12 +171,90 @@ class Answer(Resource):
         if str(answer['writer_id']) != str(get_jwt_identity()):
             raise Forbidden(errors.NOT_EQUAL_USER_ID)
 
-        mongo.db.questions.update_one({"_id": question_id}, {"$pull": {"answers": {"_id": answer_id}}})
+        records_deleted = mongo.db.answers.delete_one({"_id": answer_id, "question_id": question_id})
+        records_pulled = mongo.db.questions.update_one({"_id": question_id, "answers._id": answer_id},
+                                                       {"$pull": {"answers": {"_id": answer_id}}})
+
+        if records_deleted.deleted_count + records_pulled.modified_count > 0:
+            mongo.db.questions.update_one({"_id": question_id}, stamp({"$inc": {"num_of_answers": -1}}))
+            change_markers.touch(QUESTIONS)
 
         return '', 204
 
 
+def get_answers(obj_question_id, limit=None, after=None):
+    question = get_answers_summary(obj_question_id)
+    if question is None:
+        return None
+
+    query = {"question_id": obj_question_id}
+    if after is not None:
+        query.update(after_cursor_query(after, ascending=True))
+
+    cursor = mongo.db.answers.find(query).sort([("created_date", ASCENDING), ("_id", ASCENDING)])
+    if limit is not None:
+        cursor = cursor.limit(limit)
+
+    answers = list(cursor)
+
+    # Questions which were not migrated yet still hold part of their answers embedded.
+    if question['legacy_answers'] > 0:
+        answers = merge_answers(get_legacy_answers(obj_question_id, limit, after), answers, limit)
+
+    # Questions which were not backfilled yet have no counter, and the page alone is not the total.
+    if question.get('num_of_answers') is None:
+        question['num_of_answers'] = question['legacy_answers'] + \
+            mongo.db.answers.count_documents({"question_id": obj_question_id})
+
+    question['answers'] = answers
+
+    return question
+
+
+def get_answers_summary(obj_question_id):
+    pipelines = [
+        {"$match": {"_id": obj_question_id}},
+        {"$project": {"num_of_answers": 1, "legacy_answers": {"$size": {"$ifNull": ["$answers", []]}}}}
+    ]
+
+    return next(iter(mongo.db.questions.aggregate(pipelines)), None)
+
+
+def get_legacy_answers(obj_question_id, limit=None, after=None):
+    answers = {"$ifNull": ["$answers", []]}
+
+    if after is not None:
+        answers = {"$filter": {"input": answers, "as": "answer", "cond": after_cursor_expression(after, 'answer')}}
+
+    if limit is not None:
+        answers = {"$slice": [answers, limit]}
+
+    pipelines = [
+        {"$match": {"_id": obj_question_id}},
+        {"$project": {"answers": answers}}
+    ]
+
+    record = next(iter(mongo.db.questions.aggregate(pipelines)), None)
+
+    return record['answers'] if record is not None else []
+
+
+def merge_answers(legacy_answers, answers, limit=None):
+    merged = dict((answer['_id'], answer) for answer in chain(legacy_answers, answers))
+    merged = sorted(merged.values(), key=lambda answer: (answer['created_date'], answer['_id']))
+
+    return merged[:limit] if limit is not None else merged
+
+
 def get_answer_by_id(obj_question_id, obj_answer_id):
+    answer = mongo.db.answers.find_one({"_id": obj_answer_id, "question_id": obj_question_id})
+    if answer is not None:
+        return answer
+
+    return get_legacy_answer_by_id(obj_question_id, obj_answer_id)
+
+
+def get_legacy_answer_by_id(obj_question_id, obj_answer_id):
     answer = mongo.db.questions.find_one({
             "$and": [{"_id": obj_question_id}, {"answers._id": obj_answer_id}]}, {"answers.$"})
 
@@ -6,10 +6,11 @@ from flask_jwt_extended import create_access_token, create_refresh_token, \
     jwt_refresh_token_required, get_jwt_identity
 
 from werkzeug.exceptions import NotFound, Unauthorized
-from firebase_admin import auth, initialize_app, credentials
+from firebase_admin import initialize_app, credentials
 
 from .schema import access_token_schema, refresh_token_schema
 from ..user.controller import get_user, get_user_id
+from ..middlewares import id_tokens
 
 from voicereader.extensions import errors
 
@@ -55,7 +56,7 @@ class Token(Resource):
         id_token = args['Authorization']
 
         try:
-            decoded_token = auth.verify_id_token(id_token, firebase_app)
+            decoded_token = id_tokens.verify(id_token)
         except ValueError:
             raise Unauthorized(errors.INVALID_ID_TOKEN)
 
@@ -1,12 +1,30 @@
 from ..services import db
+from ..services.change_markers import ChangeMarkers
+from ..services.firebase_auth import IdTokenVerifier
 from ..services.jwt import Jwt
 from ..services.s3_storage import S3Storage
+from ..services.subtitle_cache import SubtitleCache
+from ..services.upload_worker import UploadWorker
+from ..services.user_cache import UserCache
+from ..services.view_recorder import ViewRecorder
 
 jwt = Jwt()
 storage = S3Storage()
+views = ViewRecorder()
+uploads = UploadWorker()
+user_cache = UserCache()
+id_tokens = IdTokenVerifier()
+change_markers = ChangeMarkers()
+subtitle_cache = SubtitleCache()
 
 
 def init_app(app):
     storage.init_app(app)
     jwt.init_app(app)
     db.init_app(app)
+    views.init_app(app)
+    uploads.init_app(app)
+    user_cache.init_app(app)
+    id_tokens.init_app(app)
+    change_markers.init_app(app)
+    subtitle_cache.init_app(app)
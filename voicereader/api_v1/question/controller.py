@@ -1,24 +1,32 @@
 import time
 import datetime
 import os
-import asyncio
 
-from flask import jsonify, request, make_response
-from flask_restplus import Namespace, Resource
+from functools import partial
+
+from flask import Response, current_app, jsonify, request
+from flask_restplus import Namespace, Resource, inputs
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import BadRequest, Forbidden, NotFound, UnsupportedMediaType
 from werkzeug.datastructures import FileStorage
+from werkzeug.http import quote_etag
 
 from bson import ObjectId
 from bson.errors import InvalidId
 
 from voicereader.services.db import mongo
+from voicereader.services.change_markers import QUESTIONS, USERS, stamp, stamp_document
 from voicereader.extensions import errors
-from voicereader.extensions.media import allowed_file
+from voicereader.extensions.media import allowed_file, make_media_response
+from voicereader.extensions.marshalling import marshal_with, marshal_list_with
+from voicereader.extensions.bulk import MISSING_IDS_HEADER, TooManyIds, parse_object_ids, order_by_ids
+from voicereader.extensions.cursor import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, after_cursor_query
+from voicereader.extensions.etag import ETAG_HEADER, make_etag, is_not_modified, not_modified_response
+from voicereader.extensions.subtitles import VTT_MIMETYPE, Cues, parse_subtitles, hash_subtitles
 
-from .schema import question_with_writer_schema
-from ..middlewares import storage
-from ..user.controller import get_user
+from .schema import question_with_writer_schema, question_search_schema, subtitle_cue_schema
+from ..middlewares import storage, views, uploads, change_markers, subtitle_cache
+from ..user.controller import load_writers
 
 api = Namespace('Question API', description='Question related operation')
 
@@ -28,16 +36,36 @@ common_parser.add_argument('Authorization', location='headers', help='Bearer <ac
 get_parser = api.parser()
 get_parser.add_argument('offset', default=0, help='skip count of questions')
 get_parser.add_argument('size', default=3, help='size of questions')
+get_parser.add_argument('after', help='cursor of the last fetched question')
+get_parser.add_argument('ids', help='comma separated question ids to fetch in this order, paging is ignored')
+
+search_parser = api.parser()
+search_parser.add_argument('q', required=True, help='words to search in title, contents and subtitles')
+search_parser.add_argument('offset', type=int, default=0, help='skip count of questions')
+search_parser.add_argument('size', type=int, default=10, help='size of questions')
+search_parser.add_argument('after', help='cursor of the last fetched question')
+search_parser.add_argument('subtitles', type=inputs.boolean, default=False, help='include subtitles of questions')
 
 post_parser = api.parser()
 post_parser.add_argument('sound', type=FileStorage, location='files', required=True, help='file of sound')
 post_parser.add_argument('title', type=str, location='form', required=True, help='title of question')
 post_parser.add_argument('contents', type=str, location='form', required=True, help='contents of question')
-post_parser.add_argument('subtitles', type=str, location='form', required=True, help='scripts of subtitle')
+post_parser.add_argument('subtitles', type=str, location='form', required=True,
+                         help='scripts of subtitle, SRT or WebVTT is also indexed by time')
+
+subtitles_parser = api.parser()
+subtitles_parser.add_argument('from', type=float, default=0, help='start of the playback window in seconds')
+subtitles_parser.add_argument('to', type=float, help='end of the playback window in seconds')
 
 SOUND_RESOURCE = 'sound/'
 SOUND_ALLOWED_EXTENSIONS = set(['mp3', 'm4a'])
 
+MEDIA_PENDING = 'pending'
+MEDIA_READY = 'ready'
+MEDIA_FAILED = 'failed'
+
+SEARCH_QUERY_MAX_LENGTH = 256
+
 
 @api.route('')
 @api.expect(common_parser)
@@ -45,26 +73,69 @@ class QuestionList(Resource):
     @jwt_required
     @api.doc(description='Fetch questions')
     @api.expect(get_parser)
-    @api.marshal_list_with(question_with_writer_schema(api))
+    @marshal_list_with(question_with_writer_schema(api))
+    @api.header(NEXT_CURSOR_HEADER, 'cursor to fetch the next page with "after"')
+    @api.header(ETAG_HEADER, 'version of the page, send it back with If-None-Match')
+    @api.header(MISSING_IDS_HEADER, 'requested ids which do not exist, only with "ids"')
+    @api.response(304, 'Not modified since the ETag sent with If-None-Match')
+    @api.response(400, 'Invalid cursor or ids')
     @api.response(401, 'Invalid AccessToken')
     def get(self):
         args = get_parser.parse_args()
 
         offset = args['offset']
         size = args['size']
-        result = []
-
-        records_fetched = get_questions(offset, size)
-        for record in records_fetched:
-            record['writer'] = get_user(record['writer_id'])
-            result.append(record)
-
-        return result
+        after = args['after']
+        ids = args['ids']
+
+        if ids is not None:
+            try:
+                ids = parse_object_ids(ids, int(current_app.config.get('QUESTION_BULK_MAX_IDS', 100)))
+            except TooManyIds:
+                raise BadRequest(errors.TOO_MANY_IDS)
+            except ValueError:
+                raise BadRequest(errors.INVALID_IDS)
+
+        if after is not None:
+            try:
+                after = decode_cursor(after)
+            except ValueError:
+                raise BadRequest(errors.INVALID_CURSOR)
+
+        # Markers are read before the page so a concurrent write can only make the ETag older, never newer.
+        etag = None
+        markers = change_markers.versions(QUESTIONS, USERS)
+        if markers is not None:
+            etag = make_etag(QUESTIONS, offset, size, args['after'], args['ids'], *markers)
+
+            if is_not_modified(etag):
+                return not_modified_response(etag, weak=True)
+
+        # The user cache is per worker and may lag behind the USERS marker in the ETag, so writers are read fresh.
+        headers = {}
+        if etag is not None:
+            # num_of_view changes without a version bump, so these validators can only promise equivalence.
+            headers[ETAG_HEADER] = quote_etag(etag, weak=True)
+
+        # Bookmarks and history resolve many ids at once; unlike the detail endpoint this does not count views.
+        if ids is not None:
+            records_fetched, missing_ids = order_by_ids(ids, get_questions_by_ids(ids))
+            if missing_ids:
+                headers[MISSING_IDS_HEADER] = ','.join(missing_ids)
+
+            return load_writers(records_fetched, use_cache=etag is None), 200, headers
+
+        records_fetched = list(get_questions(offset, size, after))
+        if records_fetched and len(records_fetched) == int(size):
+            last = records_fetched[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(last['created_date'], last['_id'])
+
+        return load_writers(records_fetched, use_cache=etag is None), 200, headers
 
     @jwt_required
     @api.doc(description='Add new question')
     @api.expect(post_parser)
-    @api.marshal_with(question_with_writer_schema(api), code=201)
+    @marshal_with(question_with_writer_schema(api), code=201)
     @api.response(400, 'Invalid form data')
     @api.response(401, 'Invalid AccessToken')
     @api.response(415, 'Unsupport media type only mp3, m4a')
@@ -75,9 +146,17 @@ class QuestionList(Resource):
         json_data['_id'] = ObjectId()
         json_data['title'] = args['title']
         json_data['subtitles'] = args['subtitles']
+        json_data['subtitles_hash'] = hash_subtitles(args['subtitles'])
+
+        cues = parse_subtitles(args['subtitles'])
+        if cues is not None:
+            json_data['subtitle_cues'] = cues.to_document()
         json_data['contents'] = args['contents']
         json_data["writer_id"] = ObjectId(get_jwt_identity())
         json_data["created_date"] = time.mktime(datetime.datetime.utcnow().timetuple())
+        json_data['num_of_view'] = 0
+        json_data['num_of_answers'] = 0
+        stamp_document(json_data)
 
         sound_file = args['sound']
         extension = os.path.splitext(sound_file.filename)[1]
@@ -88,21 +167,75 @@ class QuestionList(Resource):
 
         json_data["sound_url"] = os.path.join(request.url, 'sound', sound_file.filename)
 
-        storage.upload_file(SOUND_RESOURCE, sound_file)
+        if uploads.is_async:
+            spooled_path = uploads.spool(SOUND_RESOURCE, sound_file)
+
+            json_data['media_status'] = MEDIA_PENDING
+            mongo.db.questions.insert(json_data)
+            change_markers.touch(QUESTIONS)
 
-        mongo.db.questions.insert(json_data)
+            uploads.submit(storage, SOUND_RESOURCE, spooled_path, sound_file.filename, sound_file.content_type,
+                           partial(set_media_status, json_data['_id']))
+        else:
+            storage.upload_file(SOUND_RESOURCE, sound_file)
 
-        json_data['writer'] = get_user(ObjectId(get_jwt_identity()))
+            json_data['media_status'] = MEDIA_READY
+            mongo.db.questions.insert(json_data)
+            change_markers.touch(QUESTIONS)
+
+        load_writers([json_data])
 
         return json_data, 201
 
 
+@api.route('/search')
+@api.expect(common_parser)
+class QuestionSearch(Resource):
+    @jwt_required
+    @api.doc(description='Search questions by title, contents and subtitles, most relevant first')
+    @api.expect(search_parser)
+    @marshal_list_with(question_search_schema(api))
+    @api.header(NEXT_CURSOR_HEADER, 'cursor to fetch the next page with "after"')
+    @api.response(400, 'Invalid search query, size or cursor')
+    @api.response(401, 'Invalid AccessToken')
+    def get(self):
+        args = search_parser.parse_args()
+
+        text = args['q'].strip()
+        offset = args['offset']
+        size = args['size']
+        after = args['after']
+
+        if not text or len(text) > SEARCH_QUERY_MAX_LENGTH:
+            raise BadRequest(errors.INVALID_SEARCH_QUERY)
+
+        if size <= 0 or offset < 0:
+            raise BadRequest(errors.INVALID_LIMIT)
+
+        if after is not None:
+            try:
+                after = decode_cursor(after)
+            except ValueError:
+                raise BadRequest(errors.INVALID_CURSOR)
+
+        records_fetched = list(search_questions(text, offset, size, after, args['subtitles']))
+
+        headers = {}
+        if records_fetched and len(records_fetched) == size:
+            last = records_fetched[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(last['score'], last['_id'])
+
+        return load_writers(records_fetched), 200, headers
+
+
 @api.route('/<question_id>')
 @api.expect(common_parser)
 class Question(Resource):
     @jwt_required
     @api.doc(description='Fetch question by question_id')
     @api.response(200, 'Success', question_with_writer_schema(api))
+    @api.header(ETAG_HEADER, 'version of the question, send it back with If-None-Match')
+    @api.response(304, 'Not modified since the ETag sent with If-None-Match')
     @api.response(400, 'Invalid question_id')
     @api.response(401, 'Invalid AccessToken')
     @api.response(404, 'Not exists question')
@@ -112,15 +245,33 @@ class Question(Resource):
         except InvalidId:
             raise BadRequest(errors.INVALID_QUESTION_ID)
 
+        markers = change_markers.versions(USERS)
+        if markers is not None and request.if_none_match:
+            version = get_question_version(question_id)
+            if version is None:
+                raise NotFound(errors.NOT_EXISTS_DATA)
+
+            etag = make_etag(question_id, version, *markers)
+
+            if is_not_modified(etag):
+                views.record(question_id, ObjectId(get_jwt_identity()))
+
+                return not_modified_response(etag, weak=True)
+
         record = get_question_by_id(question_id)
         if record is None:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
-        record['writer'] = get_user(record['writer_id'])
+        record.setdefault('media_status', MEDIA_READY)
+        load_writers([record], use_cache=markers is None)
+
+        views.record(question_id, ObjectId(get_jwt_identity()))
 
-        asyncio.run(add_read_to_question(question_id, ObjectId(get_jwt_identity())))
+        response = jsonify(record)
+        if markers is not None:
+            response.set_etag(make_etag(question_id, record.get('version', 0), *markers), weak=True)
 
-        return jsonify(record)
+        return response
 
     @jwt_required
     @api.doc(description='Remove question by question_id')
@@ -143,42 +294,169 @@ class Question(Resource):
             raise Forbidden(errors.NOT_EQUAL_USER_ID)
 
         mongo.db.questions.delete_one({"_id": question_id})
+        mongo.db.answers.delete_many({"question_id": question_id})
+        change_markers.touch(QUESTIONS)
 
         return '', 204
 
 
-def get_questions(skip, limit):
+def get_questions(skip, limit, after=None):
     pipelines = [
-        {"$sort": {"created_date": -1}},
+        {"$sort": {"created_date": -1, "_id": -1}},
         {"$skip": int(skip)},
         {"$limit": int(limit)},
-        {"$addFields": {"num_of_view": {"$size": {"$ifNull": ["$read", []]}}}},
-        {"$addFields": {"num_of_answers": {"$size": {"$ifNull": ["$answers", []]}}}},
-        {"$project": {"answers": 0, "read": 0}}
+        {"$project": {"answers": 0, "read": 0, "subtitle_cues": 0, "subtitles_hash": 0}}
     ]
 
+    if after is not None:
+        pipelines.insert(0, {"$match": after_cursor_query(after)})
+
     return mongo.db.questions.aggregate(pipelines)
 
 
-def get_question_by_id(obj_question_id):
+def get_questions_by_ids(obj_question_ids):
     pipelines = [
-        {"$match": {"_id": obj_question_id}},
-        {"$addFields": {"num_of_view": {"$size": {"$ifNull": ["$read", []]}}}},
-        {"$addFields": {"num_of_answers": {"$size": {"$ifNull": ["$answers", []]}}}},
-        {"$project": {"answers": 0, "read": 0}}
+        {"$match": {"_id": {"$in": obj_question_ids}}},
+        {"$project": {"answers": 0, "read": 0, "subtitle_cues": 0, "subtitles_hash": 0}}
     ]
 
-    result = mongo.db.questions.aggregate(pipelines)
-    result = list(result)
+    return mongo.db.questions.aggregate(pipelines)
+
+
+def search_questions(text, skip, limit, after=None, with_subtitles=False):
+    projection = {"answers": 0, "read": 0, "subtitle_cues": 0, "subtitles_hash": 0}
+    if not with_subtitles:
+        projection["subtitles"] = 0
+
+    pipelines = [
+        {"$match": {"$text": {"$search": text}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$skip": int(skip)},
+        {"$limit": int(limit)},
+        {"$project": projection}
+    ]
+
+    if after is not None:
+        pipelines.insert(2, {"$match": after_cursor_query(after, field='score')})
+
+    return mongo.db.questions.aggregate(pipelines)
+
+
+def set_media_status(obj_question_id, uploaded):
+    status = MEDIA_READY if uploaded else MEDIA_FAILED
+
+    mongo.db.questions.update_one({"_id": obj_question_id}, stamp({"$set": {"media_status": status}}))
+    change_markers.touch(QUESTIONS)
 
-    if len(result) == 0:
+
+def get_question_by_id(obj_question_id):
+    return mongo.db.questions.find_one({"_id": obj_question_id},
+                                       {"answers": 0, "read": 0, "subtitle_cues": 0, "subtitles_hash": 0})
+
+
+def get_subtitle_cues(obj_question_id):
+    # Cues are keyed on the subtitles alone; the question version also moves on unrelated edits.
+    record = mongo.db.questions.find_one({"_id": obj_question_id}, {"subtitles_hash": 1})
+    if record is None:
+        return None, None
+
+    subtitles_hash = record.get('subtitles_hash')
+    if subtitles_hash is not None:
+        cues = subtitle_cache.get(obj_question_id, subtitles_hash)
+        if cues is not None:
+            return cues, subtitles_hash
+
+    record = mongo.db.questions.find_one({"_id": obj_question_id}, {"subtitle_cues": 1, "subtitles": 1})
+    if record is None:
+        return None, None
+
+    # Questions created before the hash was stored get it on first use.
+    if subtitles_hash is None:
+        subtitles_hash = hash_subtitles(record.get('subtitles'))
+        mongo.db.questions.update_one({"_id": obj_question_id, "subtitles_hash": {"$exists": False}},
+                                      {"$set": {"subtitles_hash": subtitles_hash}})
+
+    # Questions created before cues were indexed are parsed from the raw script on first use.
+    if record.get('subtitle_cues'):
+        cues = Cues.from_document(record['subtitle_cues'])
+    else:
+        cues = parse_subtitles(record.get('subtitles'))
+
+    subtitle_cache.set(obj_question_id, subtitles_hash, cues)
+
+    return cues, subtitles_hash
+
+
+def get_question_version(obj_question_id):
+    record = mongo.db.questions.find_one({"_id": obj_question_id}, {"version": 1})
+    if record is None:
         return None
 
-    return result[0]
+    return record.get('version', 0)
+
+
+@api.route('/<question_id>/subtitles')
+@api.expect(common_parser)
+class QuestionSubtitles(Resource):
+    @jwt_required
+    @api.doc(description='Fetch subtitle cues shown during a playback window')
+    @api.expect(subtitles_parser)
+    @marshal_list_with(subtitle_cue_schema(api))
+    @api.response(400, 'Invalid question_id or window')
+    @api.response(401, 'Invalid AccessToken')
+    @api.response(404, 'Not exists question or timed subtitles')
+    def get(self, question_id):
+        args = subtitles_parser.parse_args()
+
+        try:
+            question_id = ObjectId(question_id)
+        except InvalidId:
+            raise BadRequest(errors.INVALID_QUESTION_ID)
+
+        start = args['from']
+        end = args['to'] if args['to'] is not None else float('inf')
+
+        if start < 0 or end < start:
+            raise BadRequest(errors.INVALID_SUBTITLE_WINDOW)
 
+        cues, _ = get_subtitle_cues(question_id)
+        if cues is None:
+            raise NotFound(errors.NOT_EXISTS_DATA)
 
-async def add_read_to_question(obj_question_id, obj_user_id):
-    mongo.db.questions.update_one({"_id": obj_question_id}, {"$addToSet": {"read": obj_user_id}})
+        # Cues are stored in milliseconds, the window is asked in seconds.
+        return [{"start": cue_start / 1000, "end": cue_end / 1000, "text": text}
+                for cue_start, cue_end, text in cues.window(start * 1000, end * 1000)]
+
+
+@api.route('/<question_id>/subtitles.vtt')
+@api.expect(common_parser)
+class QuestionSubtitlesVtt(Resource):
+    @jwt_required
+    @api.doc(description='Fetch timed subtitles as a WebVTT file')
+    @api.response(200, 'WebVTT file')
+    @api.response(304, 'Not modified since the ETag sent with If-None-Match')
+    @api.response(400, 'Invalid question_id')
+    @api.response(401, 'Invalid AccessToken')
+    @api.response(404, 'Not exists question or timed subtitles')
+    def get(self, question_id):
+        try:
+            question_id = ObjectId(question_id)
+        except InvalidId:
+            raise BadRequest(errors.INVALID_QUESTION_ID)
+
+        cues, subtitles_hash = get_subtitle_cues(question_id)
+        if cues is None:
+            raise NotFound(errors.NOT_EXISTS_DATA)
+
+        etag = make_etag(question_id, subtitles_hash, 'vtt')
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        response = Response(cues.to_vtt(), mimetype=VTT_MIMETYPE)
+        response.set_etag(etag)
+
+        return response
 
 
 @api.route('/sound/<path:filename>')
@@ -186,13 +464,5 @@ async def add_read_to_question(obj_question_id, obj_user_id):
 class QuestionSound(Resource):
     # @jwt_required
     def get(self, filename):
-        file = storage.fetch_file(SOUND_RESOURCE, filename)
-        if not file:
-            raise NotFound()
-
-        response = make_response(file)
-        response.headers['Content-Type'] = 'audio'
-        response.status_code = 200
-
-        return response
+        return make_media_response(storage, SOUND_RESOURCE, filename)
 
@@ -14,6 +14,16 @@ def question_schema(api):
         'created_date': fields.Integer(description='datetime when create question', example='1547405521'),
         'sound_url': fields.String(description='sound file url',
                                    example='{base_url}/api/v1/questions/sound/5c3c4fe4182838cf4ea9e6f1.mp3'),
+        'media_status': fields.String(description='upload status of sound file', default='ready',
+                                      enum=['pending', 'ready', 'failed']),
+    })
+
+
+def subtitle_cue_schema(api):
+    return api.model('Subtitle Cue', {
+        'start': fields.Float(description='seconds when the cue is shown', example=1.5),
+        'end': fields.Float(description='seconds when the cue is hidden', example=3.25),
+        'text': fields.String(description='text of the cue', example='<subtitle>'),
     })
 
 
@@ -21,3 +31,9 @@ def question_with_writer_schema(api):
     return api.inherit('Question Detail', question_schema(api), {
         'writer': fields.Nested(user_schema(api), description='Infomation of Writer')
     })
+
+
+def question_search_schema(api):
+    return api.inherit('Question Search Result', question_with_writer_schema(api), {
+        'score': fields.Float(description='relevance to the search words', example=1.5)
+    })
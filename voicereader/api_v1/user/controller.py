@@ -1,10 +1,9 @@
-import json
 import bson
 import datetime
 import time
 import os
 
-from flask import request, jsonify, make_response
+from flask import current_app, request, jsonify, g
 from flask_restplus import Resource, Namespace
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import BadRequest, Unauthorized, \
@@ -13,29 +12,64 @@ from werkzeug.datastructures import FileStorage
 
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from firebase_admin import auth
-from ast import literal_eval
 
-from .schema import post_user_schema, user_schema
-from ..middlewares import storage
+from .schema import post_user_schema, public_user_schema, user_schema
+from ..middlewares import storage, user_cache, id_tokens, change_markers
 
 from voicereader.services.db import mongo
+from voicereader.services.change_markers import USERS
 from voicereader.extensions import errors
-from voicereader.extensions.media import allowed_file
+from voicereader.extensions.bulk import MISSING_IDS_HEADER, TooManyIds, parse_object_ids, order_by_ids
+from voicereader.extensions.media import allowed_file, make_media_response
+from voicereader.extensions.marshalling import marshal_with, marshal_list_with
+from voicereader.extensions.payload import PayloadValidator
 
 api = Namespace('User API', description='Users related operation')
 
+update_user_payload = PayloadValidator(user_schema(api))
+
 post_parser = api.parser()
 post_parser.add_argument('Authorization', location='headers', required=True, help='ID Token from firebase auth')
 
+get_parser = api.parser()
+get_parser.add_argument('Authorization', location='headers', required=True, help='Bearer <access_token>')
+get_parser.add_argument('ids', required=True, help='comma separated user ids to fetch in this order')
+
+PUBLIC_USER_PROJECTION = {"email": 0, "fcm_uid": 0}
+
 
 DEFAULT_USER_PHOTO_PATH = '/00/photo/default_user_profile.png'
 
 
 @api.route('')
 class UserList(Resource):
+    @jwt_required
+    @api.doc(description='Fetch public profiles of users by ids')
+    @api.expect(get_parser)
+    @marshal_list_with(public_user_schema(api))
+    @api.header(MISSING_IDS_HEADER, 'requested ids which do not exist')
+    @api.response(400, 'Invalid ids')
+    @api.response(401, 'Invalid AccessToken')
+    def get(self):
+        args = get_parser.parse_args()
+
+        try:
+            ids = parse_object_ids(args['ids'], int(current_app.config.get('USER_BULK_MAX_IDS', 100)))
+        except TooManyIds:
+            raise BadRequest(errors.TOO_MANY_IDS)
+        except ValueError:
+            raise BadRequest(errors.INVALID_IDS)
+
+        records_fetched, missing_ids = order_by_ids(ids, get_public_users(ids))
+
+        headers = {}
+        if missing_ids:
+            headers[MISSING_IDS_HEADER] = ','.join(missing_ids)
+
+        return records_fetched, 200, headers
+
     @api.doc(description='Add new user', parser=post_parser, body=post_user_schema(api), validate=True)
-    @api.marshal_with(user_schema(api), code=201)
+    @marshal_with(user_schema(api), code=201)
     @api.response(400, 'Invalid user schema')
     @api.response(401, 'Invalid IdToken')
     @api.response(409, 'Already exists user')
@@ -45,7 +79,7 @@ class UserList(Resource):
         id_token = args['Authorization']
 
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = id_tokens.verify(id_token)
         except ValueError:
             raise Unauthorized(errors.INVALID_ID_TOKEN)
 
@@ -93,7 +127,7 @@ class User(Resource):
         except bson.errors.InvalidId:
             raise BadRequest(errors.INVALID_USER_ID)
 
-        record_fetched = mongo.db.users.find_one({"_id": user_id})
+        record_fetched = get_user(user_id)
         if record_fetched is None:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
@@ -111,11 +145,17 @@ class User(Resource):
             raise Forbidden()
 
         try:
-            body = literal_eval(json.dumps({"$set": request.get_json()}))
+            body = {"$set": update_user_payload.validate(request.get_json())}
         except ValueError:
             raise BadRequest(errors.INVALID_PAYLOAD)
 
+        if not body['$set']:
+            raise BadRequest(errors.INVALID_PAYLOAD)
+
         record_updated = mongo.db.users.update_one({"_id": ObjectId(user_id)}, body)
+        user_cache.invalidate(ObjectId(user_id))
+        change_markers.touch(USERS)
+
         if record_updated.matched_count == 0:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
@@ -131,6 +171,10 @@ class User(Resource):
             raise Forbidden()
 
         record_deleted = mongo.db.users.delete_one({"_id": ObjectId(user_id)})
+        user_cache.invalidate(ObjectId(user_id))
+        change_markers.touch(USERS)
+        id_tokens.forget_user_id(user_id)
+
         if record_deleted.deleted_count < 1:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
@@ -174,6 +218,9 @@ class UserPhoto(Resource):
         }}
 
         record_updated = mongo.db.users.update_one({"_id": ObjectId(user_id)}, query)
+        user_cache.invalidate(ObjectId(user_id))
+        change_markers.touch(USERS)
+
         if record_updated.matched_count == 0:
             raise NotFound(errors.NOT_EXISTS_DATA)
 
@@ -188,21 +235,13 @@ class UserPhoto(Resource):
 @api.doc(False)
 class UserPhotoGet(Resource):
     def get(self, user_id, file_name):
-        file = storage.fetch_file(PHOTO_RESOURCE, file_name)
-        if not file:
-            raise NotFound()
-
-        response = make_response(file)
-        response.headers['Content-Type'] = 'image'
-        response.status_code = 200
-
-        return response
+        return make_media_response(storage, PHOTO_RESOURCE, file_name)
 
 
 @api.route('/debug')
 class DebugUser(Resource):
     @api.doc(description='Fetch all users for debug')
-    @api.marshal_list_with(user_schema(api))
+    @marshal_list_with(user_schema(api))
     def get(self):
         result = []
 
@@ -213,12 +252,79 @@ class DebugUser(Resource):
 
 
 def get_user(user_id):
-    return mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    user_id = ObjectId(user_id)
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = mongo.db.users.find_one({"_id": user_id})
+        user_cache.set(user_id, user)
+
+    return user
+
+
+def get_users(user_ids, use_cache=True):
+    loaded = g.setdefault('loaded_users', {})
+
+    obj_user_ids = [ObjectId(user_id) for user_id in user_ids]
+    missing_ids = []
+
+    for user_id in set(user_id for user_id in obj_user_ids if user_id not in loaded):
+        user = user_cache.get(user_id) if use_cache else None
+
+        if user is None:
+            missing_ids.append(user_id)
+        else:
+            loaded[user_id] = user
+
+    if missing_ids:
+        for user in mongo.db.users.find({"_id": {"$in": missing_ids}}):
+            loaded[user['_id']] = user
+            user_cache.set(user['_id'], user)
+
+        for user_id in missing_ids:
+            loaded.setdefault(user_id, None)
+
+    return {user_id: loaded[user_id] for user_id in obj_user_ids}
+
+
+def get_public_users(obj_user_ids):
+    users = []
+    missing_ids = []
+
+    for user_id in obj_user_ids:
+        user = user_cache.get(user_id)
+
+        if user is None:
+            missing_ids.append(user_id)
+        else:
+            users.append(user)
+
+    # Lean documents are not cached, the user cache keeps whole users for get_user.
+    if missing_ids:
+        users.extend(mongo.db.users.find({"_id": {"$in": missing_ids}}, PUBLIC_USER_PROJECTION))
+
+    return users
+
+
+def load_writers(records, use_cache=True):
+    users = get_users([record['writer_id'] for record in records], use_cache)
+
+    for record in records:
+        record['writer'] = users[ObjectId(record['writer_id'])]
+
+    return records
 
 
 def get_user_id(firebase_uid):
-    records_fetched = mongo.db.users.find_one({"fcm_uid": firebase_uid})
+    user_id = id_tokens.get_user_id(firebase_uid)
+    if user_id is not None:
+        return user_id
+
+    records_fetched = mongo.db.users.find_one({"fcm_uid": firebase_uid}, {"_id": 1})
     if records_fetched is None:
         return None
 
-    return str(records_fetched['_id'])
+    user_id = str(records_fetched['_id'])
+    id_tokens.set_user_id(firebase_uid, user_id)
+
+    return user_id
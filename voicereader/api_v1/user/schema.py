@@ -3,10 +3,20 @@ from flask_restplus import fields
 
 def user_schema(api):
     return api.model('User', {
+        '_id': fields.String(description='User ID', example='5c38b8df18283838d53dfe37', readonly=True),
+        'display_name': fields.String(description='Nickname', example='Lion'),
+        'email': fields.String(description='Email of user', example='lion@example.com', readonly=True),
+        'fcm_uid': fields.String(description='Unique id from firebase auth', readonly=True),
+        'picture': fields.String(description='URL of profile picture'),
+        'location': fields.String(description='Location of user', default=''),
+        'created_date': fields.Integer(description='user created date', example=1547188815, readonly=True),
+    })
+
+
+def public_user_schema(api):
+    return api.model('Public User', {
         '_id': fields.String(description='User ID', example='5c38b8df18283838d53dfe37'),
         'display_name': fields.String(description='Nickname', example='Lion'),
-        'email': fields.String(description='Email of user', example='lion@example.com'),
-        'fcm_uid': fields.String(description='Unique id from firebase auth'),
         'picture': fields.String(description='URL of profile picture'),
         'location': fields.String(description='Location of user', default=''),
         'created_date': fields.Integer(description='user created date', example=1547188815),
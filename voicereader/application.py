@@ -1,5 +1,6 @@
 from flask import Flask
 from . import startup
+from .extensions.profiler import Profiler
 
 
 def create():
@@ -8,5 +9,8 @@ def create():
     startup.load_config(app)
     startup.configure_app(app)
     startup.register_resources(app)
+    startup.register_commands(app)
+
+    Profiler().init_app(app)
 
     return app
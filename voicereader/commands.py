@@ -0,0 +1,202 @@
+import datetime
+import mimetypes
+import os
+import time
+
+import click
+
+from functools import partial
+from itertools import islice
+
+from flask.cli import with_appcontext
+from pymongo import UpdateOne, ReturnDocument
+
+from .services.change_markers import QUESTIONS, stamp, touch_markers
+from .services.db import mongo
+from .services.indexes import index_name, sync_indexes
+from .api_v1.middlewares import storage, uploads
+from .api_v1.question.controller import SOUND_RESOURCE, MEDIA_PENDING, set_media_status
+
+
+@click.command('backfill-question-counters')
+@click.option('--batch-size', default=500, help='number of questions updated per bulk write')
+@with_appcontext
+def backfill_question_counters(batch_size):
+    pipelines = [
+        {"$project": {
+            "num_of_view": {"$size": {"$ifNull": ["$read", []]}},
+            "num_of_answers": {"$size": {"$ifNull": ["$answers", []]}},
+            "stored_num_of_answers": "$num_of_answers",
+        }}
+    ]
+
+    questions = mongo.db.questions.aggregate(pipelines)
+    matched = 0
+    skipped = 0
+
+    # Each batch of counters is read before its answers are counted, so the guard below sees any answer
+    # posted or deleted in between.
+    for records in iter(lambda: list(islice(questions, batch_size)), []):
+        answer_counts = _count_answers([record['_id'] for record in records])
+
+        requests = []
+        for record in records:
+            num_of_answers = record['num_of_answers'] + answer_counts.get(record['_id'], 0)
+
+            view_query = _size_query(record['_id'], 'read', record['num_of_view'])
+            requests.append(UpdateOne(view_query, {"$set": {"num_of_view": record['num_of_view']}}))
+
+            answers_query = _size_query(record['_id'], 'answers', record['num_of_answers'])
+            answers_query['num_of_answers'] = record.get('stored_num_of_answers')
+            requests.append(UpdateOne(answers_query, stamp({"$set": {"num_of_answers": num_of_answers}})))
+
+        result = mongo.db.questions.bulk_write(requests, ordered=False)
+
+        matched += result.matched_count
+        skipped += len(requests) - result.matched_count
+
+    if matched:
+        touch_markers(mongo.db, QUESTIONS)
+
+    click.echo('Backfilled {} question counters'.format(matched))
+
+    if skipped:
+        click.echo('Skipped {} question counters changed meanwhile, run again to backfill them'.format(skipped))
+
+
+def _count_answers(obj_question_ids):
+    return dict((record['_id'], record['count']) for record in mongo.db.answers.aggregate([
+        {"$match": {"question_id": {"$in": obj_question_ids}}},
+        {"$group": {"_id": "$question_id", "count": {"$sum": 1}}}
+    ]))
+
+
+def _size_query(obj_question_id, array_field, size):
+    # Counters are only set if what they were measured from did not change, and the request path's
+    # $inc on num_of_answers is caught by also matching the counter read before counting.
+    if size == 0:
+        query = {"$or": [{array_field: {"$exists": False}}, {array_field: {"$size": 0}}]}
+    else:
+        query = {array_field: {"$size": size}}
+
+    query['_id'] = obj_question_id
+
+    return query
+
+
+@click.command('migrate-answers')
+@click.option('--batch-size', default=100, help='number of questions fetched per batch')
+@with_appcontext
+def migrate_answers(batch_size):
+    moved = 0
+
+    questions = mongo.db.questions.find({"answers.0": {"$exists": True}}, {"answers": 1}, batch_size=batch_size)
+    for question in questions:
+        moved += _migrate_question_answers(question)
+
+    click.echo('Moved {} answers'.format(moved))
+
+
+def _migrate_question_answers(question):
+    answers = question['answers']
+    answer_ids = [answer['_id'] for answer in answers]
+
+    requests = []
+    for answer in answers:
+        document = dict((key, value) for key, value in answer.items() if key != '_id')
+        document.setdefault('question_id', question['_id'])
+
+        requests.append(UpdateOne({"_id": answer['_id']}, {"$setOnInsert": document}, upsert=True))
+
+    mongo.db.answers.bulk_write(requests, ordered=False)
+
+    before = mongo.db.questions.find_one_and_update({"_id": question['_id']},
+                                                    {"$pull": {"answers": {"_id": {"$in": answer_ids}}}},
+                                                    projection={"answers._id": 1},
+                                                    return_document=ReturnDocument.BEFORE)
+
+    # An answer deleted by the API between the copy and the pull must not come back.
+    pulled_ids = set(answer['_id'] for answer in (before or {}).get('answers', []))
+    vanished_ids = [answer_id for answer_id in answer_ids if answer_id not in pulled_ids]
+
+    if vanished_ids:
+        mongo.db.answers.delete_many({"_id": {"$in": vanished_ids}})
+
+    mongo.db.questions.update_one({"_id": question['_id'], "answers": {"$size": 0}}, {"$unset": {"answers": ""}})
+
+    return len(answer_ids) - len(vanished_ids)
+
+
+@click.command('sync-indexes')
+@click.option('--drop-extra', is_flag=True, help='drop indexes which are not declared in the registry')
+@click.option('--dry-run', is_flag=True, help='only report differences')
+@with_appcontext
+def sync_indexes_command(drop_extra, dry_run):
+    reports = sync_indexes(mongo.db, drop_extra=drop_extra, dry_run=dry_run)
+
+    for report in reports:
+        for index in report.missing:
+            click.echo('{}: missing {}'.format(report.collection, index_name(index)))
+
+        for name, index in report.wrong:
+            click.echo('{}: wrong {} (expected {})'.format(report.collection, name, index_name(index)))
+
+        for name in report.extra:
+            click.echo('{}: extra {}'.format(report.collection, name))
+
+    if any(report.missing or report.wrong or report.extra for report in reports):
+        click.echo('Index differences were reported' if dry_run else 'Indexes were synchronized')
+    else:
+        click.echo('Indexes are up to date')
+
+
+@click.command('sweep-uploads')
+@click.option('--older-than', default=3600, help='seconds after which a pending upload is considered stale')
+@with_appcontext
+def sweep_uploads(older_than):
+    # Run where the spool of every api replica is mounted, or uploads spooled elsewhere are marked failed.
+    created_before = time.mktime(datetime.datetime.utcnow().timetuple()) - older_than
+    retried = 0
+    failed = 0
+
+    stale = mongo.db.questions.find({"media_status": MEDIA_PENDING, "created_date": {"$lt": created_before}},
+                                    {"sound_url": 1})
+
+    for question in stale:
+        filename = os.path.basename(question.get('sound_url', ''))
+        path = uploads.spooled_path(SOUND_RESOURCE, filename)
+
+        # Without a spooled file the worker that owned the upload is gone, and the sound is lost with it.
+        if not filename or not os.path.exists(path):
+            set_media_status(question['_id'], False)
+            failed += 1
+            continue
+
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        if uploads.upload(storage, SOUND_RESOURCE, path, filename, content_type,
+                          partial(set_media_status, question['_id'])):
+            retried += 1
+        else:
+            failed += 1
+
+    pending = set(str(question['_id']) for question in mongo.db.questions.find({"media_status": MEDIA_PENDING},
+                                                                                 {"_id": 1}))
+    removed = 0
+
+    for path in uploads.spooled_files(SOUND_RESOURCE):
+        question_id = os.path.splitext(os.path.basename(path))[0]
+
+        if question_id not in pending and os.path.getmtime(path) < time.time() - older_than:
+            os.remove(path)
+            removed += 1
+
+    click.echo('Uploaded {} and failed {} stale uploads, removed {} orphaned spool files'.format(
+        retried, failed, removed))
+
+
+def init_app(app):
+    app.cli.add_command(backfill_question_counters)
+    app.cli.add_command(sweep_uploads)
+    app.cli.add_command(sync_indexes_command)
+    app.cli.add_command(migrate_answers)
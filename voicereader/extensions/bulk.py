@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+MISSING_IDS_HEADER = 'X-Missing-Ids'
+
+
+class TooManyIds(ValueError):
+    pass
+
+
+def parse_object_ids(value, max_ids):
+    # Duplicates are fetched once but the first position of each id is kept.
+    ids = OrderedDict.fromkeys(item.strip() for item in value.split(',') if item.strip())
+
+    if not ids:
+        raise ValueError(value)
+
+    if len(ids) > max_ids:
+        raise TooManyIds(len(ids))
+
+    try:
+        return [ObjectId(item) for item in ids]
+    except (InvalidId, TypeError):
+        raise ValueError(value)
+
+
+def order_by_ids(obj_ids, records):
+    found = dict((record['_id'], record) for record in records)
+
+    ordered = [found[obj_id] for obj_id in obj_ids if obj_id in found]
+    missing = [str(obj_id) for obj_id in obj_ids if obj_id not in found]
+
+    return ordered, missing
@@ -0,0 +1,107 @@
+import time
+import zlib
+
+from flask import request
+
+from voicereader.services.metrics import COMPRESSION_LATENCY, COMPRESSION_INPUT_BYTES, COMPRESSION_OUTPUT_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODING_GZIP = 'gzip'
+ENCODING_BROTLI = 'br'
+
+DEFAULT_MIMETYPES = ('application/json', 'text/vtt')
+
+# wbits 16 + MAX_WBITS writes a gzip container without a timestamp, so equal bodies compress to equal bytes.
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class Compression:
+    enabled = False
+    min_size = 1024
+    gzip_level = 6
+    brotli_quality = 4
+    mimetypes = frozenset(DEFAULT_MIMETYPES)
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self.enabled = bool(app.config.get('COMPRESSION_ENABLED', True))
+        self.min_size = int(app.config.get('COMPRESSION_MIN_SIZE', self.min_size))
+        self.gzip_level = int(app.config.get('COMPRESSION_GZIP_LEVEL', self.gzip_level))
+        self.brotli_quality = int(app.config.get('COMPRESSION_BROTLI_QUALITY', self.brotli_quality))
+        self.mimetypes = frozenset(app.config.get('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES))
+
+        app.after_request(self.compress_response)
+        app.extensions['compression'] = self
+
+    def compress_response(self, response):
+        if not self.enabled or not self._is_compressible(response):
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        # The body now depends on Accept-Encoding whether or not this client gets it compressed.
+        response.vary.add('Accept-Encoding')
+
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        started = time.perf_counter()
+        compressed = self.compress(data, encoding)
+        COMPRESSION_LATENCY.labels(encoding).observe(time.perf_counter() - started)
+
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+
+        COMPRESSION_INPUT_BYTES.labels(encoding).inc(len(data))
+        COMPRESSION_OUTPUT_BYTES.labels(encoding).inc(len(compressed))
+
+        return response
+
+    def negotiate(self, accept_encoding):
+        gzip_quality = accept_encoding.quality(ENCODING_GZIP)
+        brotli_quality = accept_encoding.quality(ENCODING_BROTLI) if brotli is not None else 0
+
+        if brotli_quality > 0 and brotli_quality >= gzip_quality:
+            return ENCODING_BROTLI
+
+        if gzip_quality > 0:
+            return ENCODING_GZIP
+
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == ENCODING_BROTLI:
+            return brotli.compress(data, quality=self.brotli_quality)
+
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, _GZIP_WBITS)
+
+        return compressor.compress(data) + compressor.flush()
+
+    def _is_compressible(self, response):
+        # Media is streamed with direct_passthrough and never matches the JSON mimetypes anyway.
+        if response.direct_passthrough or response.is_streamed:
+            return False
+
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+
+        if 'Content-Encoding' in response.headers:
+            return False
+
+        return response.mimetype in self.mimetypes
@@ -0,0 +1,52 @@
+import base64
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+
+
+def encode_cursor(created_date, obj_id):
+    raw = json.dumps([created_date, str(obj_id)])
+
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        raise ValueError(cursor)
+
+    try:
+        created_date, obj_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        obj_id = ObjectId(obj_id)
+    except (ValueError, TypeError, InvalidId):
+        raise ValueError(cursor)
+
+    if not isinstance(created_date, (int, float)):
+        raise ValueError(cursor)
+
+    return created_date, obj_id
+
+
+def after_cursor_query(cursor, ascending=False, field='created_date'):
+    value, obj_id = cursor
+    operator = "$gt" if ascending else "$lt"
+
+    return {"$or": [
+        {field: {operator: value}},
+        {field: value, "_id": {operator: obj_id}},
+    ]}
+
+
+def after_cursor_expression(cursor, variable):
+    # Embedded answers are stored oldest first, so "after" moves forward in time.
+    created_date, obj_id = cursor
+    created_date_field = '$${}.created_date'.format(variable)
+    id_field = '$${}._id'.format(variable)
+
+    return {"$or": [
+        {"$gt": [created_date_field, created_date]},
+        {"$and": [{"$eq": [created_date_field, created_date]}, {"$gt": [id_field, obj_id]}]},
+    ]}
@@ -3,6 +3,12 @@ INVALID_PAYLOAD = 'Invalid request payload'
 INVALID_USER_ID = 'Invalid User ID'
 INVALID_QUESTION_ID = 'Invalid Question ID'
 INVALID_ANSWER_ID = 'Invalid Answer ID'
+INVALID_CURSOR = 'Invalid cursor'
+INVALID_LIMIT = 'Invalid limit'
+INVALID_SEARCH_QUERY = 'Invalid search query'
+INVALID_SUBTITLE_WINDOW = 'Invalid subtitle window'
+INVALID_IDS = 'Invalid id list'
+TOO_MANY_IDS = 'Too many ids requested at once'
 
 UNSUPPORT_MEDIA_TYPE = 'Not allowed UnsupportMediaType'
 
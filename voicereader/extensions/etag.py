@@ -0,0 +1,21 @@
+import hashlib
+
+from flask import Response, request
+
+ETAG_HEADER = 'ETag'
+
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag):
+    # If-None-Match uses the weak comparison, so a proxy weakening the tag still matches.
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag, weak=False):
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+
+    return response
@@ -1,9 +1,57 @@
+import datetime
 import json
+import logging
+
 from bson import ObjectId
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND_STDLIB = 'stdlib'
+BACKEND_ORJSON = 'orjson'
+
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, ObjectId):
             return str(o)
+        if isinstance(o, (datetime.datetime, datetime.date)):
+            return o.isoformat()
         return json.JSONEncoder.default(self, o)
+
+
+class OrjsonEncoder(JSONEncoder):
+    # orjson always emits UTF-8, so ensure_ascii is not honoured on this path.
+    def encode(self, o):
+        if self.indent not in (None, 2):
+            return super().encode(o)
+
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(o, default=_orjson_default, option=option).decode('utf-8')
+
+
+def _orjson_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    raise TypeError(o)
+
+
+def get_json_encoder(backend=BACKEND_STDLIB):
+    if backend == BACKEND_STDLIB:
+        return JSONEncoder
+
+    if backend == BACKEND_ORJSON:
+        if orjson is not None:
+            return OrjsonEncoder
+
+        logging.getLogger(__name__).warning('orjson is not installed, falling back to the stdlib JSON encoder')
+        return JSONEncoder
+
+    raise ValueError(backend)
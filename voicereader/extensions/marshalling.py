@@ -0,0 +1,124 @@
+from functools import wraps
+
+from flask import request, current_app, has_app_context
+from flask_restplus import fields, marshal
+from flask_restplus._http import HTTPStatus
+from flask_restplus.utils import merge, unpack
+from werkzeug.wrappers import BaseResponse
+
+_FORMATTERS = {
+    fields.String: str,
+    fields.Integer: int,
+    fields.Float: float,
+}
+
+_GENERIC = object()
+_EMPTY_NESTED = object()
+
+
+def compile_model(model):
+    plan = tuple(_compile_field(key, field) for key, field in getattr(model, 'resolved', model).items())
+
+    def serialize(record):
+        get = record.get
+        result = {}
+
+        for key, format_value, missing in plan:
+            if missing is _GENERIC:
+                result[key] = format_value(record)
+                continue
+
+            value = get(key)
+
+            if value is not None:
+                result[key] = format_value(value)
+            elif missing is _EMPTY_NESTED:
+                result[key] = format_value({})
+            else:
+                result[key] = missing
+
+        return result
+
+    def serialize_data(data):
+        # A value the formatters reject is handed to restplus, so the error raised stays identical.
+        try:
+            if isinstance(data, (list, tuple)):
+                return [serialize(record) for record in data]
+            return serialize(data)
+        except (ValueError, TypeError):
+            return marshal(data, model)
+
+    return serialize_data
+
+
+def _compile_field(key, field):
+    if isinstance(field, type):
+        field = field()
+
+    field_type = type(field)
+    default = field.default
+
+    # restplus resolves dotted keys as paths and falls back to attributes of the record
+    if '.' in key or hasattr(dict, key) or field.attribute is not None or field.mask is not None or callable(default):
+        return key, lambda record: field.output(key, record), _GENERIC
+
+    if field_type is fields.Nested:
+        if field.skip_none or getattr(field.nested, '__mask__', None):
+            return key, lambda record: field.output(key, record), _GENERIC
+
+        nested = compile_model(field.nested)
+
+        if field.allow_null:
+            missing = None
+        elif default is not None:
+            missing = default
+        else:
+            missing = _EMPTY_NESTED
+
+        return key, nested, missing
+
+    if field_type.output is not fields.Raw.output:
+        return key, lambda record: field.output(key, record), _GENERIC
+
+    format_value = _FORMATTERS.get(field_type, field.format)
+    missing = field.format(default) if default else default
+
+    return key, format_value, missing
+
+
+def marshal_with(model, as_list=False, code=HTTPStatus.OK, description=None):
+    serialize = compile_model(model)
+
+    def wrapper(func):
+        doc = {
+            'responses': {
+                code: (description, [model]) if as_list else (description, model)
+            },
+            '__mask__': True,
+        }
+        func.__apidoc__ = merge(getattr(func, '__apidoc__', {}), doc)
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            resp = func(*args, **kwargs)
+
+            if isinstance(resp, BaseResponse):
+                return resp
+
+            mask = None
+            if has_app_context():
+                mask = request.headers.get(current_app.config['RESTPLUS_MASK_HEADER'])
+
+            if isinstance(resp, tuple):
+                data, status, headers = unpack(resp)
+                return (marshal(data, model, mask=mask) if mask else serialize(data)), status, headers
+
+            return marshal(resp, model, mask=mask) if mask else serialize(resp)
+
+        return inner
+
+    return wrapper
+
+
+def marshal_list_with(model, **kwargs):
+    return marshal_with(model, True, **kwargs)
@@ -1,3 +1,91 @@
+import mimetypes
+
+from flask import Response, request, redirect
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
+
+from voicereader.services.stored_file import Conditions, RangeNotSatisfiable, NotModified, \
+    DELIVERY_REDIRECT, DELIVERY_ACCEL_REDIRECT
+
+MEDIA_TYPES = {
+    'mp3': 'audio/mpeg',
+    'm4a': 'audio/mp4',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+}
+
+
 def allowed_file(file_name, allowed_extensions):
     return '.' in file_name and \
            file_name.rsplit('.', 1)[1].lower() in allowed_extensions
+
+
+def guess_media_type(file_name):
+    if '.' in file_name:
+        extension = file_name.rsplit('.', 1)[1].lower()
+
+        if extension in MEDIA_TYPES:
+            return MEDIA_TYPES[extension]
+
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+
+def requested_byte_range():
+    byte_range = request.range
+
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return None
+
+    return byte_range.ranges[0]
+
+
+def request_conditions():
+    if not request.if_none_match and request.if_modified_since is None:
+        return None
+
+    return Conditions(request.if_none_match, request.if_modified_since)
+
+
+def make_media_response(storage, resource, file_name):
+    if storage.delivery_mode == DELIVERY_REDIRECT:
+        return redirect(storage.presigned_url(resource, file_name), 302)
+
+    if storage.delivery_mode == DELIVERY_ACCEL_REDIRECT:
+        response = Response(mimetype=guess_media_type(file_name))
+        response.headers['X-Accel-Redirect'] = storage.accel_redirect_path(resource, file_name)
+
+        return response
+
+    try:
+        file = storage.open_file(resource, file_name, requested_byte_range(), request_conditions())
+    except NotModified as ex:
+        response = Response(status=304)
+        _set_validators(response, ex.etag, ex.last_modified)
+
+        return response
+    except RangeNotSatisfiable as ex:
+        raise RequestedRangeNotSatisfiable(length=ex.size)
+
+    if file is None:
+        raise NotFound()
+
+    response = Response(file.chunks, mimetype=guess_media_type(file_name), direct_passthrough=True)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.content_length = file.length
+    _set_validators(response, file.etag, file.last_modified)
+
+    if file.content_range is not None:
+        start, stop = file.content_range
+
+        response.status_code = 206
+        response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, stop - 1, file.size)
+
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    if etag is not None:
+        response.set_etag(etag)
+
+    if last_modified is not None:
+        response.last_modified = last_modified
@@ -0,0 +1,59 @@
+from flask_restplus import fields
+
+_FIELD_TYPES = (
+    (fields.Boolean, (bool,)),
+    (fields.Integer, (int,)),
+    (fields.Float, (int, float)),
+    (fields.String, (str,)),
+)
+
+_MISSING = object()
+
+
+class PayloadValidator:
+    def __init__(self, model):
+        model = getattr(model, 'resolved', model)
+
+        self._fields = tuple(
+            (name, _python_types(field), bool(field.required), _enum(field))
+            for name, field in model.items() if not field.readonly
+        )
+
+    def validate(self, payload):
+        if not isinstance(payload, dict):
+            raise ValueError(payload)
+
+        result = {}
+
+        for name, types, required, enum in self._fields:
+            value = payload.get(name, _MISSING)
+
+            if value is _MISSING:
+                if required:
+                    raise ValueError(name)
+                continue
+
+            # bool is an int subclass, so it has to be rejected explicitly for numbers
+            if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+                raise ValueError(name)
+
+            if enum is not None and value not in enum:
+                raise ValueError(name)
+
+            result[name] = value
+
+        return result
+
+
+def _python_types(field):
+    for field_type, python_types in _FIELD_TYPES:
+        if isinstance(field, field_type):
+            return python_types
+
+    raise TypeError('Unsupported payload field {}'.format(type(field).__name__))
+
+
+def _enum(field):
+    enum = getattr(field, 'enum', None)
+
+    return frozenset(enum) if enum else None
@@ -0,0 +1,181 @@
+import cProfile
+import hmac
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+from collections import Counter
+
+from flask import Response
+from werkzeug.exceptions import BadRequest
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FORMAT_HEADER = 'X-Profile-Format'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+
+FORMAT_PSTATS = 'pstats'
+FORMAT_COLLAPSED = 'collapsed'
+
+_EXTENSIONS = {FORMAT_PSTATS: 'prof', FORMAT_COLLAPSED: 'collapsed.txt'}
+_MIMETYPES = {FORMAT_PSTATS: 'application/octet-stream', FORMAT_COLLAPSED: 'text/plain'}
+
+_PROFILE_ENVIRON = 'HTTP_X_PROFILE'
+_PROFILE_FORMAT_ENVIRON = 'HTTP_X_PROFILE_FORMAT'
+
+
+class Profiler:
+    token = None
+    directory = None
+    sample_interval = 0.001
+
+    def __init__(self):
+        self._wsgi_app = None
+        self._logger = None
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self.token = app.config.get('PROFILER_TOKEN') or None
+        if self.token is None:
+            return
+
+        self.directory = app.config.get('PROFILER_DIR') or None
+        self.sample_interval = float(app.config.get('PROFILER_SAMPLE_INTERVAL_MS', 1)) / 1000
+
+        self._logger = app.logger
+
+        # Wrapping the WSGI callable keeps unprofiled requests down to one environ lookup.
+        self._wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+
+        app.extensions['profiler'] = self
+
+    def __call__(self, environ, start_response):
+        token = environ.get(_PROFILE_ENVIRON)
+
+        if token is None or not self._is_authorized(token):
+            return self._wsgi_app(environ, start_response)
+
+        return self._profile(environ, start_response)
+
+    def _is_authorized(self, token):
+        # WSGI decodes header bytes as latin-1; encoding back restores them for a constant time compare.
+        return hmac.compare_digest(token.encode('latin-1'), self.token.encode('utf-8'))
+
+    def _profile(self, environ, start_response):
+        profile_format = environ.get(_PROFILE_FORMAT_ENVIRON, FORMAT_PSTATS).strip().lower()
+        if profile_format not in _EXTENSIONS:
+            return BadRequest('Unknown profile format: {}'.format(profile_format))(environ, start_response)
+
+        if profile_format == FORMAT_PSTATS:
+            profiler = _CProfiler()
+        else:
+            profiler = _StackSampler(self.sample_interval)
+
+        captured = []
+        body = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers]
+
+            return body.append
+
+        # The body is drained under the profiler too, so streamed responses are measured in full.
+        profiler.start()
+        try:
+            app_iter = self._wsgi_app(environ, capture)
+
+            try:
+                body.extend(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            profiler.stop()
+
+        filename = _profile_filename(environ, _EXTENSIONS[profile_format])
+
+        if self.directory is None:
+            response = Response(profiler.output(), mimetype=_MIMETYPES[profile_format])
+            response.headers.set('Content-Disposition', 'attachment', filename=filename)
+
+            return response(environ, start_response)
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, filename)
+        with open(path, 'wb') as fp:
+            fp.write(profiler.output())
+
+        if self._logger is not None:
+            self._logger.info('Profiled %s %s into %s', environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'), path)
+
+        status, headers = captured
+        start_response(status, list(headers) + [(PROFILE_FILE_HEADER, filename)])
+
+        return body
+
+
+class _CProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def output(self):
+        # Same bytes as Profile.dump_stats, so pstats, snakeviz and friends can read it.
+        self._profile.create_stats()
+
+        return marshal.dumps(self._profile.stats)
+
+
+class _StackSampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self._stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        thread_id = threading.get_ident()
+
+        self._thread = threading.Thread(target=self._sample, args=(thread_id,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def output(self):
+        lines = ('{} {}'.format(stack, count) for stack, count in self._stacks.most_common())
+
+        return '\n'.join(lines).encode('utf-8') + b'\n'
+
+    def _sample(self, thread_id):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+
+            names = []
+            while frame is not None:
+                names.append('{}:{}'.format(frame.f_globals.get('__name__', '?'), frame.f_code.co_name))
+                frame = frame.f_back
+
+            self._stacks[';'.join(reversed(names))] += 1
+
+
+def _profile_filename(environ, extension):
+    path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+
+    return '{}-{}-{}-{}.{}'.format(time.strftime('%Y%m%d%H%M%S'), environ.get('REQUEST_METHOD', 'GET'),
+                                   path, uuid.uuid4().hex[:8], extension)
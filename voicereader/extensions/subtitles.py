@@ -0,0 +1,96 @@
+import hashlib
+import re
+
+from bisect import bisect_right
+from itertools import accumulate
+
+VTT_MIMETYPE = 'text/vtt'
+
+_TIMESTAMP = r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})'
+_TIMING_PATTERN = re.compile(r'^\s*' + _TIMESTAMP + r'\s*-->\s*' + _TIMESTAMP)
+
+
+class Cues:
+    __slots__ = ('starts', 'ends', 'texts', '_max_ends', '_vtt')
+
+    def __init__(self, starts, ends, texts):
+        self.starts = starts
+        self.ends = ends
+        self.texts = texts
+
+        # Cues may overlap, so ends are not sorted; their running maximum is, and can be bisected.
+        self._max_ends = list(accumulate(ends, max))
+        self._vtt = None
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document['starts'], document['ends'], document['texts'])
+
+    def to_document(self):
+        return {"starts": self.starts, "ends": self.ends, "texts": self.texts}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def window(self, start, end):
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_right(self.starts, end)
+
+        return [(self.starts[i], self.ends[i], self.texts[i]) for i in range(lo, hi) if self.ends[i] > start]
+
+    def to_vtt(self):
+        if self._vtt is None:
+            blocks = ['WEBVTT']
+            blocks.extend('{} --> {}\n{}'.format(_format_timestamp(start), _format_timestamp(end), text)
+                          for start, end, text in zip(self.starts, self.ends, self.texts))
+
+            self._vtt = '\n\n'.join(blocks) + '\n'
+
+        return self._vtt
+
+
+def hash_subtitles(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def parse_subtitles(text):
+    if not text:
+        return None
+
+    cues = []
+
+    for block in re.split(r'\n\s*\n', text.replace('\r\n', '\n').replace('\r', '\n').lstrip('\ufeff')):
+        lines = block.strip('\n').split('\n')
+
+        for index, line in enumerate(lines):
+            match = _TIMING_PATTERN.match(line)
+            if match is None:
+                continue
+
+            start = _milliseconds(match.groups()[:4])
+            end = _milliseconds(match.groups()[4:])
+
+            if end > start:
+                cues.append((start, end, '\n'.join(lines[index + 1:]).strip()))
+            break
+
+    if not cues:
+        return None
+
+    cues.sort(key=lambda cue: (cue[0], cue[1]))
+
+    return Cues([cue[0] for cue in cues], [cue[1] for cue in cues], [cue[2] for cue in cues])
+
+
+def _milliseconds(groups):
+    hours, minutes, seconds, milliseconds = groups
+
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds)
+
+
+def _format_timestamp(milliseconds):
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return '{:02d}:{:02d}:{:02d}.{:03d}'.format(hours, minutes, seconds, milliseconds)
@@ -0,0 +1,21 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+# Read here rather than importing voicereader, so the master never creates metric files of its own.
+_MULTIPROC_DIR = os.environ.get('prometheus_multiproc_dir')
+
+
+def on_starting(server):
+    if not _MULTIPROC_DIR:
+        return
+
+    # Files left by a previous master would be added to the new counters.
+    shutil.rmtree(_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(_MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    if _MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid, _MULTIPROC_DIR)
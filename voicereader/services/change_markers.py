@@ -0,0 +1,54 @@
+import time
+
+from .db import mongo
+
+QUESTIONS = 'questions'
+USERS = 'users'
+
+
+def stamp(update):
+    update = dict(update)
+    update['$inc'] = dict(update.get('$inc', {}), version=1)
+    update['$set'] = dict(update.get('$set', {}), updated_at=time.time())
+
+    return update
+
+
+def stamp_document(document):
+    document['version'] = 1
+    document['updated_at'] = time.time()
+
+    return document
+
+
+def touch_markers(db, *names):
+    now = time.time()
+
+    for name in names:
+        db.change_markers.update_one({"_id": name}, {"$inc": {"version": 1}, "$set": {"updated_at": now}},
+                                     upsert=True)
+
+
+class ChangeMarkers:
+    enabled = False
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self.enabled = bool(app.config.get('ETAG_ENABLED', True))
+
+        app.extensions['change_markers'] = self
+
+    def touch(self, *names):
+        if self.enabled:
+            touch_markers(mongo.db, *names)
+
+    def versions(self, *names):
+        if not self.enabled:
+            return None
+
+        markers = mongo.db.change_markers.find({"_id": {"$in": list(names)}}, {"version": 1})
+        found = dict((marker['_id'], marker.get('version', 0)) for marker in markers)
+
+        return tuple(found.get(name, 0) for name in names)
@@ -1,5 +1,6 @@
 from flask_pymongo import PyMongo
-from pymongo import TEXT
+
+from .metrics import MongoCommandListener
 
 mongo = PyMongo()
 
@@ -8,5 +9,4 @@ def init_app(app):
     if not app:
         raise ValueError(app)
 
-    mongo.init_app(app)
-    mongo.db.users.create_index([('fcm_uid', TEXT)], unique=True)
+    mongo.init_app(app, event_listeners=[MongoCommandListener()])
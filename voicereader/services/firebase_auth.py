@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import firebase_admin
+
+from cachetools import TTLCache
+from google.auth import exceptions, jwt
+from google.auth.transport import requests as transport_requests
+from google.oauth2 import id_token as google_id_token
+
+from .metrics import CACHE_ENTRIES, FIREBASE_CERTS_FETCHED, observe_cache_lookup, timed
+
+ID_TOKEN_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+TOKEN_CACHE_NAME = 'id_token'
+USER_ID_CACHE_NAME = 'firebase_uid'
+
+_MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+class _CertsResponse:
+    def __init__(self, status, headers, data):
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+
+class IdTokenVerifier:
+    _tokens = None
+    _user_ids = None
+    _refresher = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._certs = None
+        self._http = transport_requests.Request()
+        self._logger = logging.getLogger(__name__)
+
+        self.certs_url = ID_TOKEN_CERTS_URL
+        self.refresh_interval = 3600
+        self.retry_interval = 30
+        self.project_id = None
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self.certs_url = app.config.get('FIREBASE_CERTS_URL', ID_TOKEN_CERTS_URL)
+        self.refresh_interval = float(app.config.get('FIREBASE_CERTS_REFRESH_SEC', 3600))
+        self.retry_interval = float(app.config.get('FIREBASE_CERTS_RETRY_SEC', 30))
+        self.project_id = app.config.get('FIREBASE_PROJECT_ID') or None
+
+        token_cache_size = int(app.config.get('ID_TOKEN_CACHE_SIZE', 1024))
+        user_id_cache_size = int(app.config.get('FIREBASE_UID_CACHE_SIZE', 1024))
+        user_id_cache_ttl = float(app.config.get('FIREBASE_UID_CACHE_TTL_SEC', 300))
+
+        # Firebase ID tokens live for an hour; exp is checked again on every hit.
+        self._tokens = TTLCache(token_cache_size, 3600) if token_cache_size > 0 else None
+        self._user_ids = TTLCache(user_id_cache_size, user_id_cache_ttl) if user_id_cache_size > 0 else None
+
+        if self.refresh_interval > 0:
+            self._start_refresher()
+
+        app.extensions['id_tokens'] = self
+
+    def verify(self, id_token):
+        if not isinstance(id_token, str) or not id_token:
+            raise ValueError('Illegal ID token provided')
+
+        key = hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+        claims = self._cached_claims(key)
+        if claims is not None:
+            return dict(claims)
+
+        claims = self._verify(id_token)
+
+        if self._tokens is not None:
+            with self._lock:
+                self._tokens[key] = claims
+                CACHE_ENTRIES.labels(TOKEN_CACHE_NAME).set(len(self._tokens))
+
+        return dict(claims)
+
+    def get_user_id(self, firebase_uid):
+        if self._user_ids is None:
+            return None
+
+        with self._lock:
+            user_id = self._user_ids.get(firebase_uid)
+
+        observe_cache_lookup(USER_ID_CACHE_NAME, user_id is not None)
+
+        return user_id
+
+    def set_user_id(self, firebase_uid, user_id):
+        if self._user_ids is None or user_id is None:
+            return
+
+        with self._lock:
+            self._user_ids[firebase_uid] = user_id
+            CACHE_ENTRIES.labels(USER_ID_CACHE_NAME).set(len(self._user_ids))
+
+    def forget_user_id(self, user_id):
+        if self._user_ids is None:
+            return
+
+        with self._lock:
+            for firebase_uid in [uid for uid, cached in self._user_ids.items() if cached == user_id]:
+                self._user_ids.pop(firebase_uid, None)
+
+            CACHE_ENTRIES.labels(USER_ID_CACHE_NAME).set(len(self._user_ids))
+
+    @timed('firebase', 'refresh_certs')
+    def refresh_certs(self):
+        response = self._http(self.certs_url, method='GET')
+        if response.status != 200:
+            raise exceptions.TransportError('Could not fetch certificates at {}'.format(self.certs_url))
+
+        with self._lock:
+            self._certs = _CertsResponse(response.status, dict(response.headers), response.data)
+            FIREBASE_CERTS_FETCHED.set_to_current_time()
+
+        return _max_age(response.headers)
+
+    def _cached_claims(self, key):
+        if self._tokens is None:
+            return None
+
+        with self._lock:
+            claims = self._tokens.get(key)
+
+            if claims is not None and claims['exp'] <= time.time():
+                self._tokens.pop(key, None)
+                claims = None
+
+            observe_cache_lookup(TOKEN_CACHE_NAME, claims is not None)
+
+            return claims
+
+    @timed('firebase', 'verify_id_token')
+    def _verify(self, id_token):
+        header = jwt.decode_header(id_token)
+        if not header.get('kid'):
+            raise ValueError('Firebase ID token has no "kid" claim')
+        if header.get('alg') != 'RS256':
+            raise ValueError('Firebase ID token has incorrect algorithm')
+
+        project_id = self.project_id or firebase_admin.get_app().project_id
+
+        claims = google_id_token.verify_token(id_token, request=self._certs_request,
+                                              audience=project_id, certs_url=self.certs_url)
+
+        if claims.get('iss') != ID_TOKEN_ISSUER_PREFIX + project_id:
+            raise ValueError('Firebase ID token has incorrect "iss" claim')
+
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError('Firebase ID token has invalid "sub" claim')
+
+        claims['uid'] = subject
+
+        return claims
+
+    def _certs_request(self, url, method='GET', **kwargs):
+        if url == self.certs_url:
+            with self._lock:
+                certs = self._certs
+
+            if certs is not None:
+                return certs
+
+            # Only reached before the first prefetch finished.
+            self.refresh_certs()
+
+            with self._lock:
+                return self._certs
+
+        return self._http(url, method=method, **kwargs)
+
+    def _start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+
+        self._refresher = threading.Thread(target=self._refresh_loop, name='firebase-certs-refresher', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                max_age = self.refresh_certs()
+            except Exception:
+                self._logger.exception('Failed to refresh Firebase signing certificates')
+                delay = self.retry_interval
+            else:
+                delay = self.refresh_interval
+                if max_age is not None:
+                    delay = min(delay, max(max_age / 2, 1))
+
+            time.sleep(delay)
+
+
+def _max_age(headers):
+    match = _MAX_AGE_PATTERN.search(headers.get('Cache-Control', ''))
+
+    return int(match.group(1)) if match else None
@@ -0,0 +1,111 @@
+from collections import namedtuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+Index = namedtuple('Index', ['keys', 'unique', 'weights'])
+# namedtuple only takes defaults= from Python 3.7, the image runs 3.6.
+Index.__new__.__defaults__ = (False, None)
+IndexReport = namedtuple('IndexReport', ['collection', 'missing', 'extra', 'wrong'])
+
+INDEXES = {
+    'users': [
+        Index([('fcm_uid', ASCENDING)], unique=True),
+    ],
+    'questions': [
+        Index([('created_date', DESCENDING), ('_id', DESCENDING)]),
+        Index([('writer_id', ASCENDING)]),
+        # Serves answers which are still embedded until migrate-answers has run everywhere.
+        Index([('answers._id', ASCENDING)]),
+        Index([('title', TEXT), ('contents', TEXT), ('subtitles', TEXT)],
+              weights={'title': 10, 'contents': 5, 'subtitles': 1}),
+    ],
+    'answers': [
+        Index([('question_id', ASCENDING), ('created_date', ASCENDING), ('_id', ASCENDING)]),
+        Index([('writer_id', ASCENDING)]),
+    ],
+}
+
+
+def index_name(index):
+    return '_'.join('{}_{}'.format(field, direction) for field, direction in index.keys)
+
+
+def compare_indexes(collection, indexes):
+    existing = {name: _describe(info) for name, info in collection.index_information().items() if name != '_id_'}
+    expected = [_normalize(index) for index in indexes]
+
+    missing = []
+    wrong = []
+
+    for index, spec in zip(indexes, expected):
+        matched = [name for name, actual in existing.items() if _fields(actual) == _fields(spec)]
+
+        if not matched:
+            missing.append(index)
+        elif spec not in [existing[name] for name in matched]:
+            wrong.extend((name, index) for name in matched)
+
+    extra = [name for name, actual in existing.items()
+             if all(_fields(actual) != _fields(spec) for spec in expected)]
+
+    return IndexReport(collection.name, missing, extra, wrong)
+
+
+def sync_indexes(db, registry=None, drop_extra=False, dry_run=False):
+    reports = []
+
+    for collection_name, indexes in (registry or INDEXES).items():
+        collection = db[collection_name]
+        report = compare_indexes(collection, indexes)
+
+        if not dry_run:
+            for name, index in report.wrong:
+                collection.drop_index(name)
+                _create_index(collection, index)
+
+            for index in report.missing:
+                _create_index(collection, index)
+
+            if drop_extra:
+                for name in report.extra:
+                    collection.drop_index(name)
+
+        reports.append(report)
+
+    return reports
+
+
+def _create_index(collection, index):
+    options = {'name': index_name(index), 'unique': index.unique}
+    if index.weights:
+        options['weights'] = index.weights
+
+    collection.create_index(index.keys, **options)
+
+
+def _normalize(index):
+    if any(direction == TEXT for _, direction in index.keys):
+        fields = sorted(field for field, _ in index.keys)
+        weights = dict((field, 1) for field in fields)
+        weights.update(index.weights or {})
+
+        return [(field, TEXT) for field in fields], index.unique, weights
+
+    return list(index.keys), index.unique, None
+
+
+def _describe(info):
+    unique = bool(info.get('unique', False))
+    weights = info.get('weights')
+
+    if weights:
+        weights = dict((field, int(weight)) for field, weight in weights.items())
+        return [(field, TEXT) for field in sorted(weights)], unique, weights
+
+    keys = [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in info['key']]
+
+    return keys, unique, None
+
+
+def _fields(spec):
+    return tuple(field for field, _ in spec[0])
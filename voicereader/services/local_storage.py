@@ -1,13 +1,28 @@
 import os
 
+from datetime import datetime
+
+from .stored_file import StoredFile, RangeNotSatisfiable, NotModified, resolve_range, iter_chunks, \
+    is_not_modified, DELIVERY_PROXY, DELIVERY_ACCEL_REDIRECT
+
 
 class LocalStorage:
     _upload_path = None
+    _accel_redirect_prefix = '/protected-media/'
+
+    delivery_mode = DELIVERY_PROXY
 
     def init_app(self, app):
         self._upload_path = app.config['RESOURCE_UPLOAD_PATH']
 
-    def fetch_file(self, resource, filename):
+        delivery_mode = app.config.get('MEDIA_DELIVERY_MODE', DELIVERY_PROXY)
+        if delivery_mode not in (DELIVERY_PROXY, DELIVERY_ACCEL_REDIRECT):
+            raise ValueError(delivery_mode)
+
+        self.delivery_mode = delivery_mode
+        self._accel_redirect_prefix = app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX', self._accel_redirect_prefix)
+
+    def open_file(self, resource, filename, byte_range=None, conditions=None):
         if self._upload_path is None:
             raise TypeError(self._upload_path)
 
@@ -15,9 +30,40 @@ class LocalStorage:
             raise ValueError(resource)
 
         if filename is None:
+            raise ValueError(filename)
+
+        try:
+            fp = open(os.path.join(self._upload_path, resource, filename), 'rb')
+        except FileNotFoundError:
+            return None
+
+        stat = os.fstat(fp.fileno())
+        size = stat.st_size
+        etag = '{:x}-{:x}'.format(stat.st_mtime_ns, size)
+        last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
+
+        try:
+            if is_not_modified(conditions, etag, last_modified):
+                raise NotModified(etag, last_modified)
+
+            content_range = resolve_range(byte_range, size)
+        except (NotModified, RangeNotSatisfiable):
+            fp.close()
+            raise
+
+        start, stop = content_range or (0, size)
+        fp.seek(start)
+
+        return StoredFile(iter_chunks(fp, stop - start), stop - start, size, content_range, last_modified, etag)
+
+    def accel_redirect_path(self, resource, filename):
+        if resource is None:
             raise ValueError(resource)
 
-        return open(os.path.join(self._upload_path, resource, filename), 'rb').read()
+        if filename is None:
+            raise ValueError(filename)
+
+        return os.path.join(self._accel_redirect_prefix, resource, filename)
 
     def upload_file(self, resource, file):
         if self._upload_path is None:
@@ -0,0 +1,150 @@
+import os
+import time
+
+from functools import wraps
+
+from flask import g, request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, \
+    generate_latest, multiprocess
+from pymongo import monitoring
+
+# The pinned prometheus_client only reads the lowercase name.
+MULTIPROC_DIR_ENV = 'prometheus_multiproc_dir'
+
+UNMATCHED_ROUTE = 'unmatched'
+
+REQUEST_LATENCY = Histogram('voicereader_request_latency_seconds', 'Time spent handling HTTP requests.',
+                            ['method', 'route'])
+REQUESTS = Counter('voicereader_requests_total', 'HTTP responses sent.',
+                   ['method', 'route', 'status'])
+# livesum drops the values of dead workers and adds up the live ones.
+REQUESTS_IN_FLIGHT = Gauge('voicereader_requests_in_flight', 'HTTP requests being handled.',
+                           ['method', 'route'], multiprocess_mode='livesum')
+MONGO_COMMAND_LATENCY = Histogram('voicereader_mongo_command_latency_seconds', 'Time spent on MongoDB commands.',
+                                  ['command', 'outcome'])
+EXTERNAL_CALL_LATENCY = Histogram('voicereader_external_call_latency_seconds', 'Time spent on calls to S3 and Firebase.',
+                                  ['service', 'operation', 'outcome'])
+S3_UPLOADED_BYTES = Counter('voicereader_s3_uploaded_bytes_total', 'Bytes uploaded to S3.')
+
+# Gauges of in-process state are summed over the live workers only, like REQUESTS_IN_FLIGHT.
+VIEW_BUFFER_DEPTH = Gauge('voicereader_view_buffer_depth', 'Views waiting to be written to MongoDB.',
+                          multiprocess_mode='livesum')
+VIEW_FLUSH_LATENCY = Histogram('voicereader_view_flush_latency_seconds', 'Time spent writing buffered views.',
+                               ['outcome'])
+VIEWS_FLUSHED = Counter('voicereader_views_flushed_total', 'Views written to MongoDB.')
+VIEWS_DROPPED = Counter('voicereader_views_dropped_total', 'Views dropped because the buffer was full after a failure.')
+
+CACHE_LOOKUPS = Counter('voicereader_cache_lookups_total', 'Lookups in the in-process caches.', ['cache', 'result'])
+CACHE_EVICTIONS = Counter('voicereader_cache_evictions_total', 'Entries evicted to make room in the in-process caches.',
+                          ['cache'])
+CACHE_ENTRIES = Gauge('voicereader_cache_entries', 'Entries held in the in-process caches.', ['cache'],
+                      multiprocess_mode='livesum')
+# Per worker, so a refresher which stopped in one worker still shows up.
+FIREBASE_CERTS_FETCHED = Gauge('voicereader_firebase_certs_fetched_timestamp_seconds',
+                               'When the Firebase signing certificates were last fetched.',
+                               multiprocess_mode='liveall')
+
+COMPRESSION_LATENCY = Histogram('voicereader_compression_latency_seconds', 'Time spent compressing responses.',
+                                ['encoding'])
+COMPRESSION_INPUT_BYTES = Counter('voicereader_compression_input_bytes_total', 'Response bytes before compression.',
+                                  ['encoding'])
+COMPRESSION_OUTPUT_BYTES = Counter('voicereader_compression_output_bytes_total', 'Response bytes after compression.',
+                                   ['encoding'])
+
+
+def multiprocess_dir():
+    return os.environ.get(MULTIPROC_DIR_ENV) or None
+
+
+def observe_external_call(service, operation, outcome, seconds):
+    EXTERNAL_CALL_LATENCY.labels(service, operation, outcome).observe(seconds)
+
+
+def observe_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def timed(service, operation):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'error'
+
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'success'
+
+                return result
+            finally:
+                observe_external_call(service, operation, outcome, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, 'success').observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, 'error').observe(event.duration_micros / 1e6)
+
+
+class Metrics:
+    enabled = False
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self.enabled = bool(app.config.get('METRICS_ENABLED', True))
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['metrics'] = self
+
+    def render(self):
+        path = multiprocess_dir()
+
+        if path is None:
+            registry = REGISTRY
+        else:
+            # Every gunicorn worker writes its own files; any of them can serve the sum.
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=path)
+
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    def _start_request(self):
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+        g.metrics_request = (request.method, route, time.perf_counter())
+        REQUESTS_IN_FLIGHT.labels(request.method, route).inc()
+
+    def _finish_request(self, response):
+        self._record(response.status_code)
+
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when a view raises, which Flask answers with a 500.
+        self._record(500)
+
+    def _record(self, status):
+        started = g.pop('metrics_request', None)
+        if started is None:
+            return
+
+        method, route, started_at = started
+
+        REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started_at)
+        REQUESTS.labels(method, route, str(status)).inc()
+        REQUESTS_IN_FLIGHT.labels(method, route).dec()
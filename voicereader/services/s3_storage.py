@@ -1,23 +1,73 @@
 import os
+import time
 import boto3
 
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from cachetools import TTLCache
+
+from .metrics import S3_UPLOADED_BYTES, observe_external_call, timed
+from .stored_file import StoredFile, RangeNotSatisfiable, NotModified, range_header, parse_content_range, \
+    iter_chunks, to_utc_naive, DELIVERY_PROXY, DELIVERY_REDIRECT
+
+
+MB = 1024 * 1024
 
 
 class S3Storage:
     _bucket_name = None
     _s3 = None
+    _presigned_urls = None
+    _transfer_config = None
+    _logger = None
+
+    delivery_mode = DELIVERY_PROXY
+    presigned_url_expires_in = 3600
 
     def init_app(self, app):
+        max_concurrency = int(app.config.get('S3_MAX_CONCURRENCY', 10))
+
+        # Every concurrent part upload holds its own pooled connection.
+        max_pool_connections = max(int(app.config.get('S3_MAX_POOL_CONNECTIONS', 10)), max_concurrency)
+
         self._bucket_name = app.config['S3_BUCKET_NAME']
         self._s3 = boto3.client(
             "s3",
             region_name=app.config['S3_REGION'],
             aws_access_key_id=app.config['S3_KEY'],
-            aws_secret_access_key=app.config['S3_SECRET']
+            aws_secret_access_key=app.config['S3_SECRET'],
+            endpoint_url=app.config.get('S3_ENDPOINT_URL') or None,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=float(app.config.get('S3_CONNECT_TIMEOUT_SEC', 5)),
+                read_timeout=float(app.config.get('S3_READ_TIMEOUT_SEC', 60)),
+                retries={"max_attempts": int(app.config.get('S3_MAX_RETRY_ATTEMPTS', 3))},
+            )
         )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=int(float(app.config.get('S3_MULTIPART_THRESHOLD_MB', 8)) * MB),
+            multipart_chunksize=int(float(app.config.get('S3_MULTIPART_CHUNKSIZE_MB', 8)) * MB),
+            max_concurrency=max_concurrency,
+        )
+        self._logger = app.logger
+
+        app.extensions['storage'] = self
+
+        delivery_mode = app.config.get('MEDIA_DELIVERY_MODE', DELIVERY_PROXY)
+        if delivery_mode not in (DELIVERY_PROXY, DELIVERY_REDIRECT):
+            raise ValueError(delivery_mode)
+
+        self.delivery_mode = delivery_mode
+        self.presigned_url_expires_in = int(app.config.get('S3_PRESIGNED_URL_EXPIRES_SEC',
+                                                           self.presigned_url_expires_in))
+
+        # A cached URL is handed out only during the first half of its lifetime,
+        # so a client always has at least half of it left to finish the download.
+        self._presigned_urls = TTLCache(maxsize=int(app.config.get('S3_PRESIGNED_URL_CACHE_SIZE', 4096)),
+                                        ttl=self.presigned_url_expires_in / 2)
 
-    def fetch_file(self, resource, filename):
+    def open_file(self, resource, filename, byte_range=None, conditions=None):
         if self._s3 is None:
             raise TypeError(self._s3)
 
@@ -28,20 +78,83 @@ class S3Storage:
             raise ValueError(resource)
 
         if filename is None:
-            raise ValueError
+            raise ValueError(filename)
 
-        key = os.path.join(resource, filename)
+        params = {
+            "Bucket": self._bucket_name,
+            "Key": os.path.join(resource, filename),
+        }
+
+        if byte_range is not None:
+            params['Range'] = range_header(byte_range)
+
+        if conditions is not None and conditions.if_none_match:
+            params['IfNoneMatch'] = conditions.if_none_match.to_header()
+        elif conditions is not None and conditions.if_modified_since is not None:
+            params['IfModifiedSince'] = conditions.if_modified_since
+
+        started = time.perf_counter()
+        outcome = 'error'
 
         try:
-            file = self._s3.get_object(Bucket=self._bucket_name, Key=key)
+            file = self._s3.get_object(**params)
+            outcome = 'success'
         except ClientError as ex:
-            if ex.response['Error']['Code'] == 'NoSuchKey':
+            error = ex.response['Error']
+
+            if error['Code'] == 'NoSuchKey':
+                outcome = 'not_found'
                 return None
+            elif error['Code'] == '304':
+                outcome = 'not_modified'
+                headers = ex.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+                raise NotModified(_unquote_etag(headers.get('etag')))
+            elif error['Code'] == 'InvalidRange':
+                outcome = 'range_not_satisfiable'
+                size = error.get('ActualObjectSize')
+                raise RangeNotSatisfiable(int(size) if size is not None else None)
             else:
                 raise ex
+        finally:
+            observe_external_call('s3', 'open_file', outcome, time.perf_counter() - started)
+
+        length = file['ContentLength']
+        content_range, size = None, length
 
-        return file['Body'].read()
+        if 'ContentRange' in file:
+            content_range, size = parse_content_range(file['ContentRange'])
 
+        return StoredFile(iter_chunks(file['Body'], length), length, size, content_range,
+                          to_utc_naive(file.get('LastModified')), _unquote_etag(file.get('ETag')))
+
+    def presigned_url(self, resource, filename):
+        if self._s3 is None:
+            raise TypeError(self._s3)
+
+        if self._bucket_name is None:
+            raise TypeError(self._bucket_name)
+
+        if resource is None:
+            raise ValueError(resource)
+
+        if filename is None:
+            raise ValueError(filename)
+
+        key = os.path.join(resource, filename)
+
+        url = self._presigned_urls.get(key) if self._presigned_urls is not None else None
+        if url is None:
+            url = self._s3.generate_presigned_url('get_object', Params={
+                "Bucket": self._bucket_name,
+                "Key": key,
+            }, ExpiresIn=self.presigned_url_expires_in)
+
+            if self._presigned_urls is not None:
+                self._presigned_urls[key] = url
+
+        return url
+
+    @timed('s3', 'upload_file')
     def upload_file(self, resource, file):
         if self._s3 is None:
             raise TypeError(self._s3)
@@ -56,7 +169,35 @@ class S3Storage:
             raise ValueError(file)
 
         key = os.path.join(resource, file.filename)
+        transferred = []
+
+        started = time.perf_counter()
 
         self._s3.upload_fileobj(file, self._bucket_name, Key=key, ExtraArgs={
             "ContentType": file.content_type,
-        })
+        }, Config=self._transfer_config, Callback=transferred.append)
+
+        return self._record_upload(key, sum(transferred), time.perf_counter() - started)
+
+    def _record_upload(self, key, uploaded_bytes, seconds):
+        bytes_per_sec = uploaded_bytes / seconds if seconds > 0 else 0.0
+
+        # Throughput is this over the upload_file sum of voicereader_external_call_latency_seconds.
+        S3_UPLOADED_BYTES.inc(uploaded_bytes)
+
+        if self._logger is not None:
+            self._logger.info('Uploaded %s: %d bytes in %.3fs (%.0f bytes/sec)',
+                              key, uploaded_bytes, seconds, bytes_per_sec)
+
+        return {
+            "bytes": uploaded_bytes,
+            "seconds": seconds,
+            "bytes_per_sec": bytes_per_sec,
+        }
+
+
+def _unquote_etag(etag):
+    if etag is None:
+        return None
+
+    return etag.strip('"')
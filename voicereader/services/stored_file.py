@@ -0,0 +1,103 @@
+import re
+
+from collections import namedtuple
+from datetime import timezone
+
+CHUNK_SIZE = 64 * 1024
+
+DELIVERY_PROXY = 'proxy'
+DELIVERY_REDIRECT = 'redirect'
+DELIVERY_ACCEL_REDIRECT = 'x-accel-redirect'
+
+StoredFile = namedtuple('StoredFile', ['chunks', 'length', 'size', 'content_range', 'last_modified', 'etag'])
+# namedtuple only takes defaults= from Python 3.7, the image runs 3.6.
+StoredFile.__new__.__defaults__ = (None, None)
+
+Conditions = namedtuple('Conditions', ['if_none_match', 'if_modified_since'])
+
+_content_range_pattern = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    def __init__(self, size=None):
+        super().__init__(size)
+        self.size = size
+
+
+class NotModified(ValueError):
+    def __init__(self, etag=None, last_modified=None):
+        super().__init__(etag)
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def is_not_modified(conditions, etag, last_modified):
+    if conditions is None:
+        return False
+
+    if conditions.if_none_match:
+        return etag is not None and conditions.if_none_match.contains_weak(etag)
+
+    if conditions.if_modified_since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= conditions.if_modified_since
+
+    return False
+
+
+def to_utc_naive(value):
+    if value is None or value.tzinfo is None:
+        return value
+
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def resolve_range(byte_range, size):
+    if byte_range is None:
+        return None
+
+    start, stop = byte_range
+
+    if start < 0:
+        start, stop = max(size + start, 0), size
+    else:
+        stop = size if stop is None else min(stop, size)
+
+    if start >= stop:
+        raise RangeNotSatisfiable(size)
+
+    return start, stop
+
+
+def range_header(byte_range):
+    start, stop = byte_range
+
+    if start < 0:
+        return 'bytes={}'.format(start)
+
+    if stop is None:
+        return 'bytes={}-'.format(start)
+
+    return 'bytes={}-{}'.format(start, stop - 1)
+
+
+def parse_content_range(content_range):
+    matched = _content_range_pattern.match(content_range)
+    if matched is None:
+        raise ValueError(content_range)
+
+    start, end, size = (int(value) for value in matched.groups())
+
+    return (start, end + 1), size
+
+
+def iter_chunks(fp, length, chunk_size=CHUNK_SIZE):
+    try:
+        while length > 0:
+            chunk = fp.read(min(chunk_size, length))
+            if not chunk:
+                break
+
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fp.close()
@@ -0,0 +1,50 @@
+import threading
+
+from cachetools import LRUCache
+
+from .metrics import CACHE_ENTRIES, CACHE_EVICTIONS, observe_cache_lookup
+
+CACHE_NAME = 'subtitle'
+
+
+class _CountingLRUCache(LRUCache):
+    def popitem(self):
+        item = super().popitem()
+        CACHE_EVICTIONS.labels(CACHE_NAME).inc()
+
+        return item
+
+
+class SubtitleCache:
+    _cache = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        maxsize = int(app.config.get('SUBTITLE_CACHE_SIZE', 256))
+
+        self._cache = _CountingLRUCache(maxsize) if maxsize > 0 else None
+
+        app.extensions['subtitle_cache'] = self
+
+    def get(self, obj_question_id, subtitles_hash):
+        if self._cache is None:
+            return None
+
+        with self._lock:
+            cues = self._cache.get((obj_question_id, subtitles_hash))
+            observe_cache_lookup(CACHE_NAME, cues is not None)
+
+            return cues
+
+    def set(self, obj_question_id, subtitles_hash, cues):
+        if self._cache is None or cues is None:
+            return
+
+        with self._lock:
+            self._cache[(obj_question_id, subtitles_hash)] = cues
+            CACHE_ENTRIES.labels(CACHE_NAME).set(len(self._cache))
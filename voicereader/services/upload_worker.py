@@ -0,0 +1,104 @@
+import atexit
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.datastructures import FileStorage
+
+UPLOAD_MODE_SYNC = 'sync'
+UPLOAD_MODE_ASYNC = 'async'
+
+
+class UploadWorker:
+    _spool_path = 'spool/'
+    _max_workers = 2
+    _max_attempts = 3
+    _retry_backoff = 1.0
+    _executor = None
+    _logger = None
+
+    mode = UPLOAD_MODE_SYNC
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        mode = app.config.get('QUESTION_UPLOAD_MODE', UPLOAD_MODE_SYNC)
+        if mode not in (UPLOAD_MODE_SYNC, UPLOAD_MODE_ASYNC):
+            raise ValueError(mode)
+
+        self.mode = mode
+        self._spool_path = app.config.get('UPLOAD_SPOOL_PATH', self._spool_path)
+        self._max_workers = int(app.config.get('UPLOAD_WORKERS', self._max_workers))
+        self._max_attempts = max(int(app.config.get('UPLOAD_MAX_ATTEMPTS', self._max_attempts)), 1)
+        self._retry_backoff = float(app.config.get('UPLOAD_RETRY_BACKOFF_SEC', self._retry_backoff))
+        self._logger = app.logger
+
+        atexit.register(self.shutdown)
+
+    @property
+    def is_async(self):
+        return self.mode == UPLOAD_MODE_ASYNC
+
+    def spool(self, resource, file):
+        if resource is None:
+            raise ValueError(resource)
+
+        if file is None:
+            raise ValueError(file)
+
+        path = self.spooled_path(resource, file.filename)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file.save(path)
+
+        return path
+
+    def spooled_path(self, resource, filename):
+        return os.path.join(self._spool_path, resource, filename)
+
+    def spooled_files(self, resource):
+        directory = os.path.join(self._spool_path, resource)
+        if not os.path.isdir(directory):
+            return []
+
+        return [os.path.join(directory, filename) for filename in os.listdir(directory)]
+
+    def submit(self, storage, resource, path, filename, content_type, callback):
+        # The pool is created on first use so that it belongs to the
+        # gunicorn worker process rather than the master it was forked from.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+
+        return self._executor.submit(self.upload, storage, resource, path, filename, content_type, callback)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def upload(self, storage, resource, path, filename, content_type, callback):
+        try:
+            for attempt in range(1, self._max_attempts + 1):
+                try:
+                    with open(path, 'rb') as fp:
+                        storage.upload_file(resource, FileStorage(fp, filename=filename, content_type=content_type))
+                    break
+                except Exception as ex:
+                    if attempt == self._max_attempts:
+                        if self._logger is not None:
+                            self._logger.error('Failed to upload %s after %d attempts: %s', path, attempt, ex)
+
+                        callback(False)
+                        return False
+
+                    if self._logger is not None:
+                        self._logger.warning('Failed to upload %s, retrying: %s', path, ex)
+
+                    time.sleep(self._retry_backoff * 2 ** (attempt - 1))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+        callback(True)
+        return True
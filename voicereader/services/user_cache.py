@@ -0,0 +1,62 @@
+import threading
+
+from cachetools import TTLCache
+
+from .metrics import CACHE_ENTRIES, CACHE_EVICTIONS, observe_cache_lookup
+
+CACHE_NAME = 'user'
+
+
+class _CountingTTLCache(TTLCache):
+    def popitem(self):
+        item = super().popitem()
+        CACHE_EVICTIONS.labels(CACHE_NAME).inc()
+
+        return item
+
+
+class UserCache:
+    _cache = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        maxsize = int(app.config.get('USER_CACHE_SIZE', 1024))
+        ttl = float(app.config.get('USER_CACHE_TTL_SEC', 60))
+
+        self._cache = _CountingTTLCache(maxsize, ttl) if maxsize > 0 else None
+
+        app.extensions['user_cache'] = self
+
+    def get(self, obj_user_id):
+        if self._cache is None:
+            return None
+
+        with self._lock:
+            user = self._cache.get(obj_user_id)
+            observe_cache_lookup(CACHE_NAME, user is not None)
+
+            if user is None:
+                return None
+
+        return dict(user)
+
+    def set(self, obj_user_id, user):
+        if self._cache is None or user is None:
+            return
+
+        with self._lock:
+            self._cache[obj_user_id] = dict(user)
+            CACHE_ENTRIES.labels(CACHE_NAME).set(len(self._cache))
+
+    def invalidate(self, obj_user_id):
+        if self._cache is None:
+            return
+
+        with self._lock:
+            self._cache.pop(obj_user_id, None)
+            CACHE_ENTRIES.labels(CACHE_NAME).set(len(self._cache))
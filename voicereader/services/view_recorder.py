@@ -0,0 +1,103 @@
+import atexit
+import threading
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from .db import mongo
+from .metrics import VIEW_BUFFER_DEPTH, VIEW_FLUSH_LATENCY, VIEWS_FLUSHED, VIEWS_DROPPED
+
+
+class ViewRecorder:
+    _max_buffer_size = 100
+    _flush_interval = 5.0
+    _logger = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = set()
+        self._timer = None
+
+    def init_app(self, app):
+        if not app:
+            raise ValueError(app)
+
+        self._max_buffer_size = int(app.config.get('VIEW_BUFFER_SIZE', self._max_buffer_size))
+        self._flush_interval = float(app.config.get('VIEW_FLUSH_INTERVAL_SEC', self._flush_interval))
+        self._logger = app.logger
+
+        app.extensions['view_recorder'] = self
+        atexit.register(self.flush)
+
+    def record(self, obj_question_id, obj_user_id):
+        with self._lock:
+            self._buffer.add((obj_question_id, obj_user_id))
+            VIEW_BUFFER_DEPTH.set(len(self._buffer))
+
+            # A full buffer is flushed right away, but on the timer thread so requests never wait on the write.
+            if len(self._buffer) >= self._max_buffer_size:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush(self._flush_interval)
+
+    def flush(self):
+        with self._lock:
+            views, self._buffer = self._buffer, set()
+            VIEW_BUFFER_DEPTH.set(0)
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not views:
+            return 0
+
+        # View counters stay out of version and the QUESTIONS marker, so new readers keep ETags valid.
+        requests = [UpdateOne({"_id": question_id, "read": {"$ne": user_id}},
+                              {"$push": {"read": user_id}, "$inc": {"num_of_view": 1}})
+                    for question_id, user_id in views]
+
+        started = time.perf_counter()
+
+        try:
+            mongo.db.questions.bulk_write(requests, ordered=False)
+        except PyMongoError as ex:
+            VIEW_FLUSH_LATENCY.labels('error').observe(time.perf_counter() - started)
+            dropped = self._requeue(views)
+            VIEWS_DROPPED.inc(dropped)
+
+            if self._logger is not None:
+                self._logger.error('Failed to flush %d views, %d dropped: %s', len(views), dropped, ex)
+
+            return 0
+
+        VIEW_FLUSH_LATENCY.labels('success').observe(time.perf_counter() - started)
+        VIEWS_FLUSHED.inc(len(views))
+
+        return len(views)
+
+    def _requeue(self, views):
+        # Updates skip users already in read, so views which did land before the error are safe to retry.
+        with self._lock:
+            pending = views - self._buffer
+            retried = list(pending)[:max(self._max_buffer_size - len(self._buffer), 0)]
+
+            self._buffer.update(retried)
+            VIEW_BUFFER_DEPTH.set(len(self._buffer))
+
+            if self._buffer:
+                self._schedule_flush(self._flush_interval)
+
+        return len(pending) - len(retried)
+
+    def _schedule_flush(self, delay):
+        if self._timer is not None:
+            if self._timer.interval <= delay:
+                return
+
+            self._timer.cancel()
+
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
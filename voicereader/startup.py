@@ -5,6 +5,12 @@ import os
 default_envs = {
     "VOICEREADER_API_VERSION",
 
+    "JSON_ENCODER_BACKEND",
+
+    "COMPRESSION_MIN_SIZE",
+    "COMPRESSION_GZIP_LEVEL",
+    "COMPRESSION_BROTLI_QUALITY",
+
     "MONGO_URI",
 
     "JWT_SECRET_KEY",
@@ -17,18 +23,66 @@ default_envs = {
     "S3_REGION",
     "S3_KEY",
     "S3_SECRET",
+    "S3_PRESIGNED_URL_EXPIRES_SEC",
+    "S3_ENDPOINT_URL",
+    "S3_MAX_POOL_CONNECTIONS",
+    "S3_CONNECT_TIMEOUT_SEC",
+    "S3_READ_TIMEOUT_SEC",
+    "S3_MAX_RETRY_ATTEMPTS",
+    "S3_MULTIPART_THRESHOLD_MB",
+    "S3_MULTIPART_CHUNKSIZE_MB",
+    "S3_MAX_CONCURRENCY",
+
+    "MEDIA_DELIVERY_MODE",
 
     "FIREBASE_CONFIG_PATH",
+    "FIREBASE_PROJECT_ID",
+    "FIREBASE_CERTS_URL",
+    "FIREBASE_CERTS_REFRESH_SEC",
+    "FIREBASE_CERTS_RETRY_SEC",
+    "FIREBASE_UID_CACHE_SIZE",
+    "FIREBASE_UID_CACHE_TTL_SEC",
+    "ID_TOKEN_CACHE_SIZE",
+
+    "VIEW_BUFFER_SIZE",
+    "VIEW_FLUSH_INTERVAL_SEC",
+
+    "QUESTION_UPLOAD_MODE",
+    "UPLOAD_SPOOL_PATH",
+    "UPLOAD_WORKERS",
+    "UPLOAD_MAX_ATTEMPTS",
+    "UPLOAD_RETRY_BACKOFF_SEC",
+
+    "USER_CACHE_SIZE",
+    "USER_CACHE_TTL_SEC",
+
+    "SUBTITLE_CACHE_SIZE",
+
+    "QUESTION_BULK_MAX_IDS",
+    "USER_BULK_MAX_IDS",
+
+    "PROFILER_TOKEN",
+    "PROFILER_DIR",
+    "PROFILER_SAMPLE_INTERVAL_MS",
 }
 
 
 def configure_app(app):
-    from voicereader.extensions.json_encoder import JSONEncoder
+    from voicereader.extensions.compression import Compression
+    from voicereader.extensions.json_encoder import get_json_encoder, BACKEND_STDLIB
+    from voicereader.services.metrics import Metrics
 
     gunicorn_error_handlers = logging.getLogger('gunicorn.error').handlers
 
     app.logger.handlers.extend(gunicorn_error_handlers)
-    app.json_encoder = JSONEncoder
+
+    json_encoder = get_json_encoder(app.config.get('JSON_ENCODER_BACKEND', BACKEND_STDLIB))
+
+    app.json_encoder = json_encoder
+    app.config.setdefault('RESTPLUS_JSON', {}).setdefault('cls', json_encoder)
+
+    Metrics().init_app(app)
+    Compression().init_app(app)
 
 
 def load_config(app, root=None, envs=None):
@@ -80,3 +134,9 @@ def register_resources(app):
 
     for resource in resources:
         resource.init_app(app)
+
+
+def register_commands(app):
+    from . import commands
+
+    commands.init_app(app)